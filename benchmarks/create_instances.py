@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Compares creating instances one by one with
+:meth:`editor.editor.Editor.create_instance` against creating them in a
+batch with :meth:`editor.editor.Editor.create_instances`.
+
+Usage: python benchmarks/create_instances.py [instance count]
+"""
+from __future__ import print_function
+
+from array import array
+import os
+import sys
+import time
+
+from fife import fife
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+# pylint: disable=wrong-import-position
+from editor.editor import Editor
+# pylint: enable=wrong-import-position
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+def create_engine():
+    """Creates and initializes a FIFE engine with a small window"""
+    engine = fife.Engine()
+    settings = engine.getSettings()
+    settings.setScreenWidth(320)
+    settings.setScreenHeight(240)
+    settings.setFullScreen(False)
+    engine.init()
+    return engine
+
+
+def per_call(editor, layer, coords_list, object_data):
+    """Creates the instances with one create_instance call each"""
+    instances = []
+    for coords in coords_list:
+        instance = editor.create_instance(layer, coords, object_data)
+        instance.setRotation(90)
+        instances.append(instance)
+    return instances
+
+
+def measure(name, editor, layer, create):
+    """Prints the time a function needs to create instances and deletes
+    them afterwards
+
+    Args:
+
+        name: The name of the measured method
+
+        editor: The :class:`editor.editor.Editor`
+
+        layer: The fife.Layer the instances are created on
+
+        create: Function that creates the instances and returns them
+    """
+    start = time.time()
+    instances = create()
+    duration = time.time() - start
+    print("%-20s %8.3f s (%.2f us per instance)" %
+          (name, duration, duration * 1000000 / len(instances)))
+    editor.delete_instances(instances)
+    assert not layer.getInstances()
+
+
+def main():
+    """Runs the benchmark"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    engine = create_engine()
+    try:
+        editor = Editor(engine)
+        model = engine.getModel()
+        fife_map = editor.create_map("bench")
+        layer = fife_map.createLayer("ground", model.getCellGrid("square"))
+        fife_object = model.createObject("tile", "bench")
+        fife_object.setFilename("bench.xml")
+        object_data = ("tile", "bench")
+        side = int(count ** 0.5) + 1
+        coords_list = [(index % side, index // side, 0)
+                       for index in range(count)]
+        flat = array("d", (value for coords in coords_list
+                           for value in coords))
+        print("instances:           %d" % count)
+        measure("create_instance", editor, layer,
+                lambda: per_call(editor, layer, coords_list, object_data))
+        measure("create_instances", editor, layer,
+                lambda: editor.create_instances(layer, coords_list,
+                                                object_data, rotations=90))
+        measure("array.array", editor, layer,
+                lambda: editor.create_instances(layer, flat, object_data,
+                                                rotations=90))
+        if numpy is not None:
+            coords_array = numpy.array(coords_list, dtype=numpy.float64)
+            rotations = numpy.full(count, 90, dtype=numpy.int32)
+            measure("numpy", editor, layer,
+                    lambda: editor.create_instances(layer, coords_array,
+                                                    object_data,
+                                                    rotations=rotations))
+    finally:
+        engine.destroy()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Compares the memory used by parsed object definitions stored as
+dictionaries and as :class:`editor.object_defs.ObjectDef` instances.
+
+Usage: python benchmarks/object_defs_memory.py [object count]
+"""
+from __future__ import print_function
+
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+# pylint: disable=wrong-import-position
+from editor.object_parser import iterparse_file
+from editor.object_defs import parse_object_defs
+# pylint: enable=wrong-import-position
+
+ANIMATION = """<animation delay="100" namespace="bench" id="agent:walk:%d"
+x_offset="0" y_offset="-16">
+%s
+</animation>
+"""
+
+
+def write_assets(directory, count):
+    """Writes an object file with static and animated objects
+
+    Args:
+
+        directory: The directory to write the files to
+
+        count: The number of objects to write
+    """
+    for direction in (0, 90, 180, 270):
+        frames = "\n".join('<frame source="walk_%d_%d.png"/>' %
+                           (direction, frame) for frame in range(8))
+        with open(os.path.join(directory, "walk_%d.xml" % direction),
+                  "w") as ani_file:
+            ani_file.write(ANIMATION % (direction, frames))
+    filename = os.path.join(directory, "objects.xml")
+    with open(filename, "w") as obj_file:
+        obj_file.write("<assets>\n")
+        for index in range(count):
+            if index % 2:
+                obj_file.write(
+                    '<object id="agent%d" namespace="bench" static="0">'
+                    '<action id="walk">%s</action></object>\n' %
+                    (index, "".join('<animation source="walk_%d.xml"/>' %
+                                    direction for direction in
+                                    (0, 90, 180, 270))))
+            else:
+                obj_file.write(
+                    '<object id="tile%d" namespace="bench" static="1">%s'
+                    '</object>\n' %
+                    (index, "".join('<image source="tile%d_%d.png" '
+                                    'direction="%d" x_offset="0" '
+                                    'y_offset="0"/>' %
+                                    (index, direction, direction)
+                                    for direction in (0, 90, 180, 270))))
+        obj_file.write("</assets>\n")
+    return filename
+
+
+def measure(create):
+    """Returns the memory retained by the result of a function
+
+    Args:
+
+        create: Function that creates the objects to measure
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    result = create()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del result
+    return used
+
+
+def main():
+    """Runs the benchmark"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    directory = tempfile.mkdtemp()
+    try:
+        filename = write_assets(directory, count)
+        dict_size = measure(lambda: list(iterparse_file(filename)))
+        defs_size = measure(lambda: list(parse_object_defs(filename)))
+    finally:
+        shutil.rmtree(directory)
+    print("objects:       %d" % count)
+    print("dictionaries:  %d bytes (%.0f per object)" %
+          (dict_size, dict_size / float(count)))
+    print("ObjectDef:     %d bytes (%.0f per object)" %
+          (defs_size, defs_size / float(count)))
+    print("ratio:         %.1fx" % (dict_size / float(defs_size)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains the index of the object files shown in the object palette and
+the watchers that report changes to these files.
+
+.. module:: asset_index
+    :synopsis: Index of object files and watchers for changes to them
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+from builtins import object
+import os
+import threading
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+def _get_mtime(filename):
+    """Returns the modification time of a file, or None if it does not
+    exist.
+
+        Args:
+
+            filename: The path to the file
+    """
+    try:
+        return os.path.getmtime(filename)
+    except OSError:
+        return None
+
+
+class FileState(object):
+
+    """The indexed state of an object file"""
+
+    __slots__ = ("mtime", "objects", "dependencies")
+
+    def __init__(self, mtime, objects, dependencies):
+        self.mtime = mtime
+        self.objects = objects
+        self.dependencies = dependencies
+
+
+class AssetIndex(object):
+
+    """Keeps track of the object files that were parsed, the objects they
+    contributed and the other files they depend on."""
+
+    def __init__(self):
+        self.files = {}
+        self.__dependents = {}
+
+    def __contains__(self, filename):
+        return filename in self.files
+
+    def get_changes(self, model_files):
+        """Compares the indexed files with the files of the model
+
+            Args:
+
+                model_files: The object files that are used by the model
+
+            Returns: A tuple with a list of the files that are not indexed yet
+            and a list of the indexed files that are not used anymore.
+        """
+        added = [filename for filename in model_files
+                 if filename not in self.files]
+        removed = [filename for filename in self.files
+                   if filename not in model_files]
+        return added, removed
+
+    def update_file(self, filename, objects, dependencies):
+        """Adds or replaces the state of an object file
+
+            Args:
+
+                filename: The path to the object file
+
+                objects: Tuples with the namespace and name of every object
+                that is defined in the file
+
+                dependencies: The paths of the other files that were read
+
+            Returns: The previous state of the file or None
+        """
+        old_state = self.remove_file(filename)
+        state = FileState(_get_mtime(filename), set(objects),
+                          set(dependencies))
+        self.files[filename] = state
+        for path in state.dependencies | set((filename,)):
+            key = os.path.normcase(os.path.abspath(path))
+            self.__dependents.setdefault(key, set()).add(filename)
+        return old_state
+
+    def remove_file(self, filename):
+        """Removes an object file from the index
+
+            Args:
+
+                filename: The path to the object file
+
+            Returns: The state of the removed file or None
+        """
+        state = self.files.pop(filename, None)
+        if state is None:
+            return None
+        for path in state.dependencies | set((filename,)):
+            key = os.path.normcase(os.path.abspath(path))
+            dependents = self.__dependents.get(key)
+            if dependents is None:
+                continue
+            dependents.discard(filename)
+            if not dependents:
+                del self.__dependents[key]
+        return state
+
+    def get_file_objects(self, filename):
+        """Returns a set with the namespace and name tuples of the objects
+        an indexed file defines, or an empty set if the file is not indexed
+
+            Args:
+
+                filename: The path to the object file
+        """
+        state = self.files.get(filename)
+        if state is None:
+            return set()
+        return state.objects
+
+    def get_modified_files(self):
+        """Returns the indexed object files whose modification time differs
+        from the one they had when they were indexed."""
+        return set(filename for filename, state in self.files.items()
+                   if _get_mtime(filename) != state.mtime)
+
+    def get_affected_files(self, paths):
+        """Returns the indexed object files that are, or depend on, any of
+        the given files.
+
+            Args:
+
+                paths: The paths of files that changed
+        """
+        affected = set()
+        for path in paths:
+            key = os.path.normcase(os.path.abspath(path))
+            affected.update(self.__dependents.get(key, ()))
+        return affected
+
+    def get_watched_paths(self):
+        """Returns the absolute paths of all indexed files and the files they
+        depend on."""
+        paths = set()
+        for filename, state in self.files.items():
+            paths.add(os.path.abspath(filename))
+            paths.update(os.path.abspath(path)
+                         for path in state.dependencies)
+        return paths
+
+    def clear(self):
+        """Removes all files from the index"""
+        self.files = {}
+        self.__dependents = {}
+
+
+class PaletteIndex(object):
+
+    """Keeps track of the objects that are shown in the object palette
+
+    Objects are identified by tuples of their namespace and name.
+    """
+
+    def __init__(self):
+        self.namespaces = {}
+        self.object_files = {}
+
+    def __contains__(self, obj):
+        return obj in self.object_files
+
+    def __len__(self):
+        return len(self.object_files)
+
+    def __iter__(self):
+        return iter(self.object_files)
+
+    def add(self, namespace, identifier, filename):
+        """Adds an object to the index
+
+            Args:
+
+                namespace: The namespace of the object
+
+                identifier: The name of the object
+
+                filename: The object file the object was read from
+
+            Returns: False if the object was already in the index, True
+            otherwise.
+        """
+        obj = (namespace, identifier)
+        if obj in self.object_files:
+            return False
+        self.object_files[obj] = filename
+        self.namespaces.setdefault(namespace, set()).add(identifier)
+        return True
+
+    def remove(self, namespace, identifier):
+        """Removes an object from the index
+
+            Args:
+
+                namespace: The namespace of the object
+
+                identifier: The name of the object
+
+            Returns: The object file of the object, or None if the object was
+            not in the index.
+        """
+        filename = self.object_files.pop((namespace, identifier), None)
+        identifiers = self.namespaces.get(namespace)
+        if identifiers is not None:
+            identifiers.discard(identifier)
+            if not identifiers:
+                del self.namespaces[namespace]
+        return filename
+
+    def get_file(self, namespace, identifier):
+        """Returns the object file of an object, or None if the object is not
+        in the index.
+
+            Args:
+
+                namespace: The namespace of the object
+
+                identifier: The name of the object
+        """
+        return self.object_files.get((namespace, identifier))
+
+    def get_stale(self, model_objects):
+        """Returns the objects in the index that are not in the model
+
+            Args:
+
+                model_objects: A set or dictionary with the namespace and name
+                tuples of the objects in the model
+        """
+        return set(self.object_files).difference(model_objects)
+
+    def clear(self):
+        """Removes all objects from the index"""
+        self.namespaces = {}
+        self.object_files = {}
+
+
+class PollingWatcher(object):
+
+    """Checks the modification times of files in regular intervals and
+    reports the changed files to a callback."""
+
+    def __init__(self, callback, interval=2.0):
+        self.callback = callback
+        self.interval = interval
+        self.__mtimes = {}
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def watch(self, paths):
+        """Sets the files to watch
+
+            Args:
+
+                paths: The absolute paths of the files
+        """
+        with self.__lock:
+            mtimes = {}
+            for path in paths:
+                if path in self.__mtimes:
+                    mtimes[path] = self.__mtimes[path]
+                else:
+                    mtimes[path] = _get_mtime(path)
+            self.__mtimes = mtimes
+
+    def check(self):
+        """Checks the files for changes and calls the callback with the paths
+        of the changed files, if there are any."""
+        with self.__lock:
+            mtimes = dict(self.__mtimes)
+        changed = set()
+        for path, mtime in mtimes.items():
+            new_mtime = _get_mtime(path)
+            if new_mtime != mtime:
+                changed.add(path)
+                mtimes[path] = new_mtime
+        if not changed:
+            return
+        with self.__lock:
+            for path in changed:
+                if path in self.__mtimes:
+                    self.__mtimes[path] = mtimes[path]
+        self.callback(changed)
+
+    def __run(self):
+        """Checks for changes until the watcher is stopped"""
+        while not self.__stopped.wait(self.interval):
+            self.check()
+
+    def stop(self, timeout=5.0):
+        """Stops watching the files and waits for the thread to finish
+
+            Args:
+
+                timeout: The maximum number of seconds to wait
+        """
+        self.__stopped.set()
+        self.__thread.join(timeout)
+
+
+class _WatchdogHandler(FileSystemEventHandler):
+
+    """Passes file system events of watched files to a watcher"""
+
+    def __init__(self, watcher):
+        FileSystemEventHandler.__init__(self)
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        """Called on every file system event in a watched directory
+
+            Args:
+
+                event: The watchdog event
+        """
+        paths = [event.src_path]
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            paths.append(dest_path)
+        self.watcher.files_changed(paths)
+
+
+class WatchdogWatcher(object):
+
+    """Uses the notifications of the operating system, like inotify, to
+    report changed files to a callback. Requires the watchdog package."""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.__paths = set()
+        self.__watches = {}
+        self.__lock = threading.Lock()
+        self.__handler = _WatchdogHandler(self)
+        self.__observer = Observer()
+        self.__observer.daemon = True
+        self.__observer.start()
+
+    def watch(self, paths):
+        """Sets the files to watch
+
+            Args:
+
+                paths: The absolute paths of the files
+        """
+        directories = set(os.path.dirname(path) for path in paths)
+        with self.__lock:
+            self.__paths = set(os.path.normcase(path) for path in paths)
+            for directory in set(self.__watches) - directories:
+                self.__observer.unschedule(self.__watches.pop(directory))
+            for directory in directories - set(self.__watches):
+                if os.path.isdir(directory):
+                    self.__watches[directory] = self.__observer.schedule(
+                        self.__handler, directory, recursive=False)
+
+    def files_changed(self, paths):
+        """Called by the event handler when files in a watched directory
+        changed.
+
+            Args:
+
+                paths: The paths of the changed files
+        """
+        with self.__lock:
+            changed = set(path for path in paths
+                          if os.path.normcase(os.path.abspath(path)) in
+                          self.__paths)
+        if changed:
+            self.callback(changed)
+
+    def stop(self, timeout=5.0):
+        """Stops watching the files and waits for the observer to finish
+
+            Args:
+
+                timeout: The maximum number of seconds to wait
+        """
+        self.__observer.stop()
+        self.__observer.join(timeout)
+
+
+def create_watcher(callback, poll_interval=2.0):
+    """Returns a watcher for file changes. Uses operating system
+    notifications if the watchdog package is available and polls the files
+    otherwise.
+
+        Args:
+
+            callback: Function that gets called with a set of the paths of
+            the changed files.
+
+            poll_interval: The number of seconds between checks, when the
+            files have to be polled.
+    """
+    if Observer is not None:
+        try:
+            return WatchdogWatcher(callback)
+        except (OSError, RuntimeError):
+            pass
+    return PollingWatcher(callback, poll_interval)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains the brush that places objects on the cells of a layer
+
+.. module:: brush
+    :synopsis: Brush that places objects on the cells of a layer
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+from builtins import object
+
+from .fill_tools import get_cell_instances
+from .undo import CompoundAction
+from .undo_editor import UndoCreateInstances, UndoRemoveInstances
+
+
+class BrushStroke(object):
+
+    """A single stroke of the brush
+
+    Every cell the stroke passes is only painted once. The cells are
+    collected and painted in batches when the stroke is flushed, which
+    replaces the instances on the cells with one instance of the object,
+    or only removes them when erasing. All changes of the stroke are
+    recorded in one compound undo action.
+    """
+
+    def __init__(self, editor, layer, object_data=None, rotation=0,
+                 is_protected=None):
+        """Constructor
+
+        Args:
+
+            editor: The :class:`.editor.Editor` to create the instances with
+
+            layer: The fife.Layer to paint on
+
+            object_data: A tuple with the name and namespace, in that order,
+            of the object to paint, or None to erase instances.
+
+            rotation: The rotation of the new instances
+
+            is_protected: Optional function that gets an instance and returns
+            whether the instance must not be removed
+        """
+        self.editor = editor
+        self.layer = layer
+        self.object_data = object_data
+        self.rotation = rotation
+        self.is_protected = is_protected
+        self.visited = set()
+        self.pending = []
+        self.created = []
+        self.removed_count = 0
+        if object_data is None:
+            description = _("Erase instances")
+        else:
+            description = _("Paint instances")
+        self.action = CompoundAction(description)
+
+    def add_cell(self, coords):
+        """Adds a cell to the stroke
+
+        Args:
+
+            coords: The fife.ModelCoordinate of the cell on the layer
+
+        Returns:
+
+            True if the cell was added, False if the stroke already passed
+            it.
+        """
+        key = (coords.x, coords.y, coords.z)
+        if key in self.visited:
+            return False
+        self.visited.add(key)
+        self.pending.append(coords)
+        return True
+
+    def flush(self):
+        """Paints the cells that were added since the last flush"""
+        if not self.pending:
+            return
+        cells, self.pending = self.pending, []
+        start = (min(coords.x for coords in cells),
+                 min(coords.y for coords in cells))
+        end = (max(coords.x for coords in cells),
+               max(coords.y for coords in cells))
+        cell_instances = get_cell_instances(
+            self.editor.get_instances_in_rect(self.layer, start, end),
+            self.is_protected)
+        removed = []
+        for coords in cells:
+            removed.extend(cell_instances.get((coords.x, coords.y, coords.z),
+                                              ()))
+        if removed:
+            action = UndoRemoveInstances(self.editor, removed)
+            action.redo()
+            self.action.add_action(action)
+            self.removed_count += len(removed)
+        if self.object_data is not None:
+            action = UndoCreateInstances(self.editor, self.layer, cells,
+                                         self.object_data, self.rotation)
+            self.created.extend(action.redo())
+            self.action.add_action(action)
+
+    def finish(self):
+        """Paints the remaining cells and returns the undo action of the
+        stroke, or None if the stroke did not change anything."""
+        self.flush()
+        if not self.action.actions:
+            return None
+        return self.action
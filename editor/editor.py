@@ -20,8 +20,32 @@
 .. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
 """
 from builtins import object
+from collections import Counter
+
 from fife import fife
 from .undo import UndoManager
+from .instance_index import InstanceIndex
+from .spatial_index import SpatialIndex
+from .import_tracker import ImportTracker
+
+
+def get_coordinates_list(coords_list):
+    """Returns a list of coordinates from a batch of coordinates
+
+    Args:
+
+        coords_list: A list of coordinates or an array with a tolist method.
+        Two dimensional arrays have one row per coordinate, one dimensional
+        arrays contain the x, y and z values of the coordinates after
+        each other.
+    """
+    if not hasattr(coords_list, "tolist"):
+        return coords_list
+    values = coords_list.tolist()
+    if values and not isinstance(values[0], list):
+        values = [values[index:index + 3]
+                  for index in range(0, len(values), 3)]
+    return values
 
 
 class Editor(object):
@@ -37,12 +61,18 @@ class Editor(object):
                                            engine.getVFS(),
                                            engine.getImageManager(),
                                            engine.getRenderBackend())
-        self.__import_ref_count = {}
+        self.imports = ImportTracker()
         self.undo_manager = UndoManager()
+        self.instance_index = InstanceIndex()
+        self.spatial_index = SpatialIndex()
+        # Compare every indexed lookup with a search of the layers
+        self.check_instance_index = False
 
     def reset_data(self):
         """Resets the internal data of the editor instance"""
-        self.__import_ref_count = {}
+        self.imports.clear()
+        self.instance_index.clear()
+        self.spatial_index.clear()
 
     def create_map(self, identifier):
         """Creates a new map.
@@ -55,7 +85,9 @@ class Editor(object):
 
             The created map
         """
-        return self.__model.createMap(identifier)
+        fife_map = self.__model.createMap(identifier)
+        self.imports.track(fife_map.getId())
+        return fife_map
 
     def load_map(self, filename):
         """Load a map from a file
@@ -68,12 +100,34 @@ class Editor(object):
             The loaded map
         """
         fife_map = self.__map_loader.load(filename)
-        for layer in self.get_layers(fife_map):
-            for instance in self.get_instances_of_layer(layer):
-                self.increase_refcount(instance.getObject().getFilename(),
-                                       fife_map.getId())
+        self.count_imports(fife_map)
         return fife_map
 
+    def count_imports(self, fife_map):
+        """Counts the instances of the objects of every file on a map, if
+        they were not counted yet. The instances are only iterated once.
+
+        Args:
+
+            fife_map: The fife.Map
+        """
+        map_id = fife_map.getId()
+        if self.imports.is_tracked(map_id):
+            return
+        self.imports.count_instances(map_id, self.iter_instances(fife_map))
+
+    def reindex_map(self, fife_map):
+        """Drops the instance indices of a map, so they are built again from
+        the layers on the next lookup. Needed after instances were added to
+        the map without the editor.
+
+        Args:
+
+            fife_map: The fife.Map
+        """
+        self.instance_index.remove_map(fife_map.getId())
+        self.spatial_index.remove_map(fife_map.getId())
+
     def delete_map(self, map_or_identifier):
         """Deletes a specific map.
 
@@ -87,10 +141,16 @@ class Editor(object):
         """
         if not isinstance(map_or_identifier, fife.Map):
             map_or_identifier = self.get_map(map_or_identifier)
+        self.imports.remove_map(map_or_identifier.getId())
+        self.instance_index.remove_map(map_or_identifier.getId())
+        self.spatial_index.remove_map(map_or_identifier.getId())
         self.__model.deleteMap(map_or_identifier)
 
     def delete_maps(self):
         """Deletes all maps"""
+        self.imports.clear_maps()
+        self.instance_index.clear()
+        self.spatial_index.clear()
         self.__model.deleteMaps()
 
     def get_maps(self):
@@ -176,6 +236,7 @@ class Editor(object):
             assert isinstance(fife_map, fife.Map)
         if not isinstance(layer, fife.Layer):
             layer = fife_map.getLayer(layer)
+        self.spatial_index.remove_layer(layer)
         fife_map.deleteLayer(layer)
 
     def delete_layers(self, fife_map_id):
@@ -192,6 +253,7 @@ class Editor(object):
         fife_map = self.get_map(fife_map_id)
         if 0:  # Just for IDEs
             assert isinstance(fife_map, fife.Map)
+        self.spatial_index.remove_map(fife_map.getId())
         fife_map.deleteLayers()
 
     def get_layers(self, map_or_identifier):
@@ -304,6 +366,8 @@ class Editor(object):
         if not isinstance(object_or_identifier, fife.Object):
             object_or_identifier = self.get_object(object_or_identifier,
                                                    namespace)
+        self.imports.forget_object(object_or_identifier.getNamespace(),
+                                   object_or_identifier.getId())
         return self.__model.deleteObject(object_or_identifier)
 
     def delete_objects(self):
@@ -314,6 +378,7 @@ class Editor(object):
             True if objects could be deleted, False if there is a map with
             instances.
         """
+        self.imports.clear_object_files()
         return self.__model.deleteObjects()
 
     def get_object(self, identifier, namespace):
@@ -370,11 +435,85 @@ class Editor(object):
                 *object_or_object_data)
         instance = layer_or_layer_data.createInstance(object_or_object_data,
                                                       coords, identifier or "")
-        tmp_filename = instance.getObject().getFilename()
+        tmp_filename = self.imports.get_filename(object_or_object_data)
         tmp_map_name = layer_or_layer_data.getMap().getId()
         self.increase_refcount(tmp_filename, tmp_map_name)
+        self.instance_index.add(instance, tmp_map_name)
+        self.spatial_index.add(instance, layer_or_layer_data)
         return instance
 
+    def create_instances(self, layer_or_layer_data, coords_list,
+                         object_or_object_data, identifiers=None,
+                         rotations=None):
+        """Creates new instances of an object on the given layer. The layer
+        and the object are only looked up once and the reference count of
+        the object file is only updated once.
+
+        Args:
+
+            layer_or_layer_data: The layer or a tuple with 2 items: The name
+            of the layer and the map of the layer as a string or an map
+            instance.
+
+            coords_list: The coordinates of the new instances.
+            fife.ModelCoordinate or fife.ExactModelCoordinate instances or
+            3 item tuples with number values. Arrays with a tolist method,
+            like NumPy arrays with one row per instance or flat
+            array.array instances with x, y and z values, are also
+            accepted.
+
+            object_or_object_data: Either a fife.Object instance or a tuple
+            with the name and namespace, in that order,
+            of the object to use for the instances.
+
+            identifiers: Optional list with the names of the new instances
+
+            rotations: Optional rotation of all new instances or a list or
+            array with the rotation of each instance
+
+        Returns:
+
+            A list of the created instances
+        """
+        if not isinstance(layer_or_layer_data, fife.Layer):
+            layer_or_layer_data = self.get_layer(layer_or_layer_data[1],
+                                                 layer_or_layer_data[0])
+        if not isinstance(object_or_object_data, fife.Object):
+            object_or_object_data = self.__model.getObject(
+                *object_or_object_data)
+        coords_list = get_coordinates_list(coords_list)
+        if hasattr(rotations, "tolist"):
+            rotations = rotations.tolist()
+        if identifiers is None:
+            identifiers = [""] * len(coords_list)
+        create_instance = layer_or_layer_data.createInstance
+        exact_coordinate = fife.ExactModelCoordinate
+        instances = []
+        for coords, identifier in zip(coords_list, identifiers):
+            if isinstance(coords, (tuple, list)):
+                coords = exact_coordinate(*coords)
+            instances.append(create_instance(object_or_object_data, coords,
+                                             identifier or ""))
+        if rotations is not None:
+            if isinstance(rotations, (tuple, list)):
+                for instance, rotation in zip(instances, rotations):
+                    instance.setRotation(int(rotation))
+            else:
+                for instance in instances:
+                    instance.setRotation(int(rotations))
+        if instances:
+            map_name = layer_or_layer_data.getMap().getId()
+            self.imports.add(map_name,
+                             self.imports.get_filename(object_or_object_data),
+                             len(instances))
+            if self.instance_index.is_indexed(map_name):
+                for instance in instances:
+                    self.instance_index.add(instance, map_name)
+            if self.spatial_index.is_indexed(layer_or_layer_data):
+                for instance in instances:
+                    self.spatial_index.add(instance, layer_or_layer_data)
+        return instances
+
     def add_instance(self, instance, coords, layer_or_layer_data):
         """Adds an instance to a layer
 
@@ -406,6 +545,8 @@ class Editor(object):
         tmp_filename = instance.getObject().getFilename()
         tmp_map_name = layer_or_layer_data.getMap().getId()
         self.increase_refcount(tmp_filename, tmp_map_name)
+        self.instance_index.add(instance, tmp_map_name)
+        self.spatial_index.add(instance, layer_or_layer_data)
 
     def delete_instance(self, instance_or_identifier,
                         layer_or_layer_data=None):
@@ -439,8 +580,34 @@ class Editor(object):
         filename = instance_or_identifier.getObject().getFilename()
         map_name = layer_or_layer_data.getMap().getId()
         self.decrease_refcount(filename, map_name)
+        self.instance_index.remove(instance_or_identifier)
+        self.spatial_index.remove(instance_or_identifier)
         layer_or_layer_data.deleteInstance(instance_or_identifier)
 
+    def delete_instances(self, instances):
+        """Deletes several instances. The reference counts are updated once
+        for every object file and map.
+
+        Args:
+
+            instances: The fife.Instance instances to delete
+        """
+        deltas = {}
+        instance_index = self.instance_index
+        spatial_index = self.spatial_index
+        for instance in instances:
+            layer = instance.getLocation().getLayer()
+            map_name = layer.getMap().getId()
+            map_deltas = deltas.get(map_name)
+            if map_deltas is None:
+                map_deltas = deltas[map_name] = Counter()
+            map_deltas[instance.getObject().getFilename()] -= 1
+            instance_index.remove(instance)
+            spatial_index.remove(instance)
+            layer.deleteInstance(instance)
+        for map_name, map_deltas in deltas.items():
+            self.imports.update(map_name, map_deltas)
+
     def remove_instance(self, instance_or_identifier,
                         layer_or_layer_data=None):
         """Removes an instance
@@ -477,27 +644,57 @@ class Editor(object):
         filename = instance_or_identifier.getObject().getFilename()
         map_name = layer_or_layer_data.getMap().getId()
         self.decrease_refcount(filename, map_name)
+        self.instance_index.remove(instance_or_identifier)
+        self.spatial_index.remove(instance_or_identifier)
         layer_or_layer_data.removeInstance(instance_or_identifier)
         return instance_or_identifier
 
-    def delete_instances_of_map(self, map_or_identifier=None):
-        """Deletes all instances of the given layer.
+    def move_instance(self, instance, coords):
+        """Moves an instance to other coordinates on its layer
+
+        Args:
+
+            instance: A fife.Instance
+
+            coords: A fife.ExactModelCoordinate instance or a tuple with
+            3 values.
+        """
+        try:
+            iter(coords)
+            coords = fife.ExactModelCoordinate(*coords)
+        except TypeError:
+            pass
+        location = instance.getLocation()
+        location.setExactLayerCoordinates(coords)
+        instance.setLocation(location)
+        self.spatial_index.move(instance)
+
+    def delete_instances_of_map(self, map_or_identifier):
+        """Deletes all instances of the given map. The reference counts are
+        updated once for every object file.
+
+        Args:
+
+            map_or_identifier: A fife.Map or the identifier of the map
 
         Returns:
 
-            True if instances could be deleted, False if there is a map with
-            instances.
+            The number of deleted instances
 
         Raises:
 
             ValueError if there was no map with that identifier.
         """
-        instances = self.get_instances_of_map(map_or_identifier)
-        success = True
-        for instance in instances:
-            if not self.delete_instance(instance):
-                success = False
-        return success
+        if not isinstance(map_or_identifier, fife.Map):
+            map_or_identifier = self.get_map(map_or_identifier)
+        counts = Counter()
+        deleted = 0
+        for layer in map_or_identifier.getLayers():
+            deleted += self.__delete_layer_instances(layer, counts)
+        self.imports.update(map_or_identifier.getId(),
+                            dict((filename, -count)
+                                 for filename, count in counts.items()))
+        return deleted
 
     def delete_instances_of_layer(self, layer_or_layer_data):
         """Deletes all instances of the given layer.
@@ -510,19 +707,47 @@ class Editor(object):
 
         Returns:
 
-            True if instances could be deleted, False if there is a map with
-            instances.
+            The number of deleted instances
 
         Raises:
 
             ValueError if there was no map with that identifier.
         """
-        instances = self.get_instances_of_layer(layer_or_layer_data)
-        success = True
+        if not isinstance(layer_or_layer_data, fife.Layer):
+            layer_or_layer_data = self.get_layer(layer_or_layer_data[1],
+                                                 layer_or_layer_data[0])
+        counts = Counter()
+        deleted = self.__delete_layer_instances(layer_or_layer_data, counts)
+        self.imports.update(layer_or_layer_data.getMap().getId(),
+                            dict((filename, -count)
+                                 for filename, count in counts.items()))
+        return deleted
+
+    def __delete_layer_instances(self, layer, counts):
+        """Deletes all instances of a layer without updating the reference
+        counts.
+
+        Args:
+
+            layer: The fife.Layer
+
+            counts: A Counter that the number of deleted instances of each
+            object file are added to
+
+        Returns:
+
+            The number of deleted instances
+        """
+        instances = list(layer.getInstances())
+        counts.update(instance.getObject().getFilename()
+                      for instance in instances)
+        # The instances are dropped from the indices by their delete
+        # listeners.
+        self.spatial_index.remove_layer(layer)
+        delete_instance = layer.deleteInstance
         for instance in instances:
-            if not self.delete_instance(instance):
-                success = False
-        return success
+            delete_instance(instance)
+        return len(instances)
 
     def get_instance(self, identifier, layer_or_identifier=None,
                      map_or_identifier=None):
@@ -542,24 +767,100 @@ class Editor(object):
         Returns:
 
             The first instance with the given name on the given layer.
+            When the whole map is searched the instance index of the map is
+            used. If the index has no such instance the layers are searched,
+            to find instances that were added without the editor.
 
         Raises:
 
             ValueError if there was no map with that identifier.
         """
         if layer_or_identifier is None:
-            layers = self.get_layers(map_or_identifier)
-            for layer in layers:
-                instance = self.get_instance(identifier, layer)
+            if not isinstance(map_or_identifier, fife.Map):
+                map_or_identifier = self.get_map(map_or_identifier)
+            map_id = map_or_identifier.getId()
+            instance_index = self.instance_index
+            if not instance_index.is_indexed(map_id):
+                instance_index.build(map_id, map_or_identifier.getLayers())
+            instance = instance_index.get(map_id, identifier)
+            if self.check_instance_index:
+                self.check_instance_lookup(map_or_identifier, identifier,
+                                           instance)
+            if instance is None:
+                instance = self.search_instance(map_or_identifier,
+                                                identifier)
                 if instance is not None:
-                    return instance
-            return None
+                    print("Instance %s was not in the index of map %s, "
+                          "it was probably added without the editor" %
+                          (identifier, map_id))
+                    instance_index.add(instance, map_id)
+            return instance
         else:
             if not isinstance(layer_or_identifier, fife.Layer):
                 layer_or_identifier = self.get_layer(map_or_identifier,
                                                      layer_or_identifier)
             return layer_or_identifier.getInstance(identifier)
 
+    def search_instance(self, fife_map, identifier):
+        """Searches the layers of a map for an instance without using the
+        index
+
+        Args:
+
+            fife_map: The fife.Map to search
+
+            identifier: The name of the instance
+
+        Returns:
+
+            The first instance with the given name on the map, or None
+        """
+        for layer in fife_map.getLayers():
+            instance = layer.getInstance(identifier)
+            if instance is not None:
+                return instance
+        return None
+
+    def check_instance_lookup(self, fife_map, identifier, instance):
+        """Checks the result of an indexed lookup against a search of the
+        layers and the whole index of the map against the layers.
+
+        Args:
+
+            fife_map: The fife.Map that was searched
+
+            identifier: The name of the instance
+
+            instance: The instance the index returned
+
+        Raises:
+
+            AssertionError if the index is not consistent with the map
+        """
+        errors = self.instance_index.verify(fife_map.getId(),
+                                            fife_map.getLayers())
+        found = self.search_instance(fife_map, identifier)
+        if (found is None) != (instance is None):
+            errors.append("Lookup of %s returned %s, the layers have %s" %
+                          (identifier, instance, found))
+        if errors:
+            raise AssertionError("\n".join(errors))
+
+    def set_instance_id(self, instance, identifier):
+        """Changes the identifier of an instance and updates the index
+
+        Args:
+
+            instance: The fife.Instance
+
+            identifier: The new name of the instance
+        """
+        self.instance_index.remove(instance)
+        instance.setId(identifier)
+        layer = instance.getLocation().getLayer()
+        if layer is not None:
+            self.instance_index.add(instance, layer.getMap().getId())
+
     def get_instances_of_layer(self, layer_or_layer_data,
                                instance_identifier=None):
         """Returns a list of the instances of a layer
@@ -600,7 +901,8 @@ class Editor(object):
             Ignored if coords is a fife.Location instance
 
             use_exact_coordinates: if True, comparison is done using exact
-            coordinates. if not, cell coordinates are used.
+            coordinates. if not, cell coordinates are used and the
+            instances are looked up in the spatial index.
 
         Raises:
 
@@ -622,7 +924,56 @@ class Editor(object):
             coords.setExactLayerCoordinates(tmp_coords)
         else:
             layer = coords.getLayer()
-        return layer.getInstancesAt(coords)
+        if use_exact_coordinates:
+            return layer.getInstancesAt(coords, True)
+        cell = coords.getLayerCoordinates()
+        return self.spatial_index.get_at(layer, cell.x, cell.y)
+
+    def get_instances_in_rect(self, layer_or_layer_data, start, end):
+        """Returns the instances in a rectangle of cells
+
+        Args:
+
+            layer_or_layer_data: The layer or a tuple with 2 items: The name
+            of the layer and the map of the layer as a string or an map
+            instance.
+
+            start: A tuple with the x and y coordinates of a corner cell
+
+            end: A tuple with the x and y coordinates of the opposite corner
+            cell. The rectangle includes this cell.
+
+        Raises:
+
+            ValueError if there was no map with that identifier.
+        """
+        if not isinstance(layer_or_layer_data, fife.Layer):
+            layer_or_layer_data = self.get_layer(layer_or_layer_data[1],
+                                                 layer_or_layer_data[0])
+        return self.spatial_index.get_in_rect(layer_or_layer_data, start, end)
+
+    def get_instances_in_radius(self, layer_or_layer_data, center, radius):
+        """Returns the instances on the cells within a distance of a cell
+
+        Args:
+
+            layer_or_layer_data: The layer or a tuple with 2 items: The name
+            of the layer and the map of the layer as a string or an map
+            instance.
+
+            center: A tuple with the x and y coordinates of the center cell
+
+            radius: The maximum distance, in cells
+
+        Raises:
+
+            ValueError if there was no map with that identifier.
+        """
+        if not isinstance(layer_or_layer_data, fife.Layer):
+            layer_or_layer_data = self.get_layer(layer_or_layer_data[1],
+                                                 layer_or_layer_data[0])
+        return self.spatial_index.get_in_radius(layer_or_layer_data, center,
+                                                radius)
 
     def get_instances_of_map(self, map_or_identifier):
         """Returns a list of the instances of a map
@@ -637,13 +988,91 @@ class Editor(object):
 
             ValueError if there was no map with that identifier.
         """
-        layers = self.get_layers(map_or_identifier)
-        instances = []
+        return list(self.iter_instances(map_or_identifier))
+
+    def iter_instances(self, map_or_identifier, layers=None, predicate=None):
+        """Iterates over the instances of a map without collecting them in a
+        list first
+
+        Args:
+
+            map_or_identifier: A fife.Map or the identifier of the map
+
+            layers: Optional list of fife.Layer instances or identifiers of
+            layers of the map. If set only the instances of these layers
+            are returned.
+
+            predicate: Optional function that gets an instance and returns
+            whether the instance should be returned
+
+        Raises:
+
+            ValueError if there was no map with that identifier.
+        """
+        if not isinstance(map_or_identifier, fife.Map):
+            map_or_identifier = self.get_map(map_or_identifier)
+        if layers is None:
+            layers = map_or_identifier.getLayers()
         for layer in layers:
-            instances.append(self.get_instances_of_layer(layer))
-        return instances
+            if not isinstance(layer, fife.Layer):
+                layer = map_or_identifier.getLayer(layer)
+                if layer is None:
+                    continue
+            if predicate is None:
+                for instance in layer.getInstances():
+                    yield instance
+            else:
+                for instance in layer.getInstances():
+                    if predicate(instance):
+                        yield instance
+
+    def instance_stats(self, map_or_identifier):
+        """Counts the instances of a map in a single pass
+
+        Args:
+
+            map_or_identifier: A fife.Map or the identifier of the map
+
+        Returns:
+
+            A dictionary with the total number of instances in "total" and
+            Counters with the number of instances per layer in "layers",
+            per namespace and object identifier tuple in "objects", per
+            namespace in "namespaces" and per object file in "files".
 
-    def increase_refcount(self, filename, map_name=None):
+        Raises:
+
+            ValueError if there was no map with that identifier.
+        """
+        if not isinstance(map_or_identifier, fife.Map):
+            map_or_identifier = self.get_map(map_or_identifier)
+        layers = Counter()
+        objects = Counter()
+        for layer in map_or_identifier.getLayers():
+            layer_objects = Counter(
+                (fife_object.getNamespace(), fife_object.getId())
+                for fife_object in (instance.getObject()
+                                    for instance in layer.getInstances()))
+            layers[layer.getId()] = sum(layer_objects.values())
+            objects.update(layer_objects)
+        namespaces = Counter()
+        files = Counter()
+        # The namespaces and files only have to be looked up once for
+        # every object, not for every instance.
+        for (namespace, identifier), count in objects.items():
+            namespaces[namespace] += count
+            filename = self.imports.get_cached_filename(namespace, identifier)
+            if filename is None:
+                filename = self.imports.get_filename(
+                    self.__model.getObject(identifier, namespace))
+            files[filename] += count
+        return {"total": sum(layers.values()),
+                "layers": layers,
+                "objects": objects,
+                "namespaces": namespaces,
+                "files": files}
+
+    def increase_refcount(self, filename, map_name=None, amount=1):
         """Increase reference count for a file on a map
 
         Args:
@@ -651,16 +1080,12 @@ class Editor(object):
             filename: The filename the reference counter is for
 
             Map: The map the reference counter is for
+
+            amount: The number of references to add
         """
-        if map_name not in self.__import_ref_count:
-            self.__import_ref_count[map_name] = {}
-        ref_count = self.__import_ref_count[map_name]
-        if filename in ref_count:
-            ref_count[filename] += 1
-        else:
-            ref_count[filename] = 1
+        self.imports.add(map_name, filename, amount)
 
-    def decrease_refcount(self, filename, map_name):
+    def decrease_refcount(self, filename, map_name, amount=1):
         """Decrease reference count for a file on a map
 
         Args:
@@ -668,14 +1093,10 @@ class Editor(object):
             filename: The filename the reference counter is for
 
             Map: The map the reference counter is for
+
+            amount: The number of references to remove
         """
-        if map_name not in self.__import_ref_count:
-            return
-        ref_count = self.__import_ref_count[map_name]
-        if filename in ref_count:
-            ref_count[filename] -= 1
-            if ref_count[filename] <= 0:
-                del ref_count[filename]
+        self.imports.remove(map_name, filename, amount)
 
     def get_import_list(self, map_name):
         """Returns the import files of the given map
@@ -684,10 +1105,7 @@ class Editor(object):
 
             map_name: The name of the map to the the imports for
         """
-        if map_name in self.__import_ref_count:
-            return iter(self.__import_ref_count[map_name].keys())
-        else:
-            return []
+        return self.imports.get_import_list(map_name)
 
     def undo(self):
         """Undoes the last done action"""
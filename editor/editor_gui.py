@@ -49,6 +49,7 @@ from .edit_camera import CameraOptions
 from .object_toolbar import ObjectToolbar
 from .basic_toolbar import BasicToolbar
 from .property_editor import PropertyEditor
+from .undo_editor import UndoClearLayers
 from . import properties
 
 class EditorGui(object):
@@ -83,6 +84,8 @@ class EditorGui(object):
         self.import_popup = None
         self.edit_add = None
         self.add_popup = None
+        self.edit_popup = None
+        self.edit_clear_layer = None
 
         self.app = app
         self.editor = app.editor
@@ -305,6 +308,14 @@ class EditorGui(object):
 
         self.edit_add = edit_add
         self.edit_add.setEnabled(False)
+        edit_clear_layer = edit_popup.createChild("TaharezLook/MenuItem",
+                                                  "Edit/ClearLayer")
+        edit_clear_layer.setText(_("Clear Layer"))
+        edit_clear_layer.setEnabled(False)
+        edit_clear_layer.subscribeEvent(PyCEGUI.MenuItem.EventClicked,
+                                        self.cb_clear_layer)
+        self.edit_clear_layer = edit_clear_layer
+        self.edit_popup = edit_popup
 
 
 
@@ -363,6 +374,17 @@ class EditorGui(object):
         self.toolbar.addTab(gui)
         self.toolbar.setSelectedTabAtIndex(0)
 
+    def release_toolbars(self):
+        """Frees the resources of the toolbars that are created again when
+        they are needed"""
+        for toolbar in self.toolbars.values():
+            toolbar.release()
+
+    def close_toolbars(self):
+        """Closes the toolbars when the editor quits"""
+        for toolbar in self.toolbars.values():
+            toolbar.close()
+
     def update_toolbar_contents(self):
         """Updates the contents of the toolbars"""
         for toolbar in self.toolbars.values():
@@ -713,7 +735,7 @@ class EditorGui(object):
         is_valid = True
         if property_name == "Identifier":
             value = value
-            self.app.selected_object.setId(value)
+            self.app.editor.set_instance_id(self.app.selected_object, value)
         elif property_name == "CostId":
             cur_cost = self.app.selected_object.getCost()
             try:
@@ -762,6 +784,7 @@ class EditorGui(object):
 
         self.delete_layer_button.setEnabled(is_selected)
         self.edit_layer_button.setEnabled(is_selected)
+        self.edit_clear_layer.setEnabled(is_selected)
 
     def cb_add_layer_activated(self, args):
         """Called when the + Button in the layer box was clicked
@@ -801,6 +824,42 @@ class EditorGui(object):
         self.reset_layerlist()
         self.update_layerlist()
 
+    def cb_clear_layer(self, args):
+        """Called when Clear Layer was clicked in the edit menu
+
+        Args:
+
+            args: PyCEGUI.WindowEventArgs
+        """
+        self.edit_popup.closePopupMenu()
+        layer_name = self.selected_layer
+        if layer_name is None:
+            return
+        current_map = self.app.current_map
+        layer = self.editor.get_layer(current_map.fife_map.getId(),
+                                      layer_name)
+        # The toolbars may have instances on the layer, like the preview
+        # instance of the objects toolbar, which are not part of the map.
+        for toolbar in self.toolbars.values():
+            toolbar.remove_preview()
+        self.app.set_selected_object(None)
+        action = UndoClearLayers(self.editor, (layer,),
+                                 self.is_entity_instance)
+        if action.redo():
+            self.editor.undo_manager.add_action(action)
+            if current_map.name not in self.app.changed_maps:
+                self.app.changed_maps.append(current_map.name)
+
+    def is_entity_instance(self, instance):
+        """Returns whether an instance belongs to an entity of the world.
+        These instances are kept when a layer is cleared.
+
+        Args:
+
+            instance: A fife.Instance
+        """
+        return self.app.world.is_identifier_used(instance.getId())
+
     def cb_edit_layer_activated(self, args):
         """Called when the Edit Button in the layer box was clicked
 
@@ -815,6 +874,7 @@ class EditorGui(object):
             return None
         layer_name = values["LayerName"]
         cell_grid = self.editor.get_cell_grid(values["GridType"])
+        self.editor.spatial_index.remove_layer(layer)
         layer.setId(layer_name)
         layer.setCellGrid(cell_grid)
         self.reset_layerlist()
@@ -39,6 +39,7 @@ class EditorListener(GameSceneListener, fife.IKeyListener):
         self.callbacks = {}
         self.callbacks["mouse_pressed"] = []
         self.callbacks["mouse_dragged"] = []
+        self.callbacks["mouse_released"] = []
         self.callbacks["mouse_moved"] = []
         self.callbacks["key_pressed"] = []
         self.callbacks["map_changed"] = []
@@ -111,6 +112,18 @@ class EditorListener(GameSceneListener, fife.IKeyListener):
             offset.rotate(current_map.camera.getRotation())
             current_map.move_camera_by((offset.getX(), offset.getY()))
 
+    def mouseReleased(self, event):  # pylint: disable=C0103,W0221
+        """Called when a mouse button was released.
+
+        Args:
+            event: The mouse event
+        """
+        for callback_data in self.callbacks["mouse_released"]:
+            func = callback_data["func"]
+            click_point = fife.ScreenPoint(event.getX(), event.getY())
+            func(click_point, event.getButton())
+        GameSceneListener.mouseReleased(self, event)
+
     def mouseMoved(self, event):  # pylint: disable=C0103,W0221
         """Called when the mouse was moved.
 
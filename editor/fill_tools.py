@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains functions for filling areas of a layer with instances
+
+.. module:: fill_tools
+    :synopsis: Functions for filling areas of a layer with instances
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+from builtins import object
+from collections import deque
+
+from .undo import CompoundAction
+from .undo_editor import UndoCreateInstances, UndoRemoveInstances
+
+SQUARE_NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+HEX_NEIGHBOURS_EVEN = ((1, 0), (-1, 0), (-1, 1), (0, 1), (-1, -1), (0, -1))
+HEX_NEIGHBOURS_ODD = ((1, 0), (-1, 0), (0, 1), (1, 1), (0, -1), (1, -1))
+
+
+def get_cell_instances(instances, is_protected=None):
+    """Returns a dictionary with the cells that have instances and lists of
+    these instances
+
+        Args:
+
+            instances: The fife.Instance instances of a layer, for example
+            all instances of the layer or the ones in an area
+
+            is_protected: Optional function that gets an instance and returns
+            whether the instance must be left alone. Protected instances are
+            not added to the dictionary.
+    """
+    cells = {}
+    for instance in instances:
+        if is_protected is not None and is_protected(instance):
+            continue
+        coords = instance.getLocation().getLayerCoordinates()
+        cells.setdefault((coords.x, coords.y, coords.z), []).append(instance)
+    return cells
+
+
+class LayerCellInstances(object):
+
+    """Collects the instances on the cells of a layer from the spatial index
+    of the editor, one block of cells at a time, when a cell is first
+    looked at. Can be used in place of the dictionary returned by
+    :func:`get_cell_instances` when the affected area is not known in
+    advance, like in a flood fill.
+    """
+
+    BLOCK_SIZE = 16
+
+    def __init__(self, editor, layer, is_protected=None):
+        """Constructor
+
+        Args:
+
+            editor: The :class:`.editor.Editor` with the spatial index
+
+            layer: The fife.Layer of the cells
+
+            is_protected: Optional function that gets an instance and returns
+            whether the instance must be left alone. Protected instances are
+            not added to the cells.
+        """
+        self.editor = editor
+        self.layer = layer
+        self.is_protected = is_protected
+        self.cells = {}
+        self.blocks = set()
+
+    def __load(self, cell):
+        """Adds the instances of the block of a cell, if it was not loaded
+        yet
+
+        Args:
+
+            cell: A tuple with the coordinates of the cell
+        """
+        size = self.BLOCK_SIZE
+        block = (cell[0] // size, cell[1] // size)
+        if block in self.blocks:
+            return
+        self.blocks.add(block)
+        start = (block[0] * size, block[1] * size)
+        end = (start[0] + size - 1, start[1] + size - 1)
+        instances = self.editor.get_instances_in_rect(self.layer, start, end)
+        self.cells.update(get_cell_instances(instances, self.is_protected))
+
+    def __contains__(self, cell):
+        self.__load(cell)
+        return cell in self.cells
+
+    def get(self, cell, default=None):
+        """Returns the list of the instances on a cell
+
+        Args:
+
+            cell: A tuple with the coordinates of the cell
+
+            default: The value to return if the cell has no instances
+        """
+        self.__load(cell)
+        return self.cells.get(cell, default)
+
+
+def get_cell_content(cell_instances, cell):
+    """Returns a frozenset with the namespaces and names of the objects on a
+    cell
+
+        Args:
+
+            cell_instances: The dictionary returned by
+            :func:`get_cell_instances` or a :class:`LayerCellInstances`
+
+            cell: A tuple with the coordinates of the cell
+    """
+    return frozenset((instance.getObject().getNamespace(),
+                      instance.getObject().getId())
+                     for instance in cell_instances.get(cell, ()))
+
+
+def get_rectangle_cells(start, end):
+    """Returns a list of the cells in the rectangle between two cells
+
+        Args:
+
+            start: A tuple with the coordinates of one corner. The z
+            coordinate of this cell is used for all cells.
+
+            end: A tuple with the coordinates of the opposite corner
+    """
+    min_x, max_x = sorted((start[0], end[0]))
+    min_y, max_y = sorted((start[1], end[1]))
+    z_pos = start[2]
+    return [(x_pos, y_pos, z_pos)
+            for y_pos in range(min_y, max_y + 1)
+            for x_pos in range(min_x, max_x + 1)]
+
+
+def get_flood_fill_cells(start, cell_instances, max_cells, hexagonal=False):
+    """Returns the cells that are connected to a cell and have the same
+    objects on them
+
+        Args:
+
+            start: A tuple with the coordinates of the cell to start at
+
+            cell_instances: The dictionary returned by
+            :func:`get_cell_instances` or a :class:`LayerCellInstances`
+
+            max_cells: The maximum number of cells to fill
+
+            hexagonal: Whether the layer uses a hexagonal grid
+
+        Returns:
+
+            A list of the cells, or None if there are more than max_cells
+            cells, which happens when an open area is filled.
+    """
+    content = get_cell_content(cell_instances, start)
+    visited = set((start,))
+    cells = []
+    queue = deque((start,))
+    while queue:
+        cell = queue.popleft()
+        cells.append(cell)
+        if len(cells) > max_cells:
+            return None
+        x_pos, y_pos, z_pos = cell
+        if not hexagonal:
+            neighbours = SQUARE_NEIGHBOURS
+        elif y_pos % 2:
+            neighbours = HEX_NEIGHBOURS_ODD
+        else:
+            neighbours = HEX_NEIGHBOURS_EVEN
+        for x_offset, y_offset in neighbours:
+            neighbour = (x_pos + x_offset, y_pos + y_offset, z_pos)
+            if neighbour in visited:
+                continue
+            visited.add(neighbour)
+            if neighbour not in cell_instances:
+                if not content:
+                    queue.append(neighbour)
+            elif get_cell_content(cell_instances, neighbour) == content:
+                queue.append(neighbour)
+    return cells
+
+
+def fill_cells(editor, layer, cells, object_data, rotation, cell_instances,
+               description):
+    """Replaces the instances on cells with one instance of an object per
+    cell, or only removes them.
+
+        Args:
+
+            editor: The :class:`.editor.Editor` to create the instances with
+
+            layer: The fife.Layer the cells are on
+
+            cells: A list of tuples with the coordinates of the cells
+
+            object_data: A tuple with the name and namespace, in that order,
+            of the object to place, or None to only remove the instances.
+
+            rotation: The rotation of the new instances
+
+            cell_instances: The dictionary returned by
+            :func:`get_cell_instances` or a :class:`LayerCellInstances`
+
+            description: The description of the undo action
+
+        Returns:
+
+            The :class:`.undo.CompoundAction` with the changes, which were
+            already done, or None if nothing changed.
+    """
+    action = CompoundAction(description)
+    removed = []
+    for cell in cells:
+        removed.extend(cell_instances.get(cell, ()))
+    if removed:
+        remove_action = UndoRemoveInstances(editor, removed)
+        remove_action.redo()
+        action.add_action(remove_action)
+    if object_data is not None and cells:
+        create_action = UndoCreateInstances(editor, layer, cells,
+                                            object_data, rotation)
+        create_action.redo()
+        action.add_action(create_action)
+    if not action.actions:
+        return None
+    return action
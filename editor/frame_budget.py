@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains a time budget for work that is spread over several frames
+
+.. module:: frame_budget
+    :synopsis: Time budget for work that is spread over several frames
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+from __future__ import division
+
+from builtins import object
+import time
+
+
+class FrameBudget(object):
+
+    """Limits the time that is spent on queued work in a frame
+
+    The budget adapts to the measured frame time: It shrinks when frames
+    take longer than the target frame time and grows back to the maximum
+    when there is time to spare.
+    """
+
+    SMOOTHING = 0.1
+    SHRINK = 0.75
+    GROW = 1.1
+
+    def __init__(self, budget=0.004, min_budget=0.001, target_fps=60):
+        self.max_budget = budget
+        self.min_budget = min(min_budget, budget)
+        self.target_frame_time = 1.0 / target_fps
+        self.budget = budget
+        self.frame_time = None
+        self.__last_frame = None
+        self.__deadline = 0
+
+    def start_frame(self):
+        """Measures the time since the last frame, adapts the budget and
+        starts the budget of the current frame."""
+        now = time.time()
+        if self.__last_frame is not None:
+            frame_time = now - self.__last_frame
+            if self.frame_time is None:
+                self.frame_time = frame_time
+            else:
+                self.frame_time += (frame_time -
+                                    self.frame_time) * self.SMOOTHING
+            if self.frame_time > self.target_frame_time:
+                self.budget = max(self.budget * self.SHRINK,
+                                  self.min_budget)
+            else:
+                self.budget = min(self.budget * self.GROW, self.max_budget)
+        self.__last_frame = now
+        self.__deadline = now + self.budget
+
+    def reset(self):
+        """Forgets the last frame, for example after the work was paused"""
+        self.__last_frame = None
+
+    def is_spent(self):
+        """Returns whether the budget of the current frame is spent"""
+        return time.time() >= self.__deadline
+
+    def remaining(self):
+        """Returns the seconds that are left of the budget of the current
+        frame."""
+        return max(self.__deadline - time.time(), 0)
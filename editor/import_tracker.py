@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains the tracker of the object files the maps need to import
+
+.. module:: import_tracker
+    :synopsis: Tracker of the object files the maps need to import
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+from builtins import object
+from collections import Counter
+
+
+class ImportTracker(object):
+
+    """Counts the instances of the objects of every file on each map
+
+    The files with at least one instance on a map are the imports of the
+    map. The counts of a map are kept in one Counter, which only contains
+    files with a positive count, so the import list is just its keys.
+    Only maps that were added with :meth:`track` or
+    :meth:`count_instances` are counted, changes of other maps are
+    ignored.
+    """
+
+    def __init__(self):
+        self.maps = {}
+        self.object_files = {}
+
+    def is_tracked(self, map_id):
+        """Returns whether the instances of a map were counted
+
+            Args:
+
+                map_id: The identifier of the map
+        """
+        return map_id in self.maps
+
+    def track(self, map_id):
+        """Starts counting the instances of a map, if it is not tracked yet
+
+            Args:
+
+                map_id: The identifier of the map
+        """
+        if map_id not in self.maps:
+            self.maps[map_id] = Counter()
+
+    def get_filename(self, fife_object):
+        """Returns the file of an object, which is cached by the namespace
+        and identifier of the object.
+
+            Args:
+
+                fife_object: The fife.Object
+        """
+        key = (fife_object.getNamespace(), fife_object.getId())
+        filename = self.object_files.get(key)
+        if filename is None:
+            filename = self.object_files[key] = fife_object.getFilename()
+        return filename
+
+    def get_cached_filename(self, namespace, identifier):
+        """Returns the cached file of an object, or None if the file of the
+        object was not looked up yet.
+
+            Args:
+
+                namespace: The namespace of the object
+
+                identifier: The identifier of the object
+        """
+        return self.object_files.get((namespace, identifier))
+
+    def forget_object(self, namespace, identifier):
+        """Removes an object from the cache of the object files
+
+            Args:
+
+                namespace: The namespace of the object
+
+                identifier: The identifier of the object
+        """
+        self.object_files.pop((namespace, identifier), None)
+
+    def count_instances(self, map_id, instances):
+        """Replaces the counts of a map with the counts of instances
+
+            Args:
+
+                map_id: The identifier of the map
+
+                instances: An iterable of all fife.Instance instances of
+                the map
+        """
+        get_filename = self.get_filename
+        counts = Counter(get_filename(instance.getObject())
+                         for instance in instances)
+        self.maps[map_id] = counts
+
+    def add(self, map_id, filename, amount=1):
+        """Adds instances of the objects of a file to a tracked map
+
+            Args:
+
+                map_id: The identifier of the map
+
+                filename: The file of the objects
+
+                amount: The number of instances
+        """
+        counts = self.maps.get(map_id)
+        if counts is None:
+            return
+        counts[filename] += amount
+
+    def remove(self, map_id, filename, amount=1):
+        """Removes instances of the objects of a file from a map
+
+            Args:
+
+                map_id: The identifier of the map
+
+                filename: The file of the objects
+
+                amount: The number of instances
+        """
+        counts = self.maps.get(map_id)
+        if counts is None or filename not in counts:
+            return
+        counts[filename] -= amount
+        if counts[filename] <= 0:
+            del counts[filename]
+
+    def update(self, map_id, deltas):
+        """Changes the counts of several files of a tracked map at once
+
+            Args:
+
+                map_id: The identifier of the map
+
+                deltas: A dictionary with the files and the number of
+                instances that were added, or removed if negative
+        """
+        counts = self.maps.get(map_id)
+        if counts is None:
+            return
+        for filename, delta in deltas.items():
+            count = counts[filename] + delta
+            if count > 0:
+                counts[filename] = count
+            else:
+                del counts[filename]
+
+    def remove_map(self, map_id):
+        """Removes the counts of a map
+
+            Args:
+
+                map_id: The identifier of the map
+        """
+        self.maps.pop(map_id, None)
+
+    def clear_maps(self):
+        """Removes the counts of all maps"""
+        self.maps = {}
+
+    def clear_object_files(self):
+        """Removes the cached object files"""
+        self.object_files = {}
+
+    def clear(self):
+        """Removes the counts of all maps and the cached object files"""
+        self.clear_maps()
+        self.clear_object_files()
+
+    def get_import_list(self, map_id):
+        """Returns an iterator over the files the map needs to import
+
+            Args:
+
+                map_id: The identifier of the map
+        """
+        counts = self.maps.get(map_id)
+        if counts is None:
+            return iter(())
+        return iter(counts)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains an index of the instances of maps by their identifiers
+
+.. module:: instance_index
+    :synopsis: Index of the instances of maps by their identifiers
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+from builtins import object
+
+from fife import fife
+
+
+class IndexDeleteListener(fife.InstanceDeleteListener):
+
+    """Removes instances from an index, like :class:`InstanceIndex`, when
+    FIFE deletes them. The index needs a deleted method that gets the
+    value of getFifeId of the instance."""
+
+    def __init__(self, index):
+        fife.InstanceDeleteListener.__init__(self)
+        self.index = index
+
+    def onInstanceDeleted(self, instance):  # pylint: disable=invalid-name
+        """Called by FIFE when an instance is deleted
+
+        Args:
+
+            instance: The fife.Instance that is deleted
+        """
+        self.index.deleted(instance.getFifeId())
+
+
+class InstanceIndex(object):
+
+    """Maps the identifiers of the instances of a map to the instances
+
+    The instances of a map are indexed the first time an instance of the
+    map is looked up, and the index is kept current by the editor methods
+    that create, add, remove, delete and rename instances. Instances that
+    FIFE deletes by other means, for example with their layer, are removed
+    by a delete listener. Instances without an identifier are not indexed.
+    """
+
+    def __init__(self):
+        self.maps = {}
+        self.entries = {}
+        self.__listened = set()
+        self.__listener = IndexDeleteListener(self)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def is_indexed(self, map_id):
+        """Returns whether the instances of a map are indexed
+
+            Args:
+
+                map_id: The identifier of the map
+        """
+        return map_id in self.maps
+
+    def build(self, map_id, layers):
+        """Indexes all instances of a map
+
+            Args:
+
+                map_id: The identifier of the map
+
+                layers: The fife.Layer instances of the map
+        """
+        self.remove_map(map_id)
+        self.maps[map_id] = {}
+        for layer in layers:
+            for instance in layer.getInstances():
+                self.add(instance, map_id)
+
+    def add(self, instance, map_id):
+        """Adds an instance to the index, if its map is indexed
+
+            Args:
+
+                instance: The fife.Instance
+
+                map_id: The identifier of the map the instance is on
+        """
+        identifiers = self.maps.get(map_id)
+        if identifiers is None:
+            return
+        fife_id = instance.getFifeId()
+        self.discard(fife_id)
+        identifier = instance.getId()
+        if not identifier:
+            return
+        identifiers.setdefault(identifier, {})[fife_id] = instance
+        self.entries[fife_id] = (map_id, identifier)
+        if fife_id not in self.__listened:
+            instance.addDeleteListener(self.__listener)
+            self.__listened.add(fife_id)
+
+    def remove(self, instance):
+        """Removes an instance that is still alive from the index
+
+            Args:
+
+                instance: The fife.Instance
+        """
+        fife_id = instance.getFifeId()
+        self.discard(fife_id)
+        if fife_id in self.__listened:
+            instance.removeDeleteListener(self.__listener)
+            self.__listened.discard(fife_id)
+
+    def deleted(self, fife_id):
+        """Called by the delete listener when FIFE deletes an instance
+
+            Args:
+
+                fife_id: The value of getFifeId of the instance
+        """
+        self.__listened.discard(fife_id)
+        self.discard(fife_id)
+
+    def discard(self, fife_id):
+        """Removes an instance from the index without accessing it, which
+        is safe while FIFE deletes the instance.
+
+            Args:
+
+                fife_id: The value of getFifeId of the instance
+        """
+        entry = self.entries.pop(fife_id, None)
+        if entry is None:
+            return
+        map_id, identifier = entry
+        instances = self.maps[map_id][identifier]
+        del instances[fife_id]
+        if not instances:
+            del self.maps[map_id][identifier]
+
+    def get(self, map_id, identifier):
+        """Returns an instance with an identifier on a map, or None if the
+        index has no such instance.
+
+            Args:
+
+                map_id: The identifier of the map
+
+                identifier: The identifier of the instance
+        """
+        instances = self.maps[map_id].get(identifier)
+        if not instances:
+            return None
+        for instance in list(instances.values()):
+            if instance.getId() == identifier:
+                return instance
+            # The identifier was changed without the editor knowing
+            self.add(instance, map_id)
+        return None
+
+    def remove_map(self, map_id):
+        """Removes the instances of a map from the index
+
+            Args:
+
+                map_id: The identifier of the map
+        """
+        identifiers = self.maps.pop(map_id, None)
+        if identifiers is None:
+            return
+        for instances in identifiers.values():
+            for fife_id in instances:
+                del self.entries[fife_id]
+
+    def clear(self):
+        """Removes all instances from the index"""
+        self.maps = {}
+        self.entries = {}
+
+    def verify(self, map_id, layers):
+        """Compares the index of a map with the instances on its layers
+
+            Args:
+
+                map_id: The identifier of the map
+
+                layers: The fife.Layer instances of the map
+
+            Returns:
+
+                A list of descriptions of the differences. The list is empty
+                if the index is consistent.
+        """
+        errors = []
+        identifiers = self.maps.get(map_id)
+        if identifiers is None:
+            return errors
+        indexed = set()
+        for identifier, instances in identifiers.items():
+            for fife_id, instance in instances.items():
+                indexed.add(fife_id)
+                if instance.getId() != identifier:
+                    errors.append("Instance %d is indexed as %s but is "
+                                  "named %s" % (fife_id, identifier,
+                                                instance.getId()))
+        on_map = set()
+        for layer in layers:
+            for instance in layer.getInstances():
+                if not instance.getId():
+                    continue
+                fife_id = instance.getFifeId()
+                on_map.add(fife_id)
+                if fife_id not in indexed:
+                    errors.append("Instance %s on layer %s is not indexed" %
+                                  (instance.getId(), layer.getId()))
+        for fife_id in indexed.difference(on_map):
+            errors.append("Instance %d is indexed but not on the map" %
+                          fife_id)
+        return errors
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains a size limited cache that evicts the least recently used items
+
+.. module:: lru_cache
+    :synopsis: Size limited cache that evicts the least recently used items
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+from builtins import object
+from collections import OrderedDict
+import threading
+
+
+class LRUCache(object):
+
+    """A thread safe mapping with a maximum size. When the cache is full the
+    least recently used item is removed.
+
+    Every item can have a stamp, which is passed to the validation function
+    on lookups to find out whether the item is still up to date.
+
+    If a function that returns the memory used by a value is given, the
+    cache also removes items while their memory exceeds the maximum memory.
+    The most recently added item is always kept.
+    """
+
+    def __init__(self, max_size=1024, max_memory=None, get_memory=None):
+        self.max_size = max_size
+        self.max_memory = max_memory
+        self.get_memory = get_memory
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def get(self, key, is_valid=None):
+        """Returns the value of an item, or None if there is no such item or
+        if it is not valid anymore.
+
+            Args:
+
+                key: The key of the item
+
+                is_valid: Optional function that gets the stamp of the item
+                and returns whether the item is still valid. Invalid items are
+                removed from the cache.
+        """
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stamp = entry[:2]
+            if is_valid is not None and not is_valid(stamp):
+                self.memory -= entry[2]
+                self.misses += 1
+                return None
+            self.__entries[key] = entry
+            self.hits += 1
+            return value
+
+    def set(self, key, value, stamp=None):
+        """Adds or replaces an item
+
+            Args:
+
+                key: The key of the item
+
+                value: The value of the item
+
+                stamp: Data that is used to check whether the item is valid
+        """
+        memory = 0 if self.get_memory is None else self.get_memory(value)
+        with self.__lock:
+            self.__pop(key)
+            self.__entries[key] = (value, stamp, memory)
+            self.memory += memory
+            while len(self.__entries) > 1 and (
+                    len(self.__entries) > self.max_size or
+                    (self.max_memory is not None and
+                     self.memory > self.max_memory)):
+                self.memory -= self.__entries.popitem(last=False)[1][2]
+
+    def __pop(self, key):
+        """Removes an item and its memory. Must be called with the lock held.
+
+            Args:
+
+                key: The key of the item
+        """
+        entry = self.__entries.pop(key, None)
+        if entry is not None:
+            self.memory -= entry[2]
+
+    def remove(self, key):
+        """Removes an item, if it is in the cache
+
+            Args:
+
+                key: The key of the item
+        """
+        with self.__lock:
+            self.__pop(key)
+
+    def clear(self):
+        """Removes all items and resets the counters"""
+        with self.__lock:
+            self.__entries.clear()
+            self.memory = 0
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def stats(self):
+        """Returns a dictionary with the hits, misses and size of the cache"""
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.__entries),
+                "max_size": self.max_size,
+                "memory": self.memory}
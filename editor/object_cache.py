@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains the persistent cache for parsed object definitions
+
+.. module:: object_cache
+    :synopsis: Contains the persistent cache for parsed object definitions
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+from builtins import object
+import hashlib
+import os
+import pickle
+import tempfile
+
+
+def file_digest(filename):
+    """Returns the sha1 hex digest of the contents of a file
+
+        Args:
+
+            filename: The path to the file
+    """
+    digest = hashlib.sha1()
+    with open(filename, "rb") as data_file:
+        for chunk in iter(lambda: data_file.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_stamp(filename):
+    """Returns a tuple with the modification time, the size and the digest
+    of a file
+
+        Args:
+
+            filename: The path to the file
+    """
+    stat = os.stat(filename)
+    return (stat.st_mtime, stat.st_size, file_digest(filename))
+
+
+class ObjectCache(object):
+
+    """Stores the parsed contents of object files on disk
+
+    Every object file gets its own entry, which is keyed by the absolute
+    path of the file and the variant of the parsed data. An entry is only
+    used when neither the object file nor any of the files that were read
+    while parsing it (like animation files) have changed since the entry
+    was written.
+    """
+
+    VERSION = 4
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def get_entry_path(self, filename, variant=""):
+        """Returns the path of the cache entry of an object file
+
+            Args:
+
+                filename: The path to the object file
+
+                variant: The name of the variant of the parsed data
+        """
+        filename = os.path.normcase(os.path.abspath(filename))
+        key = "|".join((filename, variant))
+        key = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + ".cache")
+
+    def get_objects(self, filename, parse_func, variant="",
+                    dependencies=None):
+        """Returns the objects of an object file, either from the cache or
+        by parsing the file.
+
+            Args:
+
+                filename: The path to the object file
+
+                parse_func: Function that parses the file. It gets the
+                filename and a set it should add the paths of other files it
+                reads to.
+
+                variant: The name of the variant of the parsed data, if a
+                file is parsed in different ways.
+
+                dependencies: An optional set the paths of the files the
+                objects were read from are added to, except the object file.
+
+            Returns: A list of the parsed objects
+        """
+        filename = os.path.abspath(filename)
+        if dependencies is None:
+            dependencies = set()
+        entry = self.load_entry(filename, variant)
+        if entry is not None:
+            self.hits += 1
+            dependencies.update(path for path in entry["stamps"]
+                                if path != filename)
+            return entry["objects"]
+        self.misses += 1
+        objects = list(parse_func(filename, dependencies))
+        stamps = {}
+        try:
+            for path in dependencies | set((filename,)):
+                stamps[path] = file_stamp(path)
+        except (IOError, OSError):
+            return objects
+        self.store_entry(filename, {"version": self.VERSION,
+                                    "filename": filename,
+                                    "variant": variant,
+                                    "stamps": stamps,
+                                    "objects": objects})
+        return objects
+
+    def load_entry(self, filename, variant=""):
+        """Loads the entry of an object file and returns it, if it is still
+        valid. Returns None otherwise.
+
+            Args:
+
+                filename: The absolute path to the object file
+
+                variant: The name of the variant of the parsed data
+        """
+        entry_path = self.get_entry_path(filename, variant)
+        try:
+            with open(entry_path, "rb") as entry_file:
+                entry = pickle.load(entry_file)
+        except (IOError, OSError):
+            return None
+        except Exception:  # pylint: disable=broad-except
+            self.remove_entry(filename, variant)
+            return None
+        if (not isinstance(entry, dict) or
+                entry.get("version") != self.VERSION or
+                entry.get("filename") != filename or
+                entry.get("variant") != variant):
+            return None
+        stamps = entry["stamps"]
+        refreshed = False
+        for path, (mtime, size, digest) in stamps.items():
+            try:
+                stat = os.stat(path)
+                if stat.st_size != size:
+                    return None
+                if stat.st_mtime != mtime:
+                    # Only touched files still have the same contents
+                    if file_digest(path) != digest:
+                        return None
+                    stamps[path] = (stat.st_mtime, size, digest)
+                    refreshed = True
+            except (IOError, OSError):
+                return None
+        if refreshed:
+            self.store_entry(filename, entry)
+        return entry
+
+    def store_entry(self, filename, entry):
+        """Writes the entry of an object file to the cache directory
+
+            Args:
+
+                filename: The absolute path to the object file
+
+                entry: The dictionary to store
+        """
+        entry_path = self.get_entry_path(filename, entry["variant"])
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            handle, tmp_path = tempfile.mkstemp(dir=self.cache_dir,
+                                                suffix=".tmp")
+            with os.fdopen(handle, "wb") as entry_file:
+                pickle.dump(entry, entry_file, pickle.HIGHEST_PROTOCOL)
+            if os.path.exists(entry_path):
+                os.remove(entry_path)
+            os.rename(tmp_path, entry_path)
+        except (IOError, OSError):
+            pass
+
+    def remove_entry(self, filename, variant=""):
+        """Removes the entry of an object file from the cache
+
+            Args:
+
+                filename: The path to the object file
+
+                variant: The name of the variant of the parsed data
+        """
+        try:
+            os.remove(self.get_entry_path(filename, variant))
+        except (IOError, OSError):
+            pass
+
+    def clear(self):
+        """Removes all entries from the cache"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for entry_name in os.listdir(self.cache_dir):
+            if entry_name.endswith(".cache"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, entry_name))
+                except (IOError, OSError):
+                    pass
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains compact classes for parsed object definitions
+
+.. module:: object_defs
+    :synopsis: Compact classes for parsed object definitions
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+from builtins import object
+try:
+    from sys import intern
+except ImportError:
+    pass  # Python 2 has intern as a builtin
+
+from .object_parser import iterparse_file
+
+FRAME_SEPARATOR = "\n"
+
+
+def _to_int(value, default=0):
+    """Converts a value of an attribute to an integer
+
+        Args:
+
+            value: The string value, or None if the attribute was not set
+
+            default: The value to return if the attribute was not set
+    """
+    if value is None or value == "":
+        return default
+    return int(float(value))
+
+
+class AtlasFrameDef(object):
+
+    """The frame layout of an animation that is stored in an atlas image"""
+
+    __slots__ = ("image", "width", "height")
+
+    def __init__(self, image, width, height):
+        self.image = image
+        self.width = width
+        self.height = height
+
+    @classmethod
+    def from_dict(cls, atlas):
+        """Creates the definition from the dictionary returned by the parser
+
+            Args:
+
+                atlas: The dictionary with the atlas data of an animation
+        """
+        return cls(atlas["image"], _to_int(atlas["width"]),
+                   _to_int(atlas["height"]))
+
+
+class AnimationDef(object):
+
+    """The animation of an action in one direction
+
+    The paths of the frames are stored as a single, interned string, which
+    needs a lot less memory than a list of strings and is shared by all
+    animations with the same frames.
+    """
+
+    __slots__ = ("direction", "delay", "frame_count", "x_offset", "y_offset",
+                 "_frames")
+
+    def __init__(self, direction, delay, frames=(), frame_count=None,
+                 x_offset=0, y_offset=0):
+        self.direction = direction
+        self.delay = delay
+        self._frames = intern(FRAME_SEPARATOR.join(frames))
+        if frame_count is None:
+            frame_count = len(frames)
+        self.frame_count = frame_count
+        self.x_offset = x_offset
+        self.y_offset = y_offset
+
+    @property
+    def frames(self):
+        """Returns a tuple with the paths to the frame images. Empty for
+        animations that are stored in an atlas."""
+        if not self._frames:
+            return ()
+        return tuple(self._frames.split(FRAME_SEPARATOR))
+
+    @property
+    def first_frame(self):
+        """Returns the path to the first frame image"""
+        return self._frames.split(FRAME_SEPARATOR, 1)[0] or None
+
+    @classmethod
+    def from_dict(cls, direction, animation):
+        """Creates the definition from the dictionary returned by the parser
+
+            Args:
+
+                direction: The direction of the animation
+
+                animation: The dictionary with the animation data
+        """
+        frames = animation["frames"]
+        if isinstance(frames, list):
+            return cls(direction, _to_int(animation.get("delay")), frames,
+                       x_offset=_to_int(animation.get("x_offset")),
+                       y_offset=_to_int(animation.get("y_offset")))
+        return cls(direction, _to_int(animation.get("delay")),
+                   frame_count=_to_int(frames))
+
+
+class ActionDef(object):
+
+    """An action of an object with its animations, sorted by direction"""
+
+    __slots__ = ("identifier", "atlas", "animations")
+
+    def __init__(self, identifier, animations, atlas=None):
+        self.identifier = identifier
+        self.animations = tuple(sorted(animations,
+                                       key=lambda ani: ani.direction))
+        self.atlas = atlas
+
+    @property
+    def directions(self):
+        """Returns a list of the directions of the action"""
+        return [animation.direction for animation in self.animations]
+
+    @classmethod
+    def from_dict(cls, identifier, action):
+        """Creates the definition from the dictionary returned by the parser
+
+            Args:
+
+                identifier: The name of the action
+
+                action: The dictionary with the action data
+        """
+        animations = [AnimationDef.from_dict(direction, animation)
+                      for direction, animation in
+                      action["directions"].items()]
+        atlas = None
+        if action["type"] == "single":
+            atlas = AtlasFrameDef.from_dict(action["atlas"])
+        return cls(identifier, animations, atlas)
+
+
+class StaticImageDef(object):
+
+    """The image of a static object in one direction"""
+
+    __slots__ = ("direction", "source", "is_atlas", "xpos", "ypos", "width",
+                 "height", "x_offset", "y_offset")
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, direction, source, is_atlas=False, xpos=0, ypos=0,
+                 width=0, height=0, x_offset=0, y_offset=0):
+        self.direction = direction
+        self.source = source
+        self.is_atlas = is_atlas
+        self.xpos = xpos
+        self.ypos = ypos
+        self.width = width
+        self.height = height
+        self.x_offset = x_offset
+        self.y_offset = y_offset
+    # pylint: enable=too-many-arguments
+
+    @classmethod
+    def from_dict(cls, direction, image):
+        """Creates the definition from the dictionary returned by the parser
+
+            Args:
+
+                direction: The direction of the image
+
+                image: The dictionary with the image data
+        """
+        return cls(direction, image["source"], image["type"] == "atlas",
+                   _to_int(image.get("xpos")), _to_int(image.get("ypos")),
+                   _to_int(image.get("width")), _to_int(image.get("height")),
+                   _to_int(image.get("x_offset")),
+                   _to_int(image.get("y_offset")))
+
+
+class ObjectDef(object):
+
+    """A parsed object definition
+
+    Static objects have images, other objects have actions. Both are sorted
+    by direction, actions are in the order they were defined in.
+
+    Thumbnail definitions only contain the data needed for the preview
+    image: The image with the lowest direction, or the first action with
+    its first animation and frame.
+    """
+
+    __slots__ = ("identifier", "namespace", "static", "blocking", "images",
+                 "actions", "is_thumbnail")
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, identifier, namespace, static, blocking=False,
+                 images=(), actions=(), is_thumbnail=False):
+        self.identifier = identifier
+        self.namespace = namespace
+        self.static = static
+        self.blocking = blocking
+        self.images = tuple(sorted(images, key=lambda image: image.direction))
+        self.actions = tuple(actions)
+        self.is_thumbnail = is_thumbnail
+    # pylint: enable=too-many-arguments
+
+    @property
+    def directions(self):
+        """Returns a list of the directions of the first image or action"""
+        if self.static:
+            return [image.direction for image in self.images]
+        if self.actions:
+            return self.actions[0].directions
+        return []
+
+    @classmethod
+    def from_dict(cls, obj, is_thumbnail=False):
+        """Creates the definition from the dictionary returned by the parser
+
+            Args:
+
+                obj: The dictionary with the object data
+
+                is_thumbnail: Whether the data was parsed in thumbnail mode
+        """
+        attribs = obj["object"]
+        static = _to_int(attribs["static"]) == 1
+        images = []
+        actions = []
+        if static:
+            images = [StaticImageDef.from_dict(direction, image)
+                      for direction, image in obj["directions"].items()]
+        else:
+            actions = [ActionDef.from_dict(identifier, action)
+                       for identifier, action in obj["actions"].items()]
+        return cls(attribs["id"], attribs.get("namespace"), static,
+                   _to_int(attribs.get("blocking")) == 1, images, actions,
+                   is_thumbnail)
+
+
+def parse_object_defs(filename, dependencies=None, thumbnail=False):
+    """Generator that parses an fife object definition file and yields the
+    objects as :class:`ObjectDef` instances.
+
+        Args:
+
+            filename: The path to the object file.
+
+            dependencies: An optional set the paths of other files that are
+            read while parsing are added to.
+
+            thumbnail: If True only the data needed for a preview image of
+            the objects is parsed.
+    """
+    for obj in iterparse_file(filename, dependencies, thumbnail):
+        yield ObjectDef.from_dict(obj, thumbnail)
+
+
+def parse_thumbnail_defs(filename, dependencies=None):
+    """Generator that parses an fife object definition file in thumbnail
+    mode and yields the objects as :class:`ObjectDef` instances.
+
+        Args:
+
+            filename: The path to the object file.
+
+            dependencies: An optional set the paths of other files that are
+            read while parsing are added to.
+    """
+    return parse_object_defs(filename, dependencies, True)
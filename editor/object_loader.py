@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains the loader that parses object files, sequentially or in
+parallel worker processes.
+
+.. module:: object_loader
+    :synopsis: Parses object files, sequentially or in worker processes
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+from __future__ import print_function
+
+from builtins import object
+import multiprocessing
+
+from .object_cache import ObjectCache
+from .object_defs import parse_object_defs, parse_thumbnail_defs
+
+
+def load_object_file(args):
+    """Parses an object file and returns the filename and the parsed
+    objects. Used by the worker processes of the pool.
+
+        Args:
+
+            args: A tuple with the path to the object file, the cache
+            directory and whether to parse in thumbnail mode. If the cache
+            directory is None the cache will not be used.
+
+        Returns: A tuple with the filename, a list of
+        :class:`.object_defs.ObjectDef` instances and a set with the paths
+        of the other files that were read, like animation files.
+    """
+    filename, cache_dir, thumbnail = args
+    if thumbnail:
+        parse_func, variant = parse_thumbnail_defs, "thumbnail"
+    else:
+        parse_func, variant = parse_object_defs, ""
+    dependencies = set()
+    try:
+        if cache_dir is None:
+            objects = list(parse_func(filename, dependencies))
+        else:
+            cache = ObjectCache(cache_dir)
+            objects = cache.get_objects(filename, parse_func, variant,
+                                        dependencies)
+    except Exception as error:  # pylint: disable=broad-except
+        print("Could not parse object file %s: %s" % (filename, error))
+        objects = []
+    return filename, objects, dependencies
+
+
+def load_object_files(args_list):
+    """Parses several object files with :func:`load_object_file` and
+    returns a list of the results. Used by the worker processes of the pool.
+
+        Args:
+
+            args_list: A list of the args of :func:`load_object_file`
+    """
+    return [load_object_file(args) for args in args_list]
+
+
+class ObjectLoader(object):
+
+    """Parses object files and returns their object definitions
+
+    If more than one process is requested the files are parsed by a pool of
+    worker processes and the results are returned in the order the workers
+    finish them. Closing the loader ends the loading of the files, so a
+    thread that waits for results is not blocked by the stopped pool.
+    """
+
+    CHUNK_SIZE = 8
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, processes=0, cache_dir=None):
+        self.processes = processes
+        self.cache_dir = cache_dir
+        self.__pool = None
+
+    @property
+    def is_parallel(self):
+        """Returns whether the files are parsed by worker processes"""
+        return self.processes > 1
+
+    def get_pool(self):
+        """Returns the pool of worker processes, creates it if needed"""
+        if self.__pool is None:
+            # Forking the editor process, with its running threads and
+            # renderer, is not safe.
+            get_context = getattr(multiprocessing, "get_context", None)
+            context = get_context("spawn") if get_context else multiprocessing
+            self.__pool = context.Pool(self.processes)
+        return self.__pool
+
+    def load(self, filenames, thumbnail=False):
+        """Generator that parses object files and yields tuples with the
+        filename, a list of the objects in the file and a set of the other
+        files that were read.
+
+            Args:
+
+                filenames: The paths of the object files
+
+                thumbnail: If True only the data needed for preview images of
+                the objects is parsed.
+        """
+        args = [(filename, self.cache_dir, thumbnail)
+                for filename in filenames]
+        if not self.is_parallel or len(args) <= 1:
+            for arg in args:
+                yield load_object_file(arg)
+            return
+        pool = self.get_pool()
+        # The files are chunked here, because the iterator that imap_unordered
+        # returns for chunks can not wait with a timeout.
+        chunks = [args[index:index + self.CHUNK_SIZE]
+                  for index in range(0, len(args), self.CHUNK_SIZE)]
+        results = pool.imap_unordered(load_object_files, chunks)
+        while True:
+            # A terminated pool does not deliver the remaining results
+            if self.__pool is not pool:
+                return
+            try:
+                chunk_results = results.next(self.POLL_INTERVAL)
+            except multiprocessing.TimeoutError:
+                continue
+            except StopIteration:
+                return
+            for result in chunk_results:
+                yield result
+
+    def load_object(self, filename, identifier):
+        """Parses the full definition of a single object in the calling
+        thread and returns it, or None if the file has no such object.
+
+            Args:
+
+                filename: The path to the object file
+
+                identifier: The name of the object
+        """
+        for obj in load_object_file((filename, self.cache_dir, False))[1]:
+            if obj.identifier == identifier:
+                return obj
+        return None
+
+    def close(self):
+        """Stops the worker processes. Running calls of :meth:`load` stop
+        yielding results."""
+        pool, self.__pool = self.__pool, None
+        if pool is not None:
+            pool.terminate()
+            pool.join()
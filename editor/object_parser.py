@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains functions for parsing fife object definition files
+
+.. module:: object_parser
+    :synopsis: Contains functions for parsing fife object definition files
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+import os
+
+from lxml import etree
+
+from .lru_cache import LRUCache
+
+ANIMATION_CACHE = LRUCache(4096)
+"""Parsed animation files, shared by all object files of the process"""
+
+ATLAS_CACHE = LRUCache(256)
+"""Parsed atlas definitions, shared by all object files of the process"""
+
+
+def iterparse_file(filename, dependencies=None, thumbnail=False):
+    """Generator that parses an fife object definition file incrementally
+    and yields the objects. Elements are discarded as soon as they were
+    processed, so the memory used does not depend on the size of the
+    file.
+
+        Args:
+
+            filename: The path to the object file.
+
+            dependencies: An optional set the paths of other files that are
+            read while parsing are added to.
+
+            thumbnail: If True only the data needed for a preview image of
+            the object is parsed.
+    """
+    root_path = os.path.dirname(filename)
+    atlas_def = dict()
+    # Objects can use atlases that are defined after them. Objects with
+    # images that are not in the atlases read so far are kept until the end
+    # of the file and their images are resolved again then.
+    deferred = []
+    context = etree.iterparse(filename, events=("end",),
+                              tag=("atlas", "object"))
+    for _, element in context:
+        if not _is_top_level(element):
+            continue
+        if element.tag == "atlas":
+            atlas_def.update(load_atlas(element, filename, dependencies))
+            _discard_element(element)
+            continue
+        unresolved = []
+        obj_def = parse_object(element, root_path, atlas_def, dependencies,
+                               thumbnail, unresolved)
+        _discard_element(element)
+        if unresolved:
+            deferred.append((obj_def, unresolved))
+        else:
+            yield obj_def
+    del context
+    for obj_def, unresolved in deferred:
+        dir_defs = obj_def["directions"]
+        for attrib in unresolved:
+            image_def = resolve_image(attrib, root_path, atlas_def)
+            dir_defs[int(image_def["direction"])] = image_def
+        yield obj_def
+
+
+def _is_top_level(element):
+    """Returns whether an element is a direct child of the root element of
+    an object file.
+
+        Args:
+
+            element: The etree element to check
+    """
+    parent = element.getparent()
+    if parent is None or parent.getparent() is not None:
+        return False
+    assert(parent.tag == "assets")
+    return True
+
+
+def _discard_element(element):
+    """Frees an element that was processed by iterparse, together with
+    the already processed elements before it.
+
+        Args:
+
+            element: The etree element to free
+    """
+    element.clear()
+    parent = element.getparent()
+    while element.getprevious() is not None:
+        del parent[0]
+
+
+def get_cache_key(filename):
+    """Returns the key of a file in the shared caches
+
+        Args:
+
+            filename: The path to the file
+    """
+    return os.path.normcase(os.path.normpath(os.path.abspath(filename)))
+
+
+def get_cache_stats():
+    """Returns the hit and miss counters of the shared animation and atlas
+    caches"""
+    return {"animations": ANIMATION_CACHE.stats,
+            "atlases": ATLAS_CACHE.stats}
+
+
+def clear_caches():
+    """Removes everything from the shared animation and atlas caches"""
+    ANIMATION_CACHE.clear()
+    ATLAS_CACHE.clear()
+
+
+def _get_mtime(filename):
+    """Returns the modification time of a file, or None if it can not be
+    read.
+
+        Args:
+
+            filename: The path to the file
+    """
+    try:
+        return os.path.getmtime(filename)
+    except OSError:
+        return None
+
+
+def _is_source_unchanged(stamp):
+    """Returns whether the file a cached item was read from is unchanged
+
+        Args:
+
+            stamp: A tuple with the path and the modification time of the file
+    """
+    filename, mtime = stamp
+    return _get_mtime(filename) == mtime
+
+
+def load_atlas(element, filename, dependencies=None):
+    """Returns the definition of an atlas. Definitions are cached by the
+    object file that defines them and the atlas image, because object files
+    using the same image can define different subimages of it.
+
+        Args:
+
+            element: The etree element that contains the definition
+
+            filename: The path of the object file the element is in
+
+            dependencies: An optional set the path of the object file that
+            defines the atlas is added to.
+
+        Returns: A dictionary with images and their positions in an atlas
+    """
+    root_path = os.path.dirname(filename)
+    source = os.path.abspath(os.path.join(root_path,
+                                          element.attrib["source"]))
+    if dependencies is not None:
+        dependencies.add(os.path.abspath(filename))
+    key = (get_cache_key(filename), get_cache_key(source))
+    atlas_def = ATLAS_CACHE.get(key, _is_source_unchanged)
+    if atlas_def is None:
+        atlas_def = parse_atlas(element, root_path)
+        # The object files using the atlas can be in other directories
+        atlas_def["atlas"]["source"] = source
+        ATLAS_CACHE.set(key, atlas_def, (filename, _get_mtime(filename)))
+    return atlas_def
+
+
+def load_animation_file(filename):
+    """Returns the definition of an animation file. Files that were already
+    parsed are taken from the shared animation cache.
+
+        Args:
+
+            filename: The path to the animation file
+    """
+    key = get_cache_key(filename)
+    stamp = (filename, _get_mtime(filename))
+    ani_dict = ANIMATION_CACHE.get(key, _is_source_unchanged)
+    if ani_dict is None:
+        ani_doc = etree.parse(filename)
+        root = ani_doc.getroot()
+        ani_dict = {}
+        ani_dict["delay"] = root.attrib["delay"]
+        ani_dict.update(parse_animation(root, os.path.dirname(filename)))
+        ANIMATION_CACHE.set(key, ani_dict, stamp)
+    return ani_dict
+
+
+def parse_atlas(element, root_path):  # pylint: disable=unused-argument
+    """Parse an atlas definition
+
+        Args:
+
+            element: The etree element that contains the definition
+
+            root_path: The path of the object file the element is in
+
+        Returns: A dictionary with images and their positions in an atlas
+    """
+    atlas_def = {}
+
+    atlas_def["atlas"] = dict(element.attrib)
+    atlas_def["images"] = {}
+    images = element.findall("subimage")
+    for image in images:
+        attribs = dict(image.attrib)
+        image_name = attribs["id"]
+        atlas_def["images"][image_name] = attribs
+
+    return atlas_def
+
+
+def resolve_image(attrib, root_path, atlas_def=None):
+    """Returns the definition of an image of a static object
+
+        Args:
+
+            attrib: A dictionary with the attributes of the image element
+
+            root_path: The path of the object file the element is in
+
+            atlas_def: A dictionary with images and their positions in an atlas
+    """
+    image_def = dict(attrib)
+    source = image_def["source"]
+    if atlas_def and source in atlas_def["images"]:
+        image_def.update(atlas_def["images"][source])
+        image_def["type"] = "atlas"
+        image_def["source"] = atlas_def["atlas"]["source"]
+    else:
+        image_def["type"] = "image"
+    source = os.path.join(root_path, image_def["source"])
+    image_def["source"] = os.path.abspath(source)
+    return image_def
+
+
+def parse_object(obj, root_path, atlas_def=None, dependencies=None,
+                 thumbnail=False, unresolved=None):
+    """Parse an object definition
+
+        Args:
+
+            obj: The etree element containing the definition
+
+            root_path: The path of the object file the element is in
+
+            atlas_def: A dictionary with images and their positions in an atlas
+
+            dependencies: An optional set the paths of other files that are
+            read while parsing are added to.
+
+            thumbnail: If True only the first action or the image with the
+            lowest direction is parsed.
+
+            unresolved: An optional list the attributes of the images that
+            are not in the atlas are added to.
+    """
+    obj_def = {}
+
+    obj_def["object"] = dict(obj.attrib)
+    if int(obj.attrib["static"]) == 0:
+        actions = obj.findall("action")
+        if thumbnail:
+            actions = actions[:1]
+        obj_def["actions"] = parse_actions(actions, root_path, dependencies,
+                                           thumbnail)
+    elif int(obj.attrib["static"]) == 1:
+        images = obj.findall("image")
+        if thumbnail and images:
+            images = [min(images,
+                          key=lambda image: int(image.attrib["direction"]))]
+        dir_defs = obj_def["directions"] = {}
+        for image in images:
+            attrib = dict(image.attrib)
+            image_def = resolve_image(attrib, root_path, atlas_def)
+            if unresolved is not None and image_def["type"] == "image":
+                unresolved.append(attrib)
+            direction = int(image_def["direction"])
+            dir_defs[direction] = image_def
+
+    else:
+        raise RuntimeError(_("Don't know how to handle '%s'") % (obj[0].tag))
+    return obj_def
+
+
+def parse_actions(actions, root_path, dependencies=None, thumbnail=False):
+    """Parse action definitions
+
+        Args:
+
+            actions: A list of etree elements containg action definitons
+
+            root_path: The path of the object file the elements are in
+
+            dependencies: An optional set the paths of other files that are
+            read while parsing are added to.
+
+            thumbnail: If True only the animation with the lowest direction
+            of each action and its first frame are returned.
+    """
+    action_dict = {}
+    for action in actions:
+
+        animations = parse_animations(action.findall("animation"), root_path,
+                                      dependencies, thumbnail)
+        action_dict[action.attrib["id"]] = animations
+
+    return action_dict
+
+
+def parse_animations(animations, root_path, dependencies=None,
+                     thumbnail=False):
+    """Parse animation definitions
+
+        Args:
+
+            animations: A list of etree elements containg animation definitons
+
+            root_path: The path of the object file the elements are in
+
+            dependencies: An optional set the paths of other files that are
+            read while parsing are added to.
+
+            thumbnail: If True only the animation with the lowest direction
+            and its first frame are returned.
+    """
+    ani_dict = {}
+
+    if "atlas" in animations[0].attrib:
+        ani_dict["type"] = "single"
+        animation = animations[0]
+        ani_dict.update(parse_animation_atlas(animation, root_path))
+    else:
+        ani_dict["type"] = "multi"
+        ani_dict["directions"] = {}
+        ani_defs = [parse_animation(animation, root_path, dependencies)
+                    for animation in animations]
+        if thumbnail and ani_defs:
+            # The direction of animation files is only known after they
+            # were loaded, which is cheap as they are cached.
+            ani_def = dict(min(ani_defs,
+                               key=lambda ani_def: int(ani_def["direction"])))
+            ani_def["frames"] = ani_def["frames"][:1]
+            ani_defs = [ani_def]
+        for ani_def in ani_defs:
+            direction = int(ani_def["direction"])
+            ani_dict["directions"][direction] = ani_def
+
+    return ani_dict
+
+
+def parse_animation(animation, root_path, dependencies=None):
+    """Parse an animation definition
+
+        Args:
+
+            animation: An etree element containing the definiton
+
+            root_path: The path of the object file the element is in
+
+            dependencies: An optional set the paths of other files that are
+            read while parsing are added to.
+    """
+    ani_dict = {}
+
+    if "source" in animation.attrib:
+        animation_file = animation.attrib["source"]
+        ani_file = os.path.join(root_path, animation_file)
+        if dependencies is not None:
+            dependencies.add(os.path.abspath(ani_file))
+        ani_dict.update(load_animation_file(ani_file))
+    else:
+        frames = []
+        for frame in animation.findall("frame"):
+            source = os.path.join(root_path, frame.attrib["source"])
+            source = os.path.abspath(source)
+            frames.append(source)
+        ani_dict["direction"] = animation.attrib["id"].split(":")[2]
+        ani_dict["frames"] = frames
+        ani_dict["x_offset"] = animation.attrib["x_offset"]
+        ani_dict["y_offset"] = animation.attrib["y_offset"]
+
+    return ani_dict
+
+
+def parse_animation_atlas(animation, root_path):
+    """Parse an animation definition that uses an atlas
+
+        Args:
+
+            animation: An etree element containing the definiton
+
+            root_path: The path of the object file the element is in
+    """
+    ani_dict = {}
+
+    ani_dict["atlas"] = {}
+    image = os.path.join(root_path, animation.attrib["atlas"])
+    ani_dict["atlas"]["image"] = os.path.abspath(image)
+    ani_dict["atlas"]["width"] = animation.attrib["width"]
+    ani_dict["atlas"]["height"] = animation.attrib["height"]
+    ani_dict["directions"] = {}
+    for direction in animation.findall("direction"):
+        action_dir = int(direction.attrib["dir"])
+        dir_data = ani_dict["directions"][action_dir] = {}
+        dir_data["delay"] = direction.attrib["delay"]
+        dir_data["frames"] = direction.attrib["frames"]
+
+    return ani_dict
@@ -23,239 +23,33 @@ from __future__ import division
 
 from future import standard_library
 standard_library.install_aliases()
-from builtins import next
-from past.utils import old_div
-from io import StringIO
 import os
 from queue import Queue, Empty
 import _thread
 
-from lxml import etree
 import PyCEGUI
 from fife import fife
+from fife.extensions.fife_utils import getUserDataDirectory
 
 # pylint: disable=unused-import
 import PyCEGUIOpenGLRenderer  # @UnusedImport
 # pylint: enable=unused-import
 
 from .toolbarpage import ToolbarPage
-from .undo_editor import UndoCreateInstance, UndoRemoveInstance
-
-
-def parse_file(filename):
-    """Generator that parse an fife object definition file and yields the
-    objects.
-
-        Args:
-
-            filename: The path to the object file.
-    """
-    root_path = os.path.dirname(filename)
-    try:
-        tree = etree.parse(filename)
-        """:type : etree._ElementTree"""
-        root = tree.getroot()
-        """:type : etree._Element"""
-        assert(root.tag == "assets")
-        atlas_def = dict()
-        for element in root.findall("atlas"):
-            atlas_def.update(parse_atlas(element, root_path))
-        for obj in root.findall("object"):
-            assert(isinstance(obj, etree._Element))
-            yield parse_object(obj, root_path, atlas_def)
-
-    except etree.XMLSyntaxError as error:
-        # TODO: Should be obsolete with the fife xml update
-
-        assert False
-        doc = file(filename, "r")
-        line_no = error.position[0] - 2
-        lines = doc.readlines()
-        first_doc = StringIO(u"".join(lines[:line_no]))
-        tree = etree.parse(first_doc)
-        root = tree.getroot()
-        proc_instr = root.getprevious()
-        file_type = proc_instr.text.split("=")[1].replace('"', '').lower()
-        if not file_type == "atlas":
-            raise RuntimeError("Unexpected file format '%s'" % (filename))
-        atlas_def = parse_atlas(root, root_path)
-        second_doc = lines[line_no + 1:]
-        second_doc.insert(0, "<namespaces>\n")
-        second_doc.append("</namespaces>\n")
-        second_doc = StringIO(u"".join(second_doc))
-        tree = etree.parse(second_doc)
-        object_defs = tree.getroot().findall("object")
-        for obj in object_defs:
-            yield parse_object(obj, root_path, atlas_def)
-
-def parse_atlas(element, root_path):  # pylint: disable=unused-argument
-    """Parse an atlas definition
-
-        Args:
-
-            element: The etree element that contains the definition
-
-            root_path: The path of the object file the element is in
-
-        Returns: A dictionary with images and their positions in an atlas
-    """
-    atlas_def = {}
-
-    atlas_def["atlas"] = element
-    atlas_def["images"] = {}
-    images = element.findall("subimage")
-    for image in images:
-        attribs = image.attrib
-        image_name = attribs["id"]
-        atlas_def["images"][image_name] = image
-
-    return atlas_def
-
-
-def parse_object(obj, root_path, atlas_def=None):
-    """Parse an object definition
-
-        Args:
-
-            obj: The etree element containing the definition
-
-            root_path: The path of the object file the element is in
-
-            atlas_def: A dictionary with images and their positions in an atlas
-    """
-    obj_def = {}
-
-    obj_def["object"] = dict(obj.attrib)
-    if atlas_def:
-        image_sources = atlas_def["images"]
-    else:
-        image_sources = {}
-    if int(obj.attrib["static"]) == 0:
-        obj_def["actions"] = parse_actions(obj.findall("action"), root_path)
-    elif int(obj.attrib["static"]) == 1:
-        images = obj.findall("image")
-        dir_defs = obj_def["directions"] = {}
-        for image in images:
-            attrib = dict(image.attrib)
-            source = attrib["source"]
-            image_def = attrib
-            if source in image_sources:
-                image_def.update(image_sources[source].attrib)
-                image_def["type"] = "atlas"
-                image_def["source"] = atlas_def["atlas"].attrib["source"]
-            else:
-                image_def["type"] = "image"
-            source = os.path.join(root_path, image_def["source"])
-            image_def["source"] = os.path.abspath(source)
-            direction = int(image_def["direction"])
-            dir_defs[direction] = image_def
-
-    else:
-        raise RuntimeError(_("Don't know how to handle '%s'") % (obj[0].tag))
-    return obj_def
-
-
-def parse_actions(actions, root_path):
-    """Parse action definitions
-
-        Args:
-
-            actions: A list of etree elements containg action definitons
-
-            root_path: The path of the object file the elements are in
-    """
-    action_dict = {}
-    for action in actions:
-
-        animations = parse_animations(action.findall("animation"), root_path)
-        action_dict[action.attrib["id"]] = animations
-
-    return action_dict
-
-
-def parse_animations(animations, root_path):
-    """Parse animation definitions
-
-        Args:
-
-            animations: A list of etree elements containg animation definitons
-
-            root_path: The path of the object file the elements are in
-    """
-    ani_dict = {}
-
-    if "atlas" in animations[0].attrib:
-        ani_dict["type"] = "single"
-        animation = animations[0]
-        ani_dict.update(parse_animation_atlas(animation, root_path))
-    else:
-        ani_dict["type"] = "multi"
-        ani_dict["directions"] = {}
-        for animation in animations:
-            ani_def = parse_animation(animation, root_path)
-            direction = int(ani_def["direction"])
-            ani_dict["directions"][direction] = ani_def
-
-    return ani_dict
-
-
-def parse_animation(animation, root_path):
-    """Parse an animation definition
-
-        Args:
-
-            animation: An etree element containing the definiton
-
-            root_path: The path of the object file the element is in
-    """
-    ani_dict = {}
-
-    if "source" in animation.attrib:
-        animation_file = animation.attrib["source"]
-        ani_file = os.path.join(root_path, animation_file)
-        ani_path = os.path.dirname(ani_file)
-        ani_doc = etree.parse(ani_file)
-        root = ani_doc.getroot()
-        ani_dict["delay"] = root.attrib["delay"]
-        ani_dict.update(parse_animation(root, ani_path))
-    else:
-        frames = []
-        for frame in animation.findall("frame"):
-            source = os.path.join(root_path, frame.attrib["source"])
-            source = os.path.abspath(source)
-            frames.append(source)
-        ani_dict["direction"] = animation.attrib["id"].split(":")[2]
-        ani_dict["frames"] = frames
-        ani_dict["x_offset"] = animation.attrib["x_offset"]
-        ani_dict["y_offset"] = animation.attrib["y_offset"]
-
-    return ani_dict
-
-
-def parse_animation_atlas(animation, root_path):
-    """Parse an animation definition that uses an atlas
-
-        Args:
-
-            animation: An etree element containing the definiton
-
-            root_path: The path of the object file the element is in
-    """
-    ani_dict = {}
-
-    ani_dict["atlas"] = {}
-    image = os.path.join(root_path, animation.attrib["atlas"])
-    ani_dict["atlas"]["image"] = os.path.abspath(image)
-    ani_dict["atlas"]["width"] = animation.attrib["width"]
-    ani_dict["atlas"]["height"] = animation.attrib["height"]
-    ani_dict["directions"] = {}
-    for direction in animation.findall("direction"):
-        action_dir = int(direction.attrib["dir"])
-        dir_data = ani_dict["directions"][action_dir] = {}
-        dir_data["delay"] = direction.attrib["delay"]
-        dir_data["frames"] = direction.attrib["frames"]
-
-    return ani_dict
+from .asset_index import AssetIndex, PaletteIndex, create_watcher
+from .object_loader import ObjectLoader
+from .refresh_worker import RefreshWorker
+from .frame_budget import FrameBudget
+from . import thumbnails
+from .thumbnails import ThumbnailAtlas, ThumbnailCache, ThumbnailDecoder
+from .palette_view import PaletteView
+from .search_index import SearchIndex
+from .texture_cache import TextureCache
+from .brush import BrushStroke
+from .undo_editor import UndoCreateInstances
+from .fill_tools import (LayerCellInstances, get_cell_instances,
+                         get_flood_fill_cells, get_rectangle_cells,
+                         fill_cells)
 
 
 class ObjectToolbar(ToolbarPage):
@@ -263,14 +57,16 @@ class ObjectToolbar(ToolbarPage):
     """A toolbar for displaying and placing static objects on a map"""
     DEFAULT_ALPHA = 0.75
     HIGHLIGHT_ALPHA = 1.0
+    REMOVED = object()
+    TOOLS = ("brush", "rectangle", "fill")
 
     def __init__(self, app):
 
         ToolbarPage.__init__(self, app, "Objects")
 
-        self.namespaces = {}
-        self.images = {}
+        self.palette_index = PaletteIndex()
         self.image_directions = {}
+        self.object_defs = {}
         self.selected_object = [None, None]
         self.is_active = False
         self.cur_rotation = 0
@@ -282,9 +78,33 @@ class ObjectToolbar(ToolbarPage):
         label = self.gui.createChild("TaharezLook/Label",
                                      "ObjectsLabel")
         label.setText(_("Objects"))
-        label.setWidth(width)
+        label.setWidth(PyCEGUI.UDim(0.55, 0.0))
         label.setXPosition(x_pos)
         label.setProperty("HorzFormatting", "LeftAligned")
+        self.label = label
+        self.tool = self.TOOLS[0]
+        tool_button = self.gui.createChild("TaharezLook/Button",
+                                           "ObjectsTool")
+        tool_button.setWidth(PyCEGUI.UDim(0.35, 0.0))
+        tool_button.setXPosition(PyCEGUI.UDim(0.55, x_adjust))
+        tool_button.setTooltipText(_("Click to switch the placement tool"))
+        tool_button.subscribeEvent(PyCEGUI.PushButton.EventClicked,
+                                   self.cb_tool_clicked)
+        self.tool_button = tool_button
+        self.update_tool_button()
+        self.shown_progress = None
+        y_pos.d_scale = y_pos.d_scale + 0.045
+        search_box = self.gui.createChild("TaharezLook/Editbox",
+                                          "ObjectsSearch")
+        search_box.setWidth(width)
+        search_box.setXPosition(x_pos)
+        search_box.setYPosition(y_pos)
+        search_box.setTooltipText(_("Search objects by name or file"))
+        search_box.subscribeEvent(PyCEGUI.Editbox.EventTextChanged,
+                                  self.cb_search_changed)
+        self.search_box = search_box
+        self.search_index = SearchIndex()
+        self.is_filter_stale = False
         items_panel = self.gui.createChild("TaharezLook/ScrollablePane",
                                            "Items_panel")
         y_pos.d_scale = y_pos.d_scale + 0.045
@@ -295,17 +115,24 @@ class ObjectToolbar(ToolbarPage):
         size.d_width.d_offset = size.d_width.d_offset - x_adjust
         items_panel.setSize(size)
         self.items_panel = items_panel
-        self.items = self.items_panel.createChild("VerticalLayoutContainer",
-                                                  "Items")
+        row_height = self.app.settings.get("fife-rpg", "PaletteRowHeight", 64)
+        self.palette_view = PaletteView(items_panel, self.create_cell,
+                                        self.bind_cell, row_height)
+        self.items = self.palette_view.content
         self.have_objects_changed = False
         self.app.add_map_switch_callback(self.cb_map_changed)
         self.last_mouse_pos = None
         self.last_instance = None
+        self.last_instance_data = None
+        self.stroke = None
+        self.rectangle_start = None
         mode = self.app.current_mode
         mode.listener.add_callback("mouse_pressed",
                                    self.cb_map_clicked)
         mode.listener.add_callback("mouse_dragged",
-                                   self.cb_map_clicked)
+                                   self.cb_map_dragged)
+        mode.listener.add_callback("mouse_released",
+                                   self.cb_map_released)
         mode.listener.add_callback("mouse_moved",
                                    self.cb_map_moved)
         mode.listener.add_callback("key_pressed",
@@ -313,8 +140,44 @@ class ObjectToolbar(ToolbarPage):
         self.app.add_map_switch_callback(self.map_switch)
         self.app.add_objects_imported_callback(self.cb_objects_imported)
         self.objects = Queue()
-        self.images_lock = _thread.allocate_lock()
-        self.namespaces_lock = _thread.allocate_lock()
+        data_dir = getUserDataDirectory("fife", "frpg-editor")
+        cache_dir = self.app.settings.get("fife-rpg", "ObjectCacheDir", "")
+        if not cache_dir:
+            cache_dir = os.path.join(data_dir, "object_cache")
+        processes = self.app.settings.get("fife-rpg", "ObjectParseProcesses",
+                                          0)
+        self.object_loader = ObjectLoader(processes, cache_dir)
+        self.asset_index = AssetIndex()
+        self.changed_paths = set()
+        self.changed_paths_lock = _thread.allocate_lock()
+        poll_interval = self.app.settings.get("fife-rpg", "AssetPollInterval",
+                                              2.0)
+        self.asset_watcher = create_watcher(self.cb_assets_changed,
+                                            poll_interval)
+        self.refresh_worker = RefreshWorker(self.update_objects_threaded)
+        frame_budget = self.app.settings.get("fife-rpg", "PaletteFrameBudget",
+                                             4.0)
+        self.frame_budget = FrameBudget(frame_budget / 1000.0)
+        texture_memory = self.app.settings.get("fife-rpg",
+                                               "PaletteTextureMemory", 64)
+        self.texture_cache = TextureCache(texture_memory * 1024 * 1024)
+        self.thumbnail_atlas = None
+        self.thumbnail_decoder = None
+        self.pending_previews = {}
+        if thumbnails.is_available():
+            page_size = self.app.settings.get("fife-rpg", "ThumbnailPageSize",
+                                              1024)
+            thumbnail_size = self.app.settings.get("fife-rpg",
+                                                   "ThumbnailSize", 64)
+            thumbnail_cache = ThumbnailCache(
+                os.path.join(data_dir, "thumbnail_cache"), thumbnail_size)
+            self.thumbnail_atlas = ThumbnailAtlas(page_size)
+            decode_threads = self.app.settings.get(
+                "fife-rpg", "ThumbnailDecodeThreads", 2)
+            source_memory = self.app.settings.get(
+                "fife-rpg", "ThumbnailSourceMemory", 32)
+            self.thumbnail_decoder = ThumbnailDecoder(
+                decode_threads, thumbnail_cache, source_memory * 1024 * 1024)
 
     def image_clicked(self, args):
         """Called when the user clicked on an image
@@ -323,19 +186,76 @@ class ObjectToolbar(ToolbarPage):
 
                 args: The args of the event
         """
-        self.images_lock.acquire()
-        identifier = args.window.getName()
-        image = self.images[identifier]
-        obj_data = image.user_data
-        if identifier not in self.images:
+        obj_data = args.window.user_data
+        if obj_data is None:
             return
-        if self.selected_object[0] is not None:
-            old_identifier = ".".join(self.selected_object)
-            self.images[old_identifier].setAlpha(self.DEFAULT_ALPHA)
-        self.images[identifier].setAlpha(self.HIGHLIGHT_ALPHA)
-        self.selected_object = obj_data
+        identifier = ".".join(obj_data)
+        if identifier not in self.palette_view:
+            return
+        obj_def = self.get_object_def(*obj_data)
+        self.selected_object = list(obj_data)
+        self.palette_view.refresh()
+        if obj_def is not None and obj_def.directions:
+            self.image_directions[identifier] = obj_def.directions
         self.cur_rotation = self.image_directions[identifier][0]
-        self.images_lock.release()
+
+    def create_cell(self, parent):
+        """Creates a window for a row of the palette
+
+            Args:
+
+                parent: The window the new window is added to
+
+            Returns: The new window
+        """
+        cell = parent.createChild("TaharezLook/StaticImage")
+        cell.user_data = None
+        cell.subscribeEvent(PyCEGUI.Window.EventMouseClick,
+                            self.image_clicked)
+        return cell
+
+    def bind_cell(self, cell, name, obj_data):
+        """Shows a palette entry in a window of the palette
+
+            Args:
+
+                cell: The window
+
+                name: The namespace and name of the object, joined by a dot
+
+                obj_data: A tuple with the namespace and name of the object
+        """
+        cell.user_data = obj_data
+        cell.setTooltipText(name)
+        if PyCEGUI.ImageManager.getSingleton().isDefined(name):
+            cell.setProperty("Image", name)
+        else:
+            # The preview is still being decoded
+            cell.setProperty("Image", "")
+        if list(obj_data) == self.selected_object:
+            cell.setAlpha(self.HIGHLIGHT_ALPHA)
+        else:
+            cell.setAlpha(self.DEFAULT_ALPHA)
+
+    def get_object_def(self, namespace, identifier):
+        """Returns the full definition of an object. The palette only
+        parses the data needed for the preview images, so the full
+        definition is parsed when it is first needed.
+
+            Args:
+
+                namespace: The namespace of the object
+
+                identifier: The name of the object
+        """
+        name = ".".join((namespace, identifier))
+        if name not in self.object_defs:
+            filename = self.palette_index.get_file(namespace, identifier)
+            if filename is None:
+                return None
+            self.object_defs[name] = self.object_loader.load_object(
+                filename, identifier)
+        return self.object_defs[name]
 
     def map_switch(self, old_map, name):
         self.have_objects_changed = True
@@ -343,179 +263,387 @@ class ObjectToolbar(ToolbarPage):
     def update_contents(self):
         """Update the contents of the toolbar page"""
         if self.have_objects_changed and self.is_active:
-            _thread.start_new(self.update_objects_threaded, ())
-        elif self.is_active:
-            self.process_object()
+            self.have_objects_changed = False
+            self.refresh_worker.request()
+        if self.stroke is not None:
+            # The cells of a stroke are painted once per frame
+            self.stroke.flush()
+        if self.is_active:
+            self.process_objects()
+            if self.is_filter_stale:
+                self.is_filter_stale = False
+                self.apply_filter(scroll_to_top=False)
+            self.palette_view.update()
+            self.update_progress()
         ToolbarPage.update_contents(self)
 
-    def update_objects_threaded(self):
-        """Update the contents of the toolbar page"""
-        self.namespaces_lock.acquire()
-        self.have_objects_changed = False
-        self.namespaces = {}
+    def cb_search_changed(self, args):
+        """Called when the text of the search box changed
+
+            Args:
+
+                args: The args of the event
+        """
+        self.apply_filter()
+
+    def apply_filter(self, scroll_to_top=True):
+        """Shows only the objects that match the text of the search box
+
+            Args:
+
+                scroll_to_top: Whether to scroll to the first object
+        """
+        text = self.search_box.getText().strip()
+        if not text:
+            if self.palette_view.filter is not None:
+                self.palette_view.set_filter(None, scroll_to_top)
+            return
+        self.palette_view.set_filter(self.search_index.search(text),
+                                     scroll_to_top)
+
+    def update_progress(self):
+        """Shows the progress of the palette refresh in the label"""
+        stats = self.refresh_worker.stats
+        if stats["running"]:
+            progress = (stats["done"], stats["total"])
+        else:
+            memory = self.get_memory_usage()
+            progress = (stats["last_duration"], memory["textures"],
+                        memory["gpu_memory"], memory["host_memory"])
+        if progress == self.shown_progress:
+            return
+        self.shown_progress = progress
+        if stats["running"]:
+            self.label.setText(_("Objects (%d/%d files)") % progress)
+            return
+        self.label.setText(_("Objects"))
+        duration, textures, gpu_memory, host_memory = progress
+        tooltip = _("%d textures, %.1f MB video memory, %.1f MB memory") % (
+            textures, gpu_memory / 1048576.0, host_memory / 1048576.0)
+        if duration is not None:
+            tooltip = "\n".join(
+                (_("Last refresh took %.2f seconds") % duration, tooltip))
+        self.label.setTooltipText(tooltip)
+
+    def get_memory_usage(self):
+        """Returns a dictionary with the number of textures of the palette
+        and the video and host memory they use"""
+        stats = self.texture_cache.stats
+        usage = {"textures": stats["textures"],
+                 "gpu_memory": stats["gpu_memory"],
+                 "host_memory": 0}
+        if self.thumbnail_atlas is not None:
+            atlas_stats = self.thumbnail_atlas.stats
+            usage["textures"] += atlas_stats["pages"]
+            usage["gpu_memory"] += atlas_stats["gpu_memory"]
+            usage["host_memory"] += atlas_stats["host_memory"]
+        if self.thumbnail_decoder is not None:
+            usage["host_memory"] += self.thumbnail_decoder.source_memory
+        return usage
+
+    def update_objects_threaded(self, task):
+        """Update the contents of the toolbar page. Runs in the thread of
+        the refresh worker.
+
+            Args:
+
+                task: The :class:`.refresh_worker.RefreshTask` of the run
+        """
         model = self.app.engine.getModel()
         namespaces = model.getNamespaces()
+        model_objects = {}
         for namespace in namespaces:
-            self.namespaces[namespace] = []
             objects = model.getObjects(namespace)
             for fife_object in objects:
-                identifier = fife_object.getId()
-                if identifier in self.namespaces[namespace]:
+                filename = fife_object.getFilename()
+                model_objects[(namespace, fife_object.getId())] = filename
+
+        added, removed = self.asset_index.get_changes(
+            set(model_objects.values()))
+        self.changed_paths_lock.acquire()
+        changed_paths, self.changed_paths = self.changed_paths, set()
+        self.changed_paths_lock.release()
+        changed = self.asset_index.get_affected_files(changed_paths)
+        changed.update(self.asset_index.get_modified_files())
+        # Objects that were removed from the palette earlier, but are back
+        # in the model, need their file to be read again. Only objects that
+        # the indexed file defines count, otherwise the file would be read
+        # on every refresh.
+        for obj in set(model_objects).difference(self.palette_index):
+            filename = model_objects[obj]
+            if obj in self.asset_index.get_file_objects(filename):
+                changed.add(filename)
+        changed.difference_update(removed)
+        for filename in removed:
+            self.remove_file_objects(filename)
+        for filename in changed:
+            self.remove_file_objects(filename)
+        for namespace, identifier in self.palette_index.get_stale(
+                model_objects):
+            self.remove_object(namespace, identifier)
+
+        filenames = added + list(changed)
+        task.set_progress(0, len(filenames))
+        loaded = self.object_loader.load(filenames, thumbnail=True)
+        for done, (filename, objects, dependencies) in enumerate(loaded, 1):
+            file_objects = set()
+            for obj in objects:
+                namespace, identifier = obj.namespace, obj.identifier
+                file_objects.add((namespace, identifier))
+                if (namespace, identifier) not in model_objects:
                     continue
-                if identifier in self.images:
+                if not self.palette_index.add(namespace, identifier,
+                                              filename):
                     continue
-                filename = fife_object.getFilename()
+                name = ".".join((namespace, identifier))
+                self.search_index.add(name, (name, filename))
+                self.objects.put((namespace, obj))
+            self.asset_index.update_file(filename, file_objects, dependencies)
+            self.is_filter_stale = True
+            task.set_progress(done, len(filenames))
+            if task.is_cancelled():
+                # Files that were not indexed yet are picked up by the
+                # next refresh.
+                loaded.close()
+                break
+        self.asset_watcher.watch(self.asset_index.get_watched_paths())
+
+    def remove_file_objects(self, filename):
+        """Removes the objects of an object file from the palette
+
+            Args:
+
+                filename: The path to the object file
+        """
+        state = self.asset_index.remove_file(filename)
+        if state is None:
+            return
+        for namespace, identifier in state.objects:
+            self.remove_object(namespace, identifier)
 
-                objects = parse_file(filename)
-                for obj in objects:
-                    identifier = obj["object"]["id"]
-                    if identifier in self.namespaces[namespace]:
-                        continue
-                    if identifier in self.images:
-                        continue
-                    self.namespaces[namespace].append(identifier)
-                    self.objects.put((namespace, obj))
-        self.images_lock.acquire()
-        for image in self.images.values():
-            namespace, image_id = image.user_data
-            if image_id not in self.namespaces[namespace]:
-                wmgr = PyCEGUI.WindowManager.getSingleton()
-                image.getParent().removeChild(image)
-                wmgr.destroyWindow(image)
-                del self.images[image_id]
-        self.images_lock.release()
-        self.namespaces_lock.release()
-
-    def process_object(self):
-        """Processes the next object in the Queue"""
-        try:
-            namespace, obj = self.objects.get_nowait()
-        except Empty:
+    def remove_object(self, namespace, identifier):
+        """Removes an object from the palette
+
+            Args:
+
+                namespace: The namespace of the object
+
+                identifier: The name of the object
+        """
+        filename = self.palette_index.remove(namespace, identifier)
+        if filename is None:
             return
+        name = ".".join((namespace, identifier))
+        self.search_index.remove(name)
+        self.object_defs.pop(name, None)
+        # Removals go through the same queue as additions, so an
+        # object of a changed file is removed before it is added again.
+        self.objects.put((self.REMOVED, name))
+
+    def remove_palette_entry(self, name):
+        """Removes the palette entry of an object
+
+            Args:
+
+                name: The namespace and name of the object, joined by a dot
+        """
+        if self.selected_object[0] is not None and \
+                ".".join(self.selected_object) == name:
+            self.selected_object = [None, None]
+            self.clean_mouse_instance()
+        self.palette_view.remove(name)
+        self.pending_previews.pop(name, None)
+        self.image_directions.pop(name, None)
+        if self.thumbnail_atlas is not None:
+            self.thumbnail_atlas.remove(name)
+        image_manager = PyCEGUI.ImageManager.getSingleton()
+        if image_manager.isDefined(name):
+            image_manager.destroy(name)
+        self.texture_cache.release(name)
+
+    def cb_assets_changed(self, paths):
+        """Called by the asset watcher when watched files changed
+
+            Args:
+
+                paths: The paths of the changed files
+        """
+        self.changed_paths_lock.acquire()
+        self.changed_paths.update(paths)
+        self.changed_paths_lock.release()
+        self.have_objects_changed = True
+
+    def process_objects(self):
+        """Processes queued objects until the time budget of the frame is
+        spent"""
+        self.frame_budget.start_frame()
+        while not self.frame_budget.is_spent():
+            try:
+                namespace, obj = self.objects.get_nowait()
+            except Empty:
+                break
+            if namespace is self.REMOVED:
+                self.remove_palette_entry(obj)
+                continue
+            name = ".".join([namespace, obj.identifier])
+            if name in self.palette_view:
+                continue
+            self.create_palette_image(namespace, obj)
+        if self.thumbnail_atlas is not None:
+            self.process_previews()
+            self.thumbnail_atlas.flush(force=self.objects.empty() and
+                                       not self.pending_previews)
+
+    def process_previews(self):
+        """Adds the previews that were decoded by the thumbnail decoder to
+        the thumbnail atlas, until the time budget of the frame is spent."""
+        added = False
+        while not self.frame_budget.is_spent():
+            result = self.thumbnail_decoder.get_result()
+            if result is None:
+                break
+            (name, obj), image = result
+            if self.pending_previews.get(name) is not obj:
+                # The object was removed, or replaced, while its preview
+                # was decoded
+                continue
+            del self.pending_previews[name]
+            if image is not None:
+                self.thumbnail_atlas.add(name, image)
+            else:
+                self.create_preview_image(name, obj)
+            added = True
+        if added:
+            self.palette_view.refresh()
+
+    def create_palette_image(self, namespace, obj):
+        """Creates the image of an object and adds its entry to the palette
+
+            Args:
+
+                namespace: The namespace of the object
+
+                obj: The :class:`.object_defs.ObjectDef` of the object
+        """
+        image_manager = PyCEGUI.ImageManager.getSingleton()
+        identifier = obj.identifier
+        name = ".".join([namespace, identifier])
+        dirs = obj.directions
+        if not image_manager.isDefined(name):
+            if self.thumbnail_decoder is not None:
+                source, area = self.get_preview_source(obj)
+                self.pending_previews[name] = obj
+                self.thumbnail_decoder.request((name, obj), source, area)
+            else:
+                self.create_preview_image(name, obj)
+        if dirs:
+            self.image_directions[name] = dirs
+        else:
+            self.image_directions[name] = [0]
+        self.palette_view.add(name, (namespace, identifier))
+
+    def get_preview_source(self, obj):
+        """Returns the image file and the area of it that is shown as the
+        preview of an object
+
+            Args:
+
+                obj: The :class:`.object_defs.ObjectDef` of the object
+
+            Returns: A tuple with the path to the image file and a tuple with
+            the position and size of the area, or None if the whole image is
+            used.
+        """
+        if not obj.static:
+            action = obj.actions[0]
+            if action.atlas is not None:
+                atlas = action.atlas
+                # The preview shows the first frame of the atlas
+                return atlas.image, (0, 0, atlas.width, atlas.height)
+            return action.animations[0].first_frame, None
+        image_def = obj.images[0]
+        if image_def.is_atlas:
+            return image_def.source, (image_def.xpos, image_def.ypos,
+                                      image_def.width, image_def.height)
+        return image_def.source, None
+
+    def create_preview_image(self, name, obj):
+        """Creates the preview image of an object with its own texture. Used
+        when the image can not be added to the thumbnail atlas.
+
+            Args:
+
+                name: The name of the image
+
+                obj: The :class:`.object_defs.ObjectDef` of the object
+        """
         vec2f = PyCEGUI.Vector2f
         sizef = PyCEGUI.Sizef
-        cegui_system = PyCEGUI.System.getSingleton()
-        renderer = cegui_system.getRenderer()
         image_manager = PyCEGUI.ImageManager.getSingleton()
-        obj_def = obj["object"]
-        identifier = obj_def["id"]
-        name = ".".join([namespace, identifier])
-        if name in self.images:
-            return
-        img_def = {}
-        img_def["static"] = obj_def["static"]
-        dirs = []
-        if int(obj_def["static"]) == 0:
-            actions = obj["actions"]
-            img_def["actions"] = {}
-            actions_dict = img_def["actions"]
-            action, action_def = next(iter(actions.items()))
-            img_type = action_def["type"]
-            if img_type == "single":
-                atlas_def = action_def["atlas"]
-                fname = atlas_def["image"]
-                if renderer.isTextureDefined(name):
-                    tex = renderer.getTexture(name)
-                else:
-                    tex = renderer.createTexture(name, fname, "FIFE")
-                tex_size = tex.getSize()
-                tex_width = tex_size.d_width
-                frame_width = int(atlas_def["width"])
-                frame_height = int(atlas_def["height"])
-                frames_p_line = old_div(tex_width, frame_width)
-                frame_count = 0
-            dirs_def = action_def["directions"]
-            actions_dict[action] = {}
-            dirs = sorted(dirs_def.keys())
-            dir_def = dirs_def[dirs[0]]
-
-            if img_type == "multi":
-                frame = dir_def["frames"][0]
-                if not renderer.isTextureDefined(name):
-                    tex = renderer.createTexture(name, frame, "FIFE")
-                    pos = vec2f(0, 0)
-                    size = sizef(
-                        tex.getSize().d_width,
-                        tex.getSize().d_height)
-                    area = PyCEGUI.Rectf(pos, size)
-                    image = image_manager.create("BasicImage", name)
-                    image.setTexture(tex)
-                    image.setArea(area)
-            elif img_type == "single":
-                line = old_div(frame_count, frames_p_line)
-                col = frame_count % frames_p_line
-                pos = vec2f(col * frame_width,
-                            line * frame_height)
-                size = sizef(frame_width,
-                             frame_height)
-                area = PyCEGUI.Rectf(pos, size)
-                if not image_manager.isDefined(name):
-                    image = image_manager.create("BasicImage", name)
-                    image.setTexture(tex)
-                    image.setArea(area)
-                frame_count = frame_count + 1
-        elif int(obj_def["static"]) == 1:
-            img_def["directions"] = []
-            dirs_def = obj["directions"]
-            dirs = sorted(dirs_def.keys())
-            dir_def = dirs_def[dirs[0]]
-            source = dir_def["source"]
-            if dir_def["type"] == "atlas":
+        if not obj.static:
+            action = obj.actions[0]
+            animation = action.animations[0]
+            if action.atlas is not None:
+                atlas = action.atlas
+                tex = self.texture_cache.acquire(name, atlas.image, name)
+                # The preview shows the first frame of the atlas
+                pos = vec2f(0, 0)
+                size = sizef(atlas.width, atlas.height)
+            else:
+                tex = self.texture_cache.acquire(
+                    name, animation.first_frame, name)
+                pos = vec2f(0, 0)
+                size = sizef(tex.getSize().d_width,
+                             tex.getSize().d_height)
+        else:
+            image_def = obj.images[0]
+            source = image_def.source
+            if image_def.is_atlas:
                 tex_name = ".".join([source, "atlas"])
-
-                if not renderer.isTextureDefined(tex_name):
-                    tex = renderer.createTexture(tex_name, source, "FIFE")
-                else:
-                    tex = renderer.getTexture(tex_name)
-                pos = vec2f(float(dir_def["xpos"]),
-                            float(dir_def["ypos"]))
-                size = sizef(float(dir_def["width"]),
-                             float(dir_def["height"]))
-                area = PyCEGUI.Rectf(pos, size)
-                image = image_manager.create("BasicImage", name)
-                image.setTexture(tex)
-                image.setArea(area)
-            elif dir_def["type"] == "image":
-                if not renderer.isTextureDefined(name):
-                    tex = renderer.createTexture(name, source, "FIFE")
-                    pos = vec2f(0, 0)
-                    size = sizef(tex.getSize().d_width, tex.getSize().d_height)
-                    area = PyCEGUI.Rectf(pos, size)
-                    image = image_manager.create("BasicImage", name)
-                    image.setTexture(tex)
-                    image.setArea(area)
-        name = ".".join([namespace, identifier])
-        wmgr = PyCEGUI.WindowManager.getSingleton()
-        if name not in self.images:
-            image = wmgr.createWindow(
-                "TaharezLook/StaticImage", name)
-            image.setTooltipText(name)
-            image.setProperty("Image", name)
-            self.items.addChild(image)
-            if dirs:
-                self.image_directions[name] = dirs
+                tex = self.texture_cache.acquire(tex_name, source, name)
+                pos = vec2f(image_def.xpos, image_def.ypos)
+                size = sizef(image_def.width, image_def.height)
             else:
-                self.image_directions[name] = [0]
-            image.setAlpha(self.DEFAULT_ALPHA)
-            image.user_data = [namespace, identifier]
-            image.subscribeEvent(PyCEGUI.Window.EventMouseClick,
-                                 self.image_clicked)
-            self.images_lock.acquire()
-            self.images[name] = image
-            self.images_lock.release()
+                tex = self.texture_cache.acquire(name, source, name)
+                pos = vec2f(0, 0)
+                size = sizef(tex.getSize().d_width,
+                             tex.getSize().d_height)
+        area = PyCEGUI.Rectf(pos, size)
+        image = image_manager.create("BasicImage", name)
+        image.setTexture(tex)
+        image.setArea(area)
+
+    def remove_preview(self):
+        """Finishes the current brush stroke and removes the preview
+        instance that follows the mouse"""
+        self.finish_stroke()
+        self.clean_mouse_instance()
+
+    def release(self):
+        """Stops the worker processes that parse the object files. They
+        are started again by the next refresh."""
+        self.object_loader.close()
+
+    def close(self):
+        """Stops the threads that refresh the palette, watch the object
+        files and decode the previews."""
+        # The refresh is stopped first, as it uses the object loader
+        self.refresh_worker.stop()
+        ToolbarPage.close(self)
+        self.asset_watcher.stop()
+        if self.thumbnail_decoder is not None:
+            self.thumbnail_decoder.stop()
 
     def activate(self):
         """Called when the page gets activated"""
         self.is_active = True
+        self.frame_budget.reset()
 
     def deactivate(self):
         """Called when the page gets deactivated"""
-        namespace, name = self.selected_object
-        if namespace is not None:
-            identifier = ".".join((namespace, name))
-            self.images_lock.acquire()
-            self.images[identifier].setAlpha(self.DEFAULT_ALPHA)
-            self.images_lock.release()
+        self.finish_stroke()
+        if self.selected_object[0] is not None:
+            self.palette_view.refresh()
         self.selected_object = [None, None]
         self.clean_mouse_instance()
         self.is_active = False
@@ -529,10 +657,41 @@ class ObjectToolbar(ToolbarPage):
 
                 new_map_name: Name of the map that was changed to
         """
+        self.finish_stroke()
+        self.clean_mouse_instance()
         self.have_objects_changed = True
 
+    def get_tool_name(self, tool):
+        """Returns the translated name of a placement tool
+
+        Args:
+
+            tool: The name of the tool in TOOLS
+        """
+        names = {"brush": _("Brush"),
+                 "rectangle": _("Rectangle"),
+                 "fill": _("Fill")}
+        return names[tool]
+
+    def update_tool_button(self):
+        """Shows the current placement tool on the tool button"""
+        self.tool_button.setText(self.get_tool_name(self.tool))
+
+    def cb_tool_clicked(self, args):
+        """Called when the tool button was clicked. Switches to the next
+        placement tool."""
+        self.finish_stroke()
+        self.rectangle_start = None
+        index = self.TOOLS.index(self.tool)
+        self.tool = self.TOOLS[(index + 1) % len(self.TOOLS)]
+        self.update_tool_button()
+
     def cb_map_clicked(self, click_point, button):
-        """Called when a position on the screen was clicked
+        """Called when a position on the screen was clicked. The left button
+        places the selected object and the right button removes instances,
+        using the current placement tool. The brush starts a stroke, the
+        rectangle tool remembers the first corner and the fill tool fills the
+        area around the clicked cell.
 
         Args:
 
@@ -541,8 +700,10 @@ class ObjectToolbar(ToolbarPage):
 
             button: The button that was clicked
         """
-        self.clean_mouse_instance()
+        self.finish_stroke()
+        self.rectangle_start = None
         if self.app.editor_gui.selected_layer is None or not self.is_active:
+            self.clean_mouse_instance()
             return
         if (button == fife.MouseEvent.MIDDLE or
                 button == fife.MouseEvent.UNKNOWN_BUTTON):
@@ -551,37 +712,197 @@ class ObjectToolbar(ToolbarPage):
             return
         layer = self.app.current_map.get_layer(
             self.app.editor_gui.selected_layer)
+        object_data = None
+        if button == fife.MouseEvent.LEFT:
+            object_data = tuple(reversed(self.selected_object))
+        if self.tool == "rectangle":
+            self.rectangle_start = (self.get_cell(click_point), layer,
+                                    object_data)
+            return
+        if self.tool == "fill":
+            self.flood_fill(self.get_cell(click_point), layer, object_data)
+            return
+        self.stroke = BrushStroke(self.app.editor, layer, object_data,
+                                  self.cur_rotation,
+                                  self.is_protected_instance)
+        self.paint(click_point)
+
+    def cb_map_dragged(self, click_point, button):
+        """Called when the mouse was moved while a button was pressed
+
+        Args:
+
+            click_point: A fife.ScreenPoint with the the position the mouse is
+            on the screen
+
+            button: The button that is pressed
+        """
+        if self.stroke is None:
+            return
+        self.paint(click_point)
+        self.cb_map_moved(click_point)
+
+    def cb_map_released(self, click_point, button):
+        """Called when a mouse button was released
+
+        Args:
+
+            click_point: A fife.ScreenPoint with the the position the mouse is
+            on the screen
+
+            button: The button that was released
+        """
+        self.finish_stroke()
+        if self.rectangle_start is None:
+            return
+        start, layer, object_data = self.rectangle_start
+        self.rectangle_start = None
+        if not self.is_active:
+            return
+        end = self.get_cell(click_point)
+        cells = get_rectangle_cells(start, end)
+        cell_instances = get_cell_instances(
+            self.app.editor.get_instances_in_rect(layer, start, end),
+            self.is_protected_instance)
+        if object_data is None:
+            description = _("Erase rectangle")
+        else:
+            description = _("Fill rectangle")
+        action = fill_cells(self.app.editor, layer, cells, object_data,
+                            self.cur_rotation, cell_instances, description)
+        self.add_fill_action(action, layer)
+
+    def get_cell(self, click_point):
+        """Returns a tuple with the coordinates of the cell of the selected
+        layer at a position on the screen
+
+        Args:
+
+            click_point: A fife.ScreenPoint with the position on the screen
+        """
         location = self.app.screen_coords_to_map_coords(
             click_point, self.app.editor_gui.selected_layer
         )
-        world = self.app.world
-        for instance in layer.getInstancesAt(location):
-            if world.is_identifier_used(instance.getId()):
-                continue
-            action = UndoRemoveInstance(self.app.editor, instance)
-            action.redo()
-            self.app.editor.undo_manager.add_action(action)
-            self.app.set_selected_object(None)
+        coords = location.getLayerCoordinates()
+        return (coords.x, coords.y, coords.z)
+
+    def flood_fill(self, start, layer, object_data):
+        """Fills the cells around a cell that have the same objects on them
+
+        Args:
+
+            start: A tuple with the coordinates of the cell to start at
 
+            layer: The fife.Layer to fill
+
+            object_data: A tuple with the name and namespace, in that order,
+            of the object to place, or None to remove the instances.
+        """
+        cell_instances = LayerCellInstances(self.app.editor, layer,
+                                            self.is_protected_instance)
+        max_cells = self.app.settings.get("fife-rpg", "FloodFillLimit", 65536)
+        hexagonal = layer.getCellGrid().getType() == "hexagonal"
+        cells = get_flood_fill_cells(start, cell_instances, max_cells,
+                                     hexagonal)
+        if cells is None:
+            import tkinter.messagebox
+            tkinter.messagebox.showinfo(
+                _("Fill area"),
+                _("The area has more than %d cells and was not filled") %
+                max_cells)
+            return
+        if object_data is None:
+            description = _("Erase area")
+        else:
+            description = _("Fill area")
+        action = fill_cells(self.app.editor, layer, cells, object_data,
+                            self.cur_rotation, cell_instances, description)
+        self.add_fill_action(action, layer)
+
+    def add_fill_action(self, action, layer):
+        """Adds the action of a fill to the undo history and selects the last
+        created instance
+
+        Args:
+
+            action: The :class:`.undo.CompoundAction` returned by
+            :func:`.fill_tools.fill_cells`, or None if nothing changed
+
+            layer: The fife.Layer that was filled
+        """
+        if action is None:
+            return
+        self.app.editor.undo_manager.add_action(action)
         map_name = self.app.current_map.name
         if map_name not in self.app.changed_maps:
             self.app.changed_maps.append(map_name)
+        last_action = action.actions[-1]
+        if isinstance(last_action, UndoCreateInstances) and \
+                last_action.instances:
+            self.app.set_selected_object(last_action.instances[-1])
+        else:
+            self.app.set_selected_object(None)
+
+    def paint(self, click_point):
+        """Adds the cell at a position on the screen to the current stroke
+
+        Args:
 
-        if button == fife.MouseEvent.RIGHT:
+            click_point: A fife.ScreenPoint with the position on the screen
+        """
+        location = self.app.screen_coords_to_map_coords(
+            click_point, self.app.editor_gui.selected_layer
+        )
+        self.stroke.add_cell(location.getLayerCoordinates())
+
+    def finish_stroke(self):
+        """Paints the remaining cells of the current stroke and adds it to
+        the undo history as a single action"""
+        if self.stroke is None:
+            return
+        stroke, self.stroke = self.stroke, None
+        action = stroke.finish()
+        if action is None:
             return
-        coords = location.getLayerCoordinates()
-        object_data = list(reversed(self.selected_object))
-        action = UndoCreateInstance(self.app.editor, layer, coords,
-                                    object_data, self.cur_rotation)
-        instance = action.redo()
         self.app.editor.undo_manager.add_action(action)
-        self.app.set_selected_object(instance)
+        map_name = self.app.current_map.name
+        if map_name not in self.app.changed_maps:
+            self.app.changed_maps.append(map_name)
+        if stroke.created:
+            self.app.set_selected_object(stroke.created[-1])
+        else:
+            self.app.set_selected_object(None)
+
+    def is_protected_instance(self, instance):
+        """Returns whether an instance must not be removed by the brush
+
+            Args:
+
+                instance: A fife.Instance
+        """
+        return (self.is_mouse_instance(instance) or
+                self.app.world.is_identifier_used(instance.getId()))
+
+    def is_mouse_instance(self, instance):
+        """Returns whether an instance is the preview instance that follows
+        the mouse
+
+            Args:
+
+                instance: A fife.Instance
+        """
+        return (self.last_instance is not None and
+                instance.getFifeId() == self.last_instance.getFifeId())
 
     def clean_mouse_instance(self):
         """Removes the instance that was created by mouse movement"""
         if self.app.current_map is not None and self.last_instance is not None:
-            self.app.editor.delete_instance(self.last_instance)
+            # The preview instance was not counted as an import, so it is
+            # removed from its layer directly.
+            layer = self.last_instance.getLocation().getLayer()
+            layer.deleteInstance(self.last_instance)
         self.last_instance = None
+        self.last_instance_data = None
         self.last_mouse_pos = None
 
     def cb_map_moved(self, click_point):
@@ -594,10 +915,9 @@ class ObjectToolbar(ToolbarPage):
         """
         if not self.is_active:
             return
-        self.clean_mouse_instance()
-        if self.app.editor_gui.selected_layer is None or not self.is_active:
-            return
-        if self.selected_object[0] is None:
+        if (self.app.editor_gui.selected_layer is None or
+                self.selected_object[0] is None):
+            self.clean_mouse_instance()
             return
         layer = self.app.current_map.get_layer(
             self.app.editor_gui.selected_layer)
@@ -605,13 +925,30 @@ class ObjectToolbar(ToolbarPage):
             click_point, self.app.editor_gui.selected_layer
         )
         coords = location.getLayerCoordinates()
-        self.last_mouse_pos = location
-        object_data = reversed(self.selected_object)
-        self.last_instance = self.app.editor.create_instance(layer, coords,
-                                                             object_data,
-                                                             "__editor_mouse")
+        mouse_pos = (coords.x, coords.y, coords.z)
+        instance_data = (layer.getMap().getId(), layer.getId(),
+                         tuple(self.selected_object))
+        if (self.last_instance is not None and
+                instance_data == self.last_instance_data):
+            # The preview instance is only moved when the mouse enters
+            # another cell.
+            if mouse_pos != self.last_mouse_pos:
+                self.last_mouse_pos = mouse_pos
+                new_location = fife.Location(layer)
+                new_location.setLayerCoordinates(coords)
+                self.last_instance.setLocation(new_location)
+            return
+        self.clean_mouse_instance()
+        namespace, name = self.selected_object
+        fife_object = self.app.engine.getModel().getObject(name, namespace)
+        if fife_object is None:
+            return
+        self.last_instance = layer.createInstance(fife_object, coords,
+                                                  "__editor_mouse")
         fife.InstanceVisual.create(self.last_instance)
         self.last_instance.setRotation(self.cur_rotation)
+        self.last_instance_data = instance_data
+        self.last_mouse_pos = mouse_pos
 
     def cb_key_pressed(self, event):
         """Called when a key was pressed"""
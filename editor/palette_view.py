@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains a list view that only creates windows for the visible rows
+
+.. module:: palette_view
+    :synopsis: List view that only creates windows for the visible rows
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+from __future__ import division
+
+from builtins import object
+from bisect import bisect_left, insort
+import math
+
+import PyCEGUI
+
+
+class PaletteView(object):
+
+    """Shows a sorted list of entries in a scrollable pane
+
+    A filter limits the entries that are shown to a set of names. Only the
+    rows that are visible, plus a few rows above and below them, have
+    windows. The windows are reused for other rows when the pane is
+    scrolled, so the number of windows does not depend on the number of
+    entries.
+    """
+
+    def __init__(self, pane, create_cell, bind_cell, row_height=64,
+                 overscan=2):
+        """Constructor
+
+            Args:
+
+                pane: The ScrollablePane the entries are shown in
+
+                create_cell: Function that creates a new window for a row. It
+                gets the parent window and returns the new window.
+
+                bind_cell: Function that shows an entry in a window. It gets
+                the window, the name of the entry and its data.
+
+                row_height: The height of a row in pixels
+
+                overscan: The number of rows above and below the visible
+                area that also get windows
+        """
+        self.pane = pane
+        self.create_cell = create_cell
+        self.bind_cell = bind_cell
+        self.row_height = row_height
+        self.overscan = overscan
+        self.names = []
+        self.entries = {}
+        self.filter = None
+        self.shown_names = self.names
+        self.cells = {}
+        self.free_cells = []
+        self.content = pane.createChild("DefaultWindow", "Items")
+        self.content.setWidth(PyCEGUI.UDim(1.0, 0.0))
+        self.__shown_range = None
+        self.__is_dirty = True
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, data=None):
+        """Adds an entry
+
+            Args:
+
+                name: The name of the entry, which is also used for sorting
+
+                data: Data that is passed to the bind function
+        """
+        if name in self.entries:
+            return
+        self.entries[name] = data
+        insort(self.names, name)
+        self.__is_dirty = True
+
+    def remove(self, name):
+        """Removes an entry
+
+            Args:
+
+                name: The name of the entry
+        """
+        if self.entries.pop(name, self) is self:
+            return
+        index = bisect_left(self.names, name)
+        del self.names[index]
+        self.__is_dirty = True
+
+    def clear(self):
+        """Removes all entries"""
+        self.names = []
+        self.entries = {}
+        self.__is_dirty = True
+
+    def set_filter(self, names, scroll_to_top=True):
+        """Only shows the entries with the given names
+
+            Args:
+
+                names: A set with the names of the entries to show, or None to
+                show all entries
+
+                scroll_to_top: Whether to scroll to the first entry
+        """
+        self.filter = names
+        if scroll_to_top:
+            self.pane.getVertScrollbar().setScrollPosition(0)
+        self.__is_dirty = True
+
+    def __update_shown_names(self):
+        """Updates the list of the entries that pass the filter"""
+        if self.filter is None:
+            self.shown_names = self.names
+        elif len(self.filter) < len(self.entries):
+            self.shown_names = sorted(name for name in self.filter
+                                      if name in self.entries)
+        else:
+            self.shown_names = [name for name in self.names
+                                if name in self.filter]
+
+    def refresh(self):
+        """Binds all visible windows again, for example because the data of
+        the entries changed."""
+        self.__is_dirty = True
+
+    def get_visible_range(self):
+        """Returns the indices of the first and the last row, exclusive,
+        that should have windows."""
+        scroll_pos = self.pane.getVertScrollbar().getScrollPosition()
+        view_height = self.pane.getViewableArea().getHeight()
+        first = int(scroll_pos // self.row_height) - self.overscan
+        last = (int(math.ceil((scroll_pos + view_height) / self.row_height)) +
+                self.overscan)
+        return max(first, 0), min(last, len(self.shown_names))
+
+    def update(self):
+        """Updates the windows, if the visible rows or the entries
+        changed."""
+        if self.__is_dirty:
+            self.__update_shown_names()
+        visible_range = self.get_visible_range()
+        if not self.__is_dirty and visible_range == self.__shown_range:
+            return
+        self.__is_dirty = False
+        self.__shown_range = visible_range
+        self.content.setHeight(
+            PyCEGUI.UDim(0.0, len(self.shown_names) * self.row_height))
+        first, last = visible_range
+        for index in [index for index in self.cells
+                      if index < first or index >= last]:
+            cell = self.cells.pop(index)
+            cell.hide()
+            self.free_cells.append(cell)
+        for index in range(first, last):
+            cell = self.cells.get(index)
+            if cell is None:
+                if self.free_cells:
+                    cell = self.free_cells.pop()
+                else:
+                    cell = self.create_cell(self.content)
+                    cell.setWidth(PyCEGUI.UDim(1.0, 0.0))
+                    cell.setHeight(PyCEGUI.UDim(0.0, self.row_height))
+                cell.setYPosition(PyCEGUI.UDim(0.0,
+                                               index * self.row_height))
+                cell.show()
+                self.cells[index] = cell
+            name = self.shown_names[index]
+            self.bind_cell(cell, name, self.entries[name])
+
+    @property
+    def window_count(self):
+        """Returns the number of windows the view created"""
+        return len(self.cells) + len(self.free_cells)
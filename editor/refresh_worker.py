@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains a background worker that runs refreshes one at a time
+
+.. module:: refresh_worker
+    :synopsis: Background worker that runs refreshes one at a time
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+from __future__ import print_function
+
+from builtins import object
+import threading
+import time
+
+
+class RefreshTask(object):
+
+    """A single run of the refresh function of a :class:`RefreshWorker`
+
+    The refresh function should check :meth:`is_cancelled` regularly and
+    return early when it is True, because a newer refresh was requested.
+    """
+
+    def __init__(self, worker, generation):
+        self.worker = worker
+        self.generation = generation
+
+    def is_cancelled(self):
+        """Returns whether a newer refresh was requested or the worker was
+        stopped."""
+        return self.worker.is_stale(self.generation)
+
+    def set_progress(self, done, total):
+        """Reports the progress of the refresh
+
+            Args:
+
+                done: The number of finished steps
+
+                total: The total number of steps
+        """
+        self.worker.set_progress(self.generation, done, total)
+
+
+class RefreshWorker(object):
+
+    """Runs a refresh function in a single, long-lived thread
+
+    Requests that arrive while the worker is busy are coalesced, so the
+    function runs at most once more, no matter how many requests came in.
+    A running refresh is told to cancel itself when a newer request
+    arrives.
+    """
+
+    def __init__(self, refresh_func):
+        self.refresh_func = refresh_func
+        self.running = False
+        self.runs = 0
+        self.cancelled_runs = 0
+        self.last_duration = None
+        self.__generation = 0
+        self.__progress = (0, 0)
+        self.__stopped = False
+        self.__lock = threading.Lock()
+        self.__requested = threading.Event()
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def request(self):
+        """Requests a refresh. A refresh that is currently running will be
+        cancelled."""
+        with self.__lock:
+            self.__generation += 1
+        self.__requested.set()
+
+    def is_stale(self, generation):
+        """Returns whether a refresh is outdated
+
+            Args:
+
+                generation: The generation of the refresh
+        """
+        return self.__stopped or generation != self.__generation
+
+    def set_progress(self, generation, done, total):
+        """Sets the progress of a refresh, if it is still current
+
+            Args:
+
+                generation: The generation of the refresh
+
+                done: The number of finished steps
+
+                total: The total number of steps
+        """
+        with self.__lock:
+            if generation == self.__generation:
+                self.__progress = (done, total)
+
+    @property
+    def progress(self):
+        """Returns a tuple with the finished and total steps of the current
+        refresh."""
+        return self.__progress
+
+    @property
+    def stats(self):
+        """Returns a dictionary with the state and timings of the worker"""
+        done, total = self.__progress
+        return {"running": self.running,
+                "done": done,
+                "total": total,
+                "runs": self.runs,
+                "cancelled_runs": self.cancelled_runs,
+                "last_duration": self.last_duration}
+
+    def __run(self):
+        """Waits for requests and runs the refresh function"""
+        while True:
+            self.__requested.wait()
+            if self.__stopped:
+                return
+            with self.__lock:
+                self.__requested.clear()
+                generation = self.__generation
+                self.__progress = (0, 0)
+            task = RefreshTask(self, generation)
+            self.running = True
+            start = time.time()
+            try:
+                self.refresh_func(task)
+            except Exception as error:  # pylint: disable=broad-except
+                print("Refresh failed: %s" % error)
+            finally:
+                self.running = False
+            if task.is_cancelled():
+                self.cancelled_runs += 1
+            else:
+                self.runs += 1
+                self.last_duration = time.time() - start
+
+    def stop(self, timeout=5.0):
+        """Stops the worker and waits for its thread to finish. A running
+        refresh is cancelled.
+
+            Args:
+
+                timeout: The maximum number of seconds to wait. The thread
+                is a daemon, so a refresh that does not finish in time does
+                not keep the editor from quitting.
+        """
+        self.__stopped = True
+        self.__requested.set()
+        self.__thread.join(timeout)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains an index for searching entries by parts of their texts
+
+.. module:: search_index
+    :synopsis: Index for searching entries by parts of their texts
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+from builtins import object
+from bisect import bisect_left
+import re
+import threading
+
+WORD_SEPARATORS = re.compile(r"[./\\_\-\s:]+")
+
+
+def get_trigrams(text):
+    """Returns a set of the three character substrings of a text
+
+        Args:
+
+            text: The text
+    """
+    return set(text[index:index + 3] for index in range(len(text) - 2))
+
+
+def get_words(text):
+    """Returns the text and its parts between separators like dots and
+    slashes, for prefix searches.
+
+        Args:
+
+            text: The text
+    """
+    words = set(word for word in WORD_SEPARATORS.split(text) if word)
+    words.add(text)
+    return words
+
+
+class SearchIndex(object):
+
+    """A thread safe index that finds entries by their texts
+
+    Queries with at least three characters find every entry that has the
+    query anywhere in one of its texts, using an index of the three
+    character substrings. Shorter queries find the entries with a text,
+    or a part of a text between separators, that starts with the query.
+    Searches are case insensitive.
+    """
+
+    def __init__(self):
+        self.texts = {}
+        self.__joined_texts = {}
+        self.__trigrams = {}
+        self.__words = {}
+        self.__sorted_words = None
+        self.__lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self.texts
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, key, texts):
+        """Adds an entry or replaces its texts
+
+            Args:
+
+                key: The key of the entry
+
+                texts: The texts the entry can be found by
+        """
+        texts = tuple(set(text.lower() for text in texts if text))
+        with self.__lock:
+            self.__remove(key)
+            self.texts[key] = texts
+            # A single string is checked a lot faster than each text
+            self.__joined_texts[key] = "\n".join(texts)
+            for text in texts:
+                for trigram in get_trigrams(text):
+                    self.__trigrams.setdefault(trigram, set()).add(key)
+                for word in get_words(text):
+                    keys = self.__words.get(word)
+                    if keys is None:
+                        keys = self.__words[word] = set()
+                        self.__sorted_words = None
+                    keys.add(key)
+
+    def remove(self, key):
+        """Removes an entry
+
+            Args:
+
+                key: The key of the entry
+        """
+        with self.__lock:
+            self.__remove(key)
+
+    def __remove(self, key):
+        """Removes an entry. The lock has to be held by the caller.
+
+            Args:
+
+                key: The key of the entry
+        """
+        texts = self.texts.pop(key, None)
+        if texts is None:
+            return
+        del self.__joined_texts[key]
+        for text in texts:
+            for trigram in get_trigrams(text):
+                keys = self.__trigrams.get(trigram)
+                if keys is None:
+                    continue
+                keys.discard(key)
+                if not keys:
+                    del self.__trigrams[trigram]
+            for word in get_words(text):
+                keys = self.__words.get(word)
+                if keys is None:
+                    continue
+                keys.discard(key)
+                if not keys:
+                    del self.__words[word]
+                    self.__sorted_words = None
+
+    def search(self, query):
+        """Returns a set of the keys of the entries that match a query
+
+            Args:
+
+                query: The text to search for
+        """
+        query = query.strip().lower()
+        with self.__lock:
+            if not query:
+                return set(self.texts)
+            if len(query) < 3:
+                return self.__search_prefix(query)
+            return self.__search_substring(query)
+
+    def __search_prefix(self, query):
+        """Returns the keys of the entries with a word that starts with the
+        query. The lock has to be held by the caller.
+
+            Args:
+
+                query: The lower case text to search for
+        """
+        if self.__sorted_words is None:
+            # Sorting once after a batch of changes is a lot cheaper than
+            # keeping the list sorted on every change.
+            self.__sorted_words = sorted(self.__words)
+        words = self.__sorted_words
+        keys = set()
+        index = bisect_left(words, query)
+        while index < len(words) and words[index].startswith(query):
+            keys.update(self.__words[words[index]])
+            index += 1
+        return keys
+
+    def __search_substring(self, query):
+        """Returns the keys of the entries with a text that contains the
+        query. The lock has to be held by the caller.
+
+            Args:
+
+                query: The lower case text to search for, with at least
+                three characters
+        """
+        trigrams = get_trigrams(query)
+        index = self.__trigrams
+        candidates = None
+        for trigram in sorted(trigrams,
+                              key=lambda trigram: len(index.get(trigram, ()))):
+            keys = index.get(trigram)
+            if not keys:
+                return set()
+            if candidates is None:
+                candidates = set(keys)
+            elif len(keys) > len(candidates) * 4:
+                # Checking the remaining candidates directly is cheaper
+                # than intersecting them with much larger sets.
+                break
+            else:
+                candidates.intersection_update(keys)
+            if not candidates:
+                return candidates
+        if len(trigrams) == 1 and len(query) == 3:
+            return candidates
+        joined_texts = self.__joined_texts
+        return set(key for key in candidates if query in joined_texts[key])
@@ -0,0 +1,438 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains an index of the instances of layers by their cells
+
+.. module:: spatial_index
+    :synopsis: Index of the instances of layers by their cells
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+from __future__ import division
+
+from builtins import object
+
+from .instance_index import IndexDeleteListener
+
+
+def get_layer_key(layer):
+    """Returns the key of a layer in the :class:`SpatialIndex`
+
+        Args:
+
+            layer: A fife.Layer
+    """
+    return (layer.getMap().getId(), layer.getId())
+
+
+def get_instance_cell(instance):
+    """Returns a tuple with the x and y coordinates of the cell an instance
+    is on
+
+        Args:
+
+            instance: A fife.Instance
+    """
+    coords = instance.getLocation().getLayerCoordinates()
+    return (coords.x, coords.y)
+
+
+class LayerGrid(object):
+
+    """The instances of a single layer, grouped into square chunks of
+    cells
+
+    A query only looks at the chunks that overlap the queried area, so its
+    cost depends on the size of the area and not on the number of
+    instances on the layer.
+    """
+
+    CHUNK_SIZE = 16
+
+    def __init__(self):
+        self.chunks = {}
+        self.cells = {}
+
+    def __len__(self):
+        return len(self.cells)
+
+    def add(self, instance, cell):
+        """Adds an instance
+
+            Args:
+
+                instance: The fife.Instance
+
+                cell: A tuple with the x and y coordinates of the cell the
+                instance is on
+        """
+        fife_id = instance.getFifeId()
+        self.remove(fife_id)
+        chunk_key = (cell[0] // self.CHUNK_SIZE, cell[1] // self.CHUNK_SIZE)
+        chunk = self.chunks.setdefault(chunk_key, {})
+        chunk.setdefault(cell, {})[fife_id] = instance
+        self.cells[fife_id] = cell
+
+    def remove(self, fife_id):
+        """Removes an instance
+
+            Args:
+
+                fife_id: The value of getFifeId of the instance
+
+            Returns:
+
+                True if the instance was in the grid, False if not
+        """
+        cell = self.cells.pop(fife_id, None)
+        if cell is None:
+            return False
+        chunk_key = (cell[0] // self.CHUNK_SIZE, cell[1] // self.CHUNK_SIZE)
+        chunk = self.chunks[chunk_key]
+        instances = chunk[cell]
+        del instances[fife_id]
+        if not instances:
+            del chunk[cell]
+            if not chunk:
+                del self.chunks[chunk_key]
+        return True
+
+    def get_point(self, x_pos, y_pos):
+        """Returns a list of the instances on a cell
+
+            Args:
+
+                x_pos: The x coordinate of the cell
+
+                y_pos: The y coordinate of the cell
+        """
+        chunk = self.chunks.get((x_pos // self.CHUNK_SIZE,
+                                 y_pos // self.CHUNK_SIZE))
+        if chunk is None:
+            return []
+        return list(chunk.get((x_pos, y_pos), {}).values())
+
+    def get_rect(self, min_x, min_y, max_x, max_y):
+        """Returns a list of the instances in a rectangle of cells
+
+            Args:
+
+                min_x: The smallest x coordinate of the rectangle
+
+                min_y: The smallest y coordinate of the rectangle
+
+                max_x: The largest x coordinate of the rectangle, inclusive
+
+                max_y: The largest y coordinate of the rectangle, inclusive
+        """
+        size = self.CHUNK_SIZE
+        result = []
+        for chunk_x in range(min_x // size, max_x // size + 1):
+            inside_x = (chunk_x * size >= min_x and
+                        (chunk_x + 1) * size - 1 <= max_x)
+            for chunk_y in range(min_y // size, max_y // size + 1):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk is None:
+                    continue
+                if (inside_x and chunk_y * size >= min_y and
+                        (chunk_y + 1) * size - 1 <= max_y):
+                    for instances in chunk.values():
+                        result.extend(instances.values())
+                    continue
+                for (x_pos, y_pos), instances in chunk.items():
+                    if min_x <= x_pos <= max_x and min_y <= y_pos <= max_y:
+                        result.extend(instances.values())
+        return result
+
+    def get_radius(self, x_pos, y_pos, radius):
+        """Returns a list of the instances on the cells within a distance
+        of a cell
+
+            Args:
+
+                x_pos: The x coordinate of the center cell
+
+                y_pos: The y coordinate of the center cell
+
+                radius: The maximum distance, in cells
+        """
+        size = self.CHUNK_SIZE
+        extent = int(radius)
+        radius_squared = radius * radius
+        result = []
+        for chunk_x in range((x_pos - extent) // size,
+                             (x_pos + extent) // size + 1):
+            for chunk_y in range((y_pos - extent) // size,
+                                 (y_pos + extent) // size + 1):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk is None:
+                    continue
+                for (cell_x, cell_y), instances in chunk.items():
+                    if ((cell_x - x_pos) ** 2 + (cell_y - y_pos) ** 2 <=
+                            radius_squared):
+                        result.extend(instances.values())
+        return result
+
+
+class SpatialIndex(object):
+
+    """Finds the instances of layers by the cells they are on
+
+    The instances of a layer are indexed the first time the layer is
+    queried. After that the index is kept current by the editor methods
+    that create, add, move, remove and delete instances. Instances that
+    FIFE deletes by other means, for example with their layer, are removed
+    by a delete listener. Instances are grouped by the x and y
+    coordinates of their cells; the z coordinate is ignored.
+
+    The cells of the returned instances are checked, so instances that
+    were moved without the editor are not returned for their old cells.
+    They are found at their new cells once they are moved with
+    :meth:`.editor.Editor.move_instance` or the layer is indexed again.
+    """
+
+    def __init__(self):
+        self.layers = {}
+        self.entries = {}
+        self.__listened = set()
+        self.__listener = IndexDeleteListener(self)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def is_indexed(self, layer):
+        """Returns whether the instances of a layer are indexed
+
+            Args:
+
+                layer: The fife.Layer
+        """
+        return get_layer_key(layer) in self.layers
+
+    def get_grid(self, layer):
+        """Returns the :class:`LayerGrid` of a layer. The instances of the
+        layer are indexed, if they are not yet.
+
+            Args:
+
+                layer: The fife.Layer
+        """
+        key = get_layer_key(layer)
+        grid = self.layers.get(key)
+        if grid is None:
+            grid = self.layers[key] = LayerGrid()
+            for instance in layer.getInstances():
+                self.__add(instance, key, grid)
+        return grid
+
+    def __add(self, instance, key, grid):
+        """Adds an instance to the grid of a layer
+
+            Args:
+
+                instance: The fife.Instance
+
+                key: The key of the layer
+
+                grid: The :class:`LayerGrid` of the layer
+        """
+        fife_id = instance.getFifeId()
+        grid.add(instance, get_instance_cell(instance))
+        self.entries[fife_id] = key
+        if fife_id not in self.__listened:
+            instance.addDeleteListener(self.__listener)
+            self.__listened.add(fife_id)
+
+    def add(self, instance, layer):
+        """Adds an instance, if its layer is indexed
+
+            Args:
+
+                instance: The fife.Instance
+
+                layer: The fife.Layer the instance is on
+        """
+        key = get_layer_key(layer)
+        grid = self.layers.get(key)
+        if grid is None:
+            return
+        self.discard(instance.getFifeId())
+        self.__add(instance, key, grid)
+
+    def move(self, instance):
+        """Updates the cell of an instance after it was moved
+
+            Args:
+
+                instance: The fife.Instance
+        """
+        self.add(instance, instance.getLocation().getLayer())
+
+    def remove(self, instance):
+        """Removes an instance that is still alive
+
+            Args:
+
+                instance: The fife.Instance
+        """
+        fife_id = instance.getFifeId()
+        self.discard(fife_id)
+        if fife_id in self.__listened:
+            instance.removeDeleteListener(self.__listener)
+            self.__listened.discard(fife_id)
+
+    def deleted(self, fife_id):
+        """Called by the delete listener when FIFE deletes an instance
+
+            Args:
+
+                fife_id: The value of getFifeId of the instance
+        """
+        self.__listened.discard(fife_id)
+        self.discard(fife_id)
+
+    def discard(self, fife_id):
+        """Removes an instance without accessing it, which is safe while
+        FIFE deletes the instance.
+
+            Args:
+
+                fife_id: The value of getFifeId of the instance
+        """
+        key = self.entries.pop(fife_id, None)
+        if key is not None:
+            self.layers[key].remove(fife_id)
+
+    def remove_layer(self, layer):
+        """Removes the instances of a layer. The layer is indexed again
+        when it is queried the next time, which is needed after its name
+        or cell grid was changed.
+
+            Args:
+
+                layer: The fife.Layer
+        """
+        self.__remove_key(get_layer_key(layer))
+
+    def remove_map(self, map_id):
+        """Removes the instances of all layers of a map
+
+            Args:
+
+                map_id: The identifier of the map
+        """
+        for key in [key for key in self.layers if key[0] == map_id]:
+            self.__remove_key(key)
+
+    def __remove_key(self, key):
+        """Removes the instances of a layer
+
+            Args:
+
+                key: The key of the layer
+        """
+        grid = self.layers.pop(key, None)
+        if grid is None:
+            return
+        for fife_id in grid.cells:
+            del self.entries[fife_id]
+
+    def clear(self):
+        """Removes all instances"""
+        self.layers = {}
+        self.entries = {}
+
+    def __check_cells(self, layer, grid, instances, is_inside):
+        """Returns the instances that are still on the cells they are
+        indexed at, and moves the others to their current cells.
+
+            Args:
+
+                layer: The fife.Layer of the instances
+
+                grid: The :class:`LayerGrid` of the layer
+
+                instances: The instances returned by the grid
+
+                is_inside: Function that gets the x and y coordinates of a
+                cell and returns whether the cell matches the query
+        """
+        cells = grid.cells
+        key = get_layer_key(layer)
+        result = []
+        for instance in instances:
+            cell = get_instance_cell(instance)
+            if cells[instance.getFifeId()] != cell:
+                self.__add(instance, key, grid)
+                if not is_inside(*cell):
+                    continue
+            result.append(instance)
+        return result
+
+    def get_at(self, layer, x_pos, y_pos):
+        """Returns a list of the instances on a cell of a layer
+
+            Args:
+
+                layer: The fife.Layer
+
+                x_pos: The x coordinate of the cell
+
+                y_pos: The y coordinate of the cell
+        """
+        grid = self.get_grid(layer)
+        return self.__check_cells(
+            layer, grid, grid.get_point(x_pos, y_pos),
+            lambda x, y: x == x_pos and y == y_pos)
+
+    def get_in_rect(self, layer, start, end):
+        """Returns a list of the instances in a rectangle of cells of a
+        layer
+
+            Args:
+
+                layer: The fife.Layer
+
+                start: A tuple with the x and y coordinates of a corner
+
+                end: A tuple with the x and y coordinates of the opposite
+                corner, inclusive
+        """
+        min_x, max_x = sorted((start[0], end[0]))
+        min_y, max_y = sorted((start[1], end[1]))
+        grid = self.get_grid(layer)
+        return self.__check_cells(
+            layer, grid, grid.get_rect(min_x, min_y, max_x, max_y),
+            lambda x, y: min_x <= x <= max_x and min_y <= y <= max_y)
+
+    def get_in_radius(self, layer, center, radius):
+        """Returns a list of the instances on the cells of a layer within a
+        distance of a cell
+
+            Args:
+
+                layer: The fife.Layer
+
+                center: A tuple with the x and y coordinates of the center
+                cell
+
+                radius: The maximum distance, in cells
+        """
+        x_pos, y_pos = center[0], center[1]
+        grid = self.get_grid(layer)
+        radius_squared = radius * radius
+        return self.__check_cells(
+            layer, grid, grid.get_radius(x_pos, y_pos, radius),
+            lambda x, y: (x - x_pos) ** 2 + (y - y_pos) ** 2 <=
+            radius_squared)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains a reference counted cache for the textures of the object
+palette
+
+.. module:: texture_cache
+    :synopsis: Reference counted cache for the textures of the object palette
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+from builtins import object
+from collections import OrderedDict
+
+import PyCEGUI
+
+BYTES_PER_PIXEL = 4
+
+
+class TextureEntry(object):
+
+    """A texture in the :class:`TextureCache`"""
+
+    __slots__ = ("texture", "owners", "size")
+
+    def __init__(self, texture, size):
+        self.texture = texture
+        self.owners = set()
+        self.size = size
+
+
+class TextureCache(object):
+
+    """Creates the renderer textures of the palette and destroys them when
+    they are not needed anymore.
+
+    Every texture knows the palette entries that use it. Textures without
+    users are kept for reuse until the memory used by all textures exceeds
+    the limit, then the least recently used of them are destroyed.
+    Textures that are still in use are never destroyed by the cache.
+    """
+
+    def __init__(self, max_memory=64 * 1024 * 1024):
+        self.max_memory = max_memory
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.entries = {}
+        self.owner_textures = {}
+        self.__unused = OrderedDict()
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def acquire(self, name, filename, owner):
+        """Returns a texture, which is created if it is not in the cache,
+        and registers a user of it.
+
+            Args:
+
+                name: The name of the texture
+
+                filename: The path to the image of the texture
+
+                owner: The name of the palette entry that uses the texture
+        """
+        if self.owner_textures.get(owner) == name:
+            self.hits += 1
+            return self.entries[name].texture
+        self.release(owner)
+        entry = self.entries.get(name)
+        if entry is None:
+            self.misses += 1
+            renderer = PyCEGUI.System.getSingleton().getRenderer()
+            if renderer.isTextureDefined(name):
+                texture = renderer.getTexture(name)
+            else:
+                texture = renderer.createTexture(name, filename, "FIFE")
+            tex_size = texture.getSize()
+            entry = TextureEntry(texture, int(tex_size.d_width *
+                                              tex_size.d_height) *
+                                 BYTES_PER_PIXEL)
+            self.entries[name] = entry
+            self.memory += entry.size
+        else:
+            self.hits += 1
+            self.__unused.pop(name, None)
+        entry.owners.add(owner)
+        self.owner_textures[owner] = name
+        self.evict()
+        return entry.texture
+
+    def release(self, owner):
+        """Removes a user from the texture it uses. The texture is destroyed
+        once it has no users and the cache needs the memory.
+
+            Args:
+
+                owner: The name of the palette entry
+        """
+        name = self.owner_textures.pop(owner, None)
+        if name is None:
+            return
+        entry = self.entries[name]
+        entry.owners.discard(owner)
+        if not entry.owners:
+            self.__unused[name] = entry
+            self.evict()
+
+    def evict(self):
+        """Destroys unused textures, least recently used first, until the
+        memory used by the textures is below the limit."""
+        while self.memory > self.max_memory and self.__unused:
+            name, _ = self.__unused.popitem(last=False)
+            self.destroy(name)
+            self.evictions += 1
+
+    def destroy(self, name):
+        """Destroys a texture and removes it from the cache
+
+            Args:
+
+                name: The name of the texture
+        """
+        entry = self.entries.pop(name, None)
+        if entry is None:
+            return
+        self.__unused.pop(name, None)
+        for owner in entry.owners:
+            self.owner_textures.pop(owner, None)
+        self.memory -= entry.size
+        renderer = PyCEGUI.System.getSingleton().getRenderer()
+        if renderer.isTextureDefined(name):
+            renderer.destroyTexture(name)
+
+    def clear(self):
+        """Destroys all textures in the cache"""
+        for name in list(self.entries):
+            self.destroy(name)
+
+    @property
+    def stats(self):
+        """Returns a dictionary with the number of textures, the memory they
+        use and the cache counters"""
+        return {"textures": len(self.entries),
+                "unused": len(self.__unused),
+                "gpu_memory": self.memory,
+                "max_memory": self.max_memory,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions}
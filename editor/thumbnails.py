@@ -0,0 +1,556 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Contains the texture atlas that the preview images of the object palette
+are packed into.
+
+.. module:: thumbnails
+    :synopsis: Texture atlas for the preview images of the object palette
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+from future import standard_library
+standard_library.install_aliases()
+from builtins import object
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from queue import Queue, Empty
+
+import PyCEGUI
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from .lru_cache import LRUCache
+
+
+def get_image_memory(image):
+    """Returns the number of bytes the pixels of a decoded image use
+
+        Args:
+
+            image: The Pillow image
+    """
+    return image.size[0] * image.size[1] * len(image.getbands())
+
+
+def is_available():
+    """Returns whether thumbnails can be packed into an atlas. This
+    requires the Pillow package."""
+    return Image is not None
+
+
+class ShelfPacker(object):
+
+    """Packs rectangles into an area of a fixed size
+
+    The rectangles are placed next to each other on horizontal shelves. A
+    new shelf is started below the last one when a rectangle does not fit
+    on any of the existing shelves. The places of removed rectangles are
+    reused for rectangles that fit into them.
+    """
+
+    def __init__(self, width, height, padding=1):
+        self.width = width
+        self.height = height
+        self.padding = padding
+        self.shelves = []
+        self.free = []
+        self.__next_y = 0
+
+    def remove(self, xpos, ypos, width, height):
+        """Frees the place of a rectangle, so it can be reused
+
+            Args:
+
+                xpos: The x position of the rectangle
+
+                ypos: The y position of the rectangle
+
+                width: The width of the rectangle
+
+                height: The height of the rectangle
+        """
+        self.free.append((width + self.padding, height + self.padding,
+                          xpos, ypos))
+
+    def insert(self, width, height):
+        """Finds a place for a rectangle
+
+            Args:
+
+                width: The width of the rectangle
+
+                height: The height of the rectangle
+
+            Returns: The position of the top left corner of the rectangle, or
+            None if it does not fit.
+        """
+        width += self.padding
+        height += self.padding
+        best_free = None
+        for index, (free_width, free_height, _, _) in enumerate(self.free):
+            if width > free_width or height > free_height:
+                continue
+            if (best_free is None or free_width * free_height <
+                    self.free[best_free][0] * self.free[best_free][1]):
+                best_free = index
+        if best_free is not None:
+            return self.free.pop(best_free)[2:]
+        best_shelf = None
+        for shelf in self.shelves:
+            _, shelf_height, shelf_x = shelf
+            if height > shelf_height or shelf_x + width > self.width:
+                continue
+            if best_shelf is None or shelf_height < best_shelf[1]:
+                best_shelf = shelf
+        if best_shelf is not None:
+            xpos, ypos = best_shelf[2], best_shelf[0]
+            best_shelf[2] += width
+            return xpos, ypos
+        if self.__next_y + height > self.height or width > self.width:
+            return None
+        ypos = self.__next_y
+        self.shelves.append([ypos, height, width])
+        self.__next_y += height
+        return 0, ypos
+
+
+class ThumbnailCache(object):
+
+    """Stores downscaled preview images on disk
+
+    The previews are keyed by the absolute path of the source image, the
+    area of the image that is shown and the modification time of the
+    image, so a preview is generated again when its source changes.
+    """
+
+    def __init__(self, cache_dir, size=64):
+        self.cache_dir = cache_dir
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+
+    def get_path(self, source, area=None):
+        """Returns the path of the preview of an image, or None if the image
+        does not exist.
+
+            Args:
+
+                source: The path to the image file
+
+                area: Optional tuple with the position and size of the part
+                of the image file to use
+        """
+        source = os.path.normcase(os.path.abspath(source))
+        try:
+            mtime = os.path.getmtime(source)
+        except OSError:
+            return None
+        key = "|".join((source, repr(area), repr(mtime), str(self.size)))
+        key = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + ".png")
+
+    def get(self, source, area, load_func):
+        """Returns the preview of an image, either from the cache or by
+        downscaling the image.
+
+            Args:
+
+                source: The path to the image file
+
+                area: Tuple with the position and size of the part of the
+                image file to use, or None to use the whole image
+
+                load_func: Function that returns the Pillow image of the
+                source file
+
+            Returns: The Pillow image of the preview
+        """
+        path = self.get_path(source, area)
+        if path is not None:
+            try:
+                image = Image.open(path)
+                image.load()
+                self.hits += 1
+                return image
+            except (IOError, OSError):
+                pass
+        self.misses += 1
+        image = load_func(source)
+        if area is not None:
+            xpos, ypos, width, height = area
+            image = image.crop((xpos, ypos, xpos + width, ypos + height))
+        else:
+            image = image.copy()
+        image.thumbnail((self.size, self.size))
+        if path is not None:
+            self.store(path, image)
+        return image
+
+    def store(self, path, image):
+        """Writes a preview to the cache directory
+
+            Args:
+
+                path: The path of the preview in the cache
+
+                image: The Pillow image of the preview
+        """
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            handle, tmp_path = tempfile.mkstemp(dir=self.cache_dir,
+                                                suffix=".tmp")
+            with os.fdopen(handle, "wb") as preview_file:
+                image.save(preview_file, "PNG")
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            pass
+
+    def clear(self):
+        """Removes all previews from the cache"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for entry_name in os.listdir(self.cache_dir):
+            if entry_name.endswith(".png"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, entry_name))
+                except (IOError, OSError):
+                    pass
+
+
+class AtlasPage(object):
+
+    """A single texture of a :class:`ThumbnailAtlas`"""
+
+    def __init__(self, name, size):
+        self.name = name
+        self.packer = ShelfPacker(size, size)
+        self.image = Image.new("RGBA", (size, size))
+        renderer = PyCEGUI.System.getSingleton().getRenderer()
+        self.texture = renderer.createTexture(name, PyCEGUI.Sizef(size, size))
+        self.areas = {}
+        self.dirty_area = None
+        self.is_loaded = False
+
+    @property
+    def is_dirty(self):
+        """Returns whether the page has images that are not uploaded yet"""
+        return self.dirty_area is not None
+
+    def add(self, name, image):
+        """Copies an image onto the page
+
+            Args:
+
+                name: The name of the image
+
+                image: The Pillow image to add
+
+            Returns: The position of the image on the page, or None if it
+            does not fit.
+        """
+        pos = self.packer.insert(*image.size)
+        if pos is None:
+            return None
+        self.image.paste(image, pos)
+        self.areas[name] = pos + image.size
+        area = (pos[0], pos[1], pos[0] + image.size[0],
+                pos[1] + image.size[1])
+        if self.dirty_area is not None:
+            area = (min(area[0], self.dirty_area[0]),
+                    min(area[1], self.dirty_area[1]),
+                    max(area[2], self.dirty_area[2]),
+                    max(area[3], self.dirty_area[3]))
+        self.dirty_area = area
+        return pos
+
+    def remove(self, name):
+        """Removes an image from the page and frees its place
+
+            Args:
+
+                name: The name of the image
+        """
+        area = self.areas.pop(name, None)
+        if area is not None:
+            self.packer.remove(*area)
+
+    def upload(self):
+        """Copies the raw pixels of the changed part of the page into the
+        texture. The whole page is loaded on the first upload."""
+        if self.dirty_area is None:
+            return
+        if not self.is_loaded:
+            self.texture.loadFromMemory(self.image.tobytes(),
+                                        PyCEGUI.Sizef(*self.image.size),
+                                        PyCEGUI.Texture.PF_RGBA)
+            self.is_loaded = True
+        else:
+            left, top, right, bottom = self.dirty_area
+            data = self.image.crop(self.dirty_area).tobytes()
+            self.texture.blitFromMemory(
+                data, PyCEGUI.Rectf(PyCEGUI.Vector2f(left, top),
+                                    PyCEGUI.Sizef(right - left,
+                                                  bottom - top)))
+        self.dirty_area = None
+
+    def destroy(self):
+        """Destroys the texture of the page"""
+        renderer = PyCEGUI.System.getSingleton().getRenderer()
+        if renderer.isTextureDefined(self.name):
+            renderer.destroyTexture(self.name)
+
+
+class ThumbnailDecoder(object):
+
+    """Decodes the preview images of the object palette in worker threads
+
+    The decoded images are RGBA Pillow images, so the main thread only has
+    to copy them into the texture atlas. Decoded source images are kept
+    for other previews from the same file, like the images of an atlas,
+    until their memory exceeds the limit.
+    """
+
+    def __init__(self, threads=2, thumbnail_cache=None,
+                 source_memory=32 * 1024 * 1024):
+        self.thumbnail_cache = thumbnail_cache
+        self.requests = Queue()
+        self.results = Queue()
+        self.__sources = LRUCache(16, source_memory, get_image_memory)
+        self.__threads = []
+        for _ in range(max(threads, 1)):
+            thread = threading.Thread(target=self.__run)
+            thread.daemon = True
+            thread.start()
+            self.__threads.append(thread)
+
+    @property
+    def source_memory(self):
+        """Returns the number of bytes used by the decoded source images"""
+        return self.__sources.memory
+
+    def load_source(self, source):
+        """Returns the Pillow image of a source file
+
+            Args:
+
+                source: The path to the image file
+        """
+        image = self.__sources.get(source)
+        if image is None:
+            image = Image.open(source)
+            image.load()
+            if image.mode != "RGBA":
+                image = image.convert("RGBA")
+            self.__sources.set(source, image)
+        return image
+
+    def decode(self, source, area=None):
+        """Returns the RGBA Pillow image of a preview
+
+            Args:
+
+                source: The path to the image file
+
+                area: Optional tuple with the position and size of the part
+                of the image file to use
+        """
+        if self.thumbnail_cache is not None:
+            image = self.thumbnail_cache.get(source, area, self.load_source)
+        else:
+            image = self.load_source(source)
+            if area is not None:
+                xpos, ypos, width, height = area
+                image = image.crop((xpos, ypos, xpos + width,
+                                    ypos + height))
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        return image
+
+    def request(self, key, source, area=None):
+        """Queues a preview for decoding
+
+            Args:
+
+                key: Identifies the preview in the result
+
+                source: The path to the image file
+
+                area: Optional tuple with the position and size of the part
+                of the image file to use
+        """
+        self.requests.put((key, source, area))
+
+    def get_result(self):
+        """Returns a tuple with the key and the decoded image of the next
+        finished preview, or None if no preview is finished. The image is
+        None if the file could not be read."""
+        try:
+            return self.results.get_nowait()
+        except Empty:
+            return None
+
+    def stop(self, timeout=5.0):
+        """Stops the worker threads after their current preview and waits
+        for them to finish. Previews that are still queued are dropped.
+
+            Args:
+
+                timeout: The maximum number of seconds to wait for each
+                thread
+        """
+        while True:
+            try:
+                self.requests.get_nowait()
+            except Empty:
+                break
+        for _ in self.__threads:
+            self.requests.put(None)
+        for thread in self.__threads:
+            thread.join(timeout)
+        self.__threads = []
+
+    def __run(self):
+        """Decodes the requested previews"""
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            key, source, area = request
+            try:
+                image = self.decode(source, area)
+            except Exception:  # pylint: disable=broad-except
+                image = None
+            self.results.put((key, image))
+
+
+class ThumbnailAtlas(object):
+
+    """Packs the preview images of the object palette into a few large
+    textures and defines a CEGUI image for each of them.
+
+    The pixels are copied into the page textures from memory, so new
+    images become visible once the pages are flushed.
+    """
+
+    FLUSH_INTERVAL = 0.5
+
+    def __init__(self, page_size=1024, prefix="Thumbnails"):
+        self.page_size = page_size
+        self.prefix = prefix
+        self.pages = []
+        self.image_pages = {}
+        self.__page_count = 0
+        self.__last_flush = 0
+
+    def add(self, name, image):
+        """Packs an image into the atlas and defines a CEGUI image for it
+
+            Args:
+
+                name: The name of the CEGUI image
+
+                image: The decoded Pillow image
+        """
+        if max(image.size) > self.page_size:
+            image = image.copy()
+            image.thumbnail((self.page_size - 1, self.page_size - 1))
+        page, pos = self.__place(name, image)
+        image_manager = PyCEGUI.ImageManager.getSingleton()
+        cegui_image = image_manager.create("BasicImage", name)
+        cegui_image.setTexture(page.texture)
+        cegui_image.setArea(PyCEGUI.Rectf(PyCEGUI.Vector2f(*pos),
+                                          PyCEGUI.Sizef(*image.size)))
+        self.image_pages[name] = page
+
+    def __place(self, name, image):
+        """Finds a page with room for an image and copies the image onto it
+
+            Args:
+
+                name: The name of the image
+
+                image: The Pillow image
+
+            Returns: The page and the position of the image on it
+        """
+        for page in self.pages:
+            pos = page.add(name, image)
+            if pos is not None:
+                return page, pos
+        self.__page_count += 1
+        page_name = "%s.%d" % (self.prefix, self.__page_count)
+        page = AtlasPage(page_name, self.page_size)
+        self.pages.append(page)
+        return page, page.add(name, image)
+
+    def __contains__(self, name):
+        return name in self.image_pages
+
+    def remove(self, name):
+        """Removes the CEGUI image of a thumbnail. The space on the page is
+        reused for new thumbnails and pages without images are destroyed.
+
+            Args:
+
+                name: The name of the CEGUI image
+        """
+        page = self.image_pages.pop(name, None)
+        if page is None:
+            return
+        image_manager = PyCEGUI.ImageManager.getSingleton()
+        if image_manager.isDefined(name):
+            image_manager.destroy(name)
+        page.remove(name)
+        if not page.areas:
+            page.destroy()
+            self.pages.remove(page)
+
+    def flush(self, force=False):
+        """Uploads the pages that changed since the last flush
+
+            Args:
+
+                force: If False the pages are only uploaded when the last
+                flush is longer ago than the flush interval.
+        """
+        now = time.time()
+        if not force and now - self.__last_flush < self.FLUSH_INTERVAL:
+            return
+        self.__last_flush = now
+        dirty_pages = [page for page in self.pages if page.is_dirty]
+        if not dirty_pages:
+            return
+        for page in dirty_pages:
+            page.upload()
+
+    @property
+    def stats(self):
+        """Returns a dictionary with the number of pages and images and the
+        memory used by the page textures and their images"""
+        page_memory = len(self.pages) * self.page_size * self.page_size * 4
+        return {"pages": len(self.pages),
+                "gpu_memory": page_memory,
+                "host_memory": page_memory,
+                "images": len(self.image_pages)}
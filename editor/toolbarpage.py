@@ -52,3 +52,15 @@ class ToolbarPage(object):
     @abstractmethod
     def deactivate(self):
         """Called when the page gets deactivated"""
+
+    def remove_preview(self):
+        """Removes the instances the page shows on the map that are not part
+        of the map, like the preview of the object to place"""
+
+    def release(self):
+        """Frees resources of the page that are created again when they
+        are needed"""
+
+    def close(self):
+        """Called when the editor quits"""
+        self.release()
@@ -48,6 +48,36 @@ class UndoableAction(with_metaclass(ABCMeta, object)):
         """Undo the action"""
 
 
+class CompoundAction(UndoableAction):
+
+    """An action that consists of several actions, which are undone and
+    redone together"""
+
+    def __init__(self, description, actions=None):
+        UndoableAction.__init__(self, description)
+        self.actions = list(actions or [])
+
+    def add_action(self, action):
+        """Adds an action to the end of the compound action
+
+        Args:
+
+            action: The action to add
+
+        """
+        self.actions.append(action)
+
+    def redo(self):
+        """Redoes the actions in the order they were added"""
+        for action in self.actions:
+            action.redo()
+
+    def undo(self):
+        """Undoes the actions in reverse order"""
+        for action in reversed(self.actions):
+            action.undo()
+
+
 class UndoManager(object):
 
     """Manages undoing of undo_actions"""
@@ -20,6 +20,8 @@
 .. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
 """
 
+from array import array
+
 from fife import fife
 
 from .undo import UndoableAction
@@ -100,3 +102,152 @@ class UndoRemoveInstance(EditorUndoableAction):
         instance.setRotation(self.rotation)
         fife.InstanceVisual.create(instance)
         self.instance = instance
+
+
+class UndoCreateInstances(EditorUndoableAction):
+
+    """Class for undoing and redoing the creation of several instances of an
+    object on a layer"""
+
+    def __init__(self, editor, layer_or_layer_data, coords_list,
+                 object_or_object_data, rotation=0):
+        EditorUndoableAction.__init__(self, editor, _("Create instances"))
+        self.layer_or_layer_data = layer_or_layer_data
+        self.coords_list = coords_list
+        self.object_or_object_data = object_or_object_data
+        self.rotation = rotation
+        self.instances = []
+
+    def redo(self):
+        """Calls :py:meth:`.editor.Editor.create_instances` with the
+        variables of the action and returns the result."""
+        instances = self.editor.create_instances(
+            self.layer_or_layer_data, self.coords_list,
+            self.object_or_object_data, rotations=self.rotation)
+        for instance in instances:
+            fife.InstanceVisual.create(instance)
+        self.instances = instances
+        return instances
+
+    def undo(self):
+        """Calls :py:meth:`.editor.Editor.delete_instances` with the
+        instances of the action."""
+        self.editor.delete_instances(self.instances)
+        self.instances = []
+
+
+class UndoRemoveInstances(EditorUndoableAction):
+
+    """Class for undoing and redoing the removing of several instances"""
+
+    def __init__(self, editor, instances):
+        EditorUndoableAction.__init__(self, editor, _("Remove instances"))
+        self.instances = list(instances)
+        self.groups = []
+
+    def redo(self):
+        """Calls :py:meth:`.editor.Editor.delete_instances` with the
+        instances of the action"""
+        groups = {}
+        for instance in self.instances:
+            location = instance.getLocation()
+            layer = location.getLayer()
+            fife_object = instance.getObject()
+            key = (layer.getId(), fife_object.getNamespace(),
+                   fife_object.getId())
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = (layer, fife_object, [])
+            group[2].append((location.getExactLayerCoordinates(),
+                             instance.getId(), instance.getRotation()))
+        self.groups = list(groups.values())
+        self.editor.delete_instances(self.instances)
+        self.instances = []
+
+    def undo(self):
+        """Calls :py:meth:`.editor.Editor.create_instances` for every layer
+        and object of the removed instances."""
+        instances = []
+        for layer, fife_object, data in self.groups:
+            coords_list = [entry[0] for entry in data]
+            identifiers = [entry[1] for entry in data]
+            rotations = [entry[2] for entry in data]
+            created = self.editor.create_instances(layer, coords_list,
+                                                   fife_object, identifiers,
+                                                   rotations)
+            for instance in created:
+                fife.InstanceVisual.create(instance)
+            instances.extend(created)
+        self.instances = instances
+
+
+class UndoClearLayers(EditorUndoableAction):
+
+    """Class for undoing and redoing the deleting of all instances of
+    layers
+
+    The removed instances are stored compactly: for every layer and object
+    the coordinates and rotations are kept in arrays, and the identifiers
+    in a list. The optional is_protected function gets an instance and
+    returns whether the instance must be left alone; protected instances
+    are not deleted.
+    """
+
+    def __init__(self, editor, layers, is_protected=None):
+        EditorUndoableAction.__init__(self, editor, _("Clear layers"))
+        self.layers = list(layers)
+        self.is_protected = is_protected
+        self.groups = []
+        self.deleted = 0
+
+    def redo(self):
+        """Stores the instances of the layers and deletes them with
+        :py:meth:`.editor.Editor.delete_instances_of_layer`, or with
+        :py:meth:`.editor.Editor.delete_instances` if some of them are
+        protected.
+
+        Returns:
+
+            The number of deleted instances
+        """
+        is_protected = self.is_protected
+        groups = []
+        instances = []
+        skipped = False
+        for layer in self.layers:
+            objects = {}
+            for instance in layer.getInstances():
+                if is_protected is not None and is_protected(instance):
+                    skipped = True
+                    continue
+                instances.append(instance)
+                fife_object = instance.getObject()
+                key = (fife_object.getNamespace(), fife_object.getId())
+                group = objects.get(key)
+                if group is None:
+                    group = objects[key] = (fife_object, array("d"), [],
+                                            array("i"))
+                coords = instance.getLocation().getExactLayerCoordinates()
+                group[1].extend((coords.x, coords.y, coords.z))
+                group[2].append(instance.getId())
+                group[3].append(instance.getRotation())
+            groups.extend((layer,) + group for group in objects.values())
+        self.groups = groups
+        if skipped:
+            self.editor.delete_instances(instances)
+            self.deleted = len(instances)
+        else:
+            self.deleted = 0
+            for layer in self.layers:
+                self.deleted += self.editor.delete_instances_of_layer(layer)
+        return self.deleted
+
+    def undo(self):
+        """Calls :py:meth:`.editor.Editor.create_instances` for every layer
+        and object of the deleted instances."""
+        for layer, fife_object, coords, identifiers, rotations in self.groups:
+            created = self.editor.create_instances(layer, coords, fife_object,
+                                                   identifiers, rotations)
+            for instance in created:
+                fife.InstanceVisual.create(instance)
+        self.groups = []
@@ -182,6 +182,7 @@ class EditorApplication(RPGApplicationCEGUI):
         self.set_selected_object(None)
         self.editor.delete_maps()
         self.editor.delete_objects()
+        self.editor_gui.release_toolbars()
         self.create_world()
 
     def close_map(self, map_name=None):
@@ -331,12 +332,10 @@ class EditorApplication(RPGApplicationCEGUI):
     def cb_map_loaded(self, game_map):
         """Callback for when a map was loaded"""
 
-        fife_map = game_map.fife_map
-        for layer in self.editor.get_layers(fife_map):
-            for instance in layer.getInstances():
-                filename = instance.getObject().getFilename()
-                map_name = fife_map.getId()
-                self.editor.increase_refcount(filename, map_name)
+        # Maps that were loaded by the editor are already counted
+        self.editor.count_imports(game_map.fife_map)
+        # The entities of the game were added without the editor
+        self.editor.reindex_map(game_map.fife_map)
 
     def quit(self):
         """
@@ -345,6 +344,7 @@ class EditorApplication(RPGApplicationCEGUI):
         if self.current_dialog:
             return
         if self.editor_gui.ask_save_changed():
+            self.editor_gui.close_toolbars()
             self.quitRequested = True
 
 
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Tests of the index of the object files and palette objects
+
+.. module:: test_asset_index
+    :synopsis: Tests of the index of the object files and palette objects
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from editor.asset_index import AssetIndex, PaletteIndex, PollingWatcher
+
+
+def touch(path, offset):
+    """Moves the modification time of a file by the given seconds"""
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + offset))
+
+
+class AssetIndexTest(unittest.TestCase):
+
+    """Tracks object files and the files they depend on"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.objects = os.path.join(self.directory, "objects.xml")
+        self.animation = os.path.join(self.directory, "animation.xml")
+        for path in (self.objects, self.animation):
+            with open(path, "w") as out_file:
+                out_file.write(path)
+        self.index = AssetIndex()
+        self.index.update_file(self.objects, [("test", "tree")],
+                               [self.animation])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_changes(self):
+        """New and no longer used files are reported"""
+        other = os.path.join(self.directory, "other.xml")
+        added, removed = self.index.get_changes([other])
+        self.assertEqual(added, [other])
+        self.assertEqual(removed, [self.objects])
+        self.assertEqual(self.index.get_changes([self.objects]), ([], []))
+
+    def test_update_file(self):
+        """Updating a file replaces its objects and returns the old state"""
+        old_state = self.index.update_file(self.objects, [("test", "rock")],
+                                           [])
+        self.assertEqual(old_state.objects, set([("test", "tree")]))
+        self.assertEqual(self.index.get_file_objects(self.objects),
+                         set([("test", "rock")]))
+        self.assertEqual(self.index.get_affected_files([self.animation]),
+                         set())
+
+    def test_remove_file(self):
+        """Removed files are not indexed anymore"""
+        state = self.index.remove_file(self.objects)
+        self.assertEqual(state.dependencies, set([self.animation]))
+        self.assertNotIn(self.objects, self.index)
+        self.assertEqual(self.index.get_file_objects(self.objects), set())
+        self.assertEqual(self.index.get_affected_files([self.objects]),
+                         set())
+        self.assertIsNone(self.index.remove_file(self.objects))
+
+    def test_get_affected_files(self):
+        """Files are affected by changes of themselves and dependencies"""
+        self.assertEqual(self.index.get_affected_files([self.animation]),
+                         set([self.objects]))
+        relative = os.path.relpath(self.objects)
+        self.assertEqual(self.index.get_affected_files([relative]),
+                         set([self.objects]))
+
+    def test_get_modified_files(self):
+        """Files with a changed modification time are reported"""
+        self.assertEqual(self.index.get_modified_files(), set())
+        touch(self.objects, 10)
+        self.assertEqual(self.index.get_modified_files(),
+                         set([self.objects]))
+        os.remove(self.objects)
+        self.assertEqual(self.index.get_modified_files(),
+                         set([self.objects]))
+
+    def test_get_watched_paths(self):
+        """The files and their dependencies are watched"""
+        self.assertEqual(self.index.get_watched_paths(),
+                         set([self.objects, self.animation]))
+        self.index.clear()
+        self.assertEqual(self.index.get_watched_paths(), set())
+
+
+class PaletteIndexTest(unittest.TestCase):
+
+    """Tracks the objects shown in the palette"""
+
+    def test_add(self):
+        """Objects can only be added once"""
+        index = PaletteIndex()
+        self.assertTrue(index.add("test", "tree", "objects.xml"))
+        self.assertFalse(index.add("test", "tree", "other.xml"))
+        self.assertEqual(index.get_file("test", "tree"), "objects.xml")
+        self.assertEqual(index.namespaces, {"test": set(["tree"])})
+        self.assertEqual(list(index), [("test", "tree")])
+
+    def test_remove(self):
+        """Removing the last object of a namespace removes the namespace"""
+        index = PaletteIndex()
+        index.add("test", "tree", "objects.xml")
+        self.assertEqual(index.remove("test", "tree"), "objects.xml")
+        self.assertIsNone(index.remove("test", "tree"))
+        self.assertEqual(index.namespaces, {})
+        self.assertEqual(len(index), 0)
+
+    def test_get_stale(self):
+        """Objects that are not in the model are stale"""
+        index = PaletteIndex()
+        index.add("test", "tree", "objects.xml")
+        index.add("test", "rock", "objects.xml")
+        self.assertEqual(index.get_stale(set([("test", "rock")])),
+                         set([("test", "tree")]))
+
+
+class PollingWatcherTest(unittest.TestCase):
+
+    """Reports files with changed modification times"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "objects.xml")
+        with open(self.path, "w") as out_file:
+            out_file.write("objects")
+        self.changes = []
+        self.watcher = PollingWatcher(self.changes.append, interval=3600)
+
+    def tearDown(self):
+        self.watcher.stop()
+        shutil.rmtree(self.directory)
+
+    def test_check(self):
+        """Changes are reported once"""
+        self.watcher.watch([self.path])
+        self.watcher.check()
+        self.assertEqual(self.changes, [])
+        touch(self.path, 10)
+        self.watcher.check()
+        self.watcher.check()
+        self.assertEqual(self.changes, [set([self.path])])
+
+
+if __name__ == '__main__':
+    unittest.main()
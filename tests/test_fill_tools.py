@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Tests of the cell functions of the rectangle and flood fill tools
+
+.. module:: test_fill_tools
+    :synopsis: Tests of the cell functions of the fill tools
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+import unittest
+
+from builtins import object
+
+try:
+    from editor import fill_tools
+except ImportError:  # fife is not available
+    fill_tools = None
+
+
+class FakeObject(object):
+
+    """Stands in for a fife.Object"""
+
+    def __init__(self, namespace, identifier):
+        self.namespace = namespace
+        self.identifier = identifier
+
+    def getNamespace(self):  # pylint: disable=invalid-name
+        """Returns the namespace of the object"""
+        return self.namespace
+
+    def getId(self):  # pylint: disable=invalid-name
+        """Returns the name of the object"""
+        return self.identifier
+
+
+class FakePoint(object):
+
+    """Stands in for a fife.ModelCoordinate"""
+
+    def __init__(self, x_pos, y_pos, z_pos):
+        self.x = x_pos  # pylint: disable=invalid-name
+        self.y = y_pos  # pylint: disable=invalid-name
+        self.z = z_pos  # pylint: disable=invalid-name
+
+
+class FakeInstance(object):
+
+    """Stands in for a fife.Instance, which is also its own location"""
+
+    def __init__(self, obj, cell):
+        self.obj = obj
+        self.cell = cell
+
+    def getObject(self):  # pylint: disable=invalid-name
+        """Returns the object of the instance"""
+        return self.obj
+
+    def getLocation(self):  # pylint: disable=invalid-name
+        """Returns the location of the instance"""
+        return self
+
+    def getLayerCoordinates(self):  # pylint: disable=invalid-name
+        """Returns the cell of the instance"""
+        return FakePoint(*self.cell)
+
+
+class FakeEditor(object):
+
+    """Stands in for the editor and its spatial index"""
+
+    def __init__(self, instances):
+        self.instances = instances
+        self.requests = []
+
+    def get_instances_in_rect(self, layer, start, end):
+        """Returns the instances in a rectangle"""
+        self.requests.append((start, end))
+        return [instance for instance in self.instances
+                if start[0] <= instance.cell[0] <= end[0] and
+                start[1] <= instance.cell[1] <= end[1]]
+
+
+WALL = FakeObject("test", "wall")
+GRASS = FakeObject("test", "grass")
+
+
+def create_room(width, height):
+    """Returns instances of walls around a room with grass on the left
+    half and an empty right half"""
+    instances = []
+    for y_pos in range(height):
+        for x_pos in range(width):
+            cell = (x_pos, y_pos, 0)
+            if x_pos in (0, width - 1) or y_pos in (0, height - 1):
+                instances.append(FakeInstance(WALL, cell))
+            elif x_pos < width // 2:
+                instances.append(FakeInstance(GRASS, cell))
+    return instances
+
+
+@unittest.skipIf(fill_tools is None, "fife is required")
+class FillToolsTest(unittest.TestCase):
+
+    """Finds the cells to fill"""
+
+    def setUp(self):
+        self.instances = create_room(8, 6)
+        self.cells = fill_tools.get_cell_instances(self.instances)
+
+    def test_get_cell_instances(self):
+        """Instances are grouped by cells, without protected ones"""
+        self.assertEqual(len(self.cells), 8 * 6 - 3 * 4)
+        cells = fill_tools.get_cell_instances(
+            self.instances, lambda instance: instance.obj is WALL)
+        self.assertEqual(sorted(cells), [(x_pos, y_pos, 0)
+                                         for x_pos in range(1, 4)
+                                         for y_pos in range(1, 5)])
+
+    def test_get_cell_content(self):
+        """The content of a cell are the objects on it"""
+        self.assertEqual(fill_tools.get_cell_content(self.cells, (0, 0, 0)),
+                         frozenset([("test", "wall")]))
+        self.assertEqual(fill_tools.get_cell_content(self.cells, (5, 2, 0)),
+                         frozenset())
+
+    def test_get_rectangle_cells(self):
+        """Rectangles include both corners in any order"""
+        cells = fill_tools.get_rectangle_cells((2, 3, 1), (1, 1, 0))
+        self.assertEqual(cells, [(1, 1, 1), (2, 1, 1), (1, 2, 1),
+                                 (2, 2, 1), (1, 3, 1), (2, 3, 1)])
+        self.assertEqual(fill_tools.get_rectangle_cells((4, 4, 0),
+                                                        (4, 4, 0)),
+                         [(4, 4, 0)])
+
+    def test_flood_fill_same_content(self):
+        """Only connected cells with the same objects are filled"""
+        cells = fill_tools.get_flood_fill_cells((1, 1, 0), self.cells, 100)
+        self.assertEqual(sorted(cells), [(x_pos, y_pos, 0)
+                                         for x_pos in range(1, 4)
+                                         for y_pos in range(1, 5)])
+        cells = fill_tools.get_flood_fill_cells((6, 4, 0), self.cells, 100)
+        self.assertEqual(len(cells), 3 * 4)
+
+    def test_flood_fill_limit(self):
+        """Open areas are not filled"""
+        self.assertIsNone(fill_tools.get_flood_fill_cells((-1, 0, 0),
+                                                          self.cells, 100))
+        self.assertEqual(len(fill_tools.get_flood_fill_cells(
+            (1, 1, 0), self.cells, 12)), 12)
+        self.assertIsNone(fill_tools.get_flood_fill_cells((1, 1, 0),
+                                                          self.cells, 11))
+
+    def test_flood_fill_hexagonal(self):
+        """Hexagonal cells have six neighbours that depend on the row"""
+        even_walls = ((1, 0, 0), (-1, 0, 0), (-1, 1, 0), (0, 1, 0),
+                      (-1, -1, 0), (0, -1, 0))
+        odd_walls = ((1, 1, 0), (-1, 1, 0), (0, 2, 0), (1, 2, 0),
+                     (0, 0, 0), (1, 0, 0))
+        for start, walls in (((0, 0, 0), even_walls),
+                             ((0, 1, 0), odd_walls)):
+            cells = dict((cell, [FakeInstance(WALL, cell)])
+                         for cell in walls)
+            filled = fill_tools.get_flood_fill_cells(start, cells, 10,
+                                                     hexagonal=True)
+            self.assertEqual(filled, [start])
+        cells = dict((cell, [FakeInstance(WALL, cell)])
+                     for cell in ((1, 0, 0), (-1, 0, 0), (0, 1, 0),
+                                  (0, -1, 0)))
+        self.assertEqual(fill_tools.get_flood_fill_cells((0, 0, 0), cells,
+                                                         10),
+                         [(0, 0, 0)])
+        self.assertIsNone(fill_tools.get_flood_fill_cells((0, 0, 0), cells,
+                                                          10,
+                                                          hexagonal=True))
+
+    def test_layer_cell_instances(self):
+        """Cells are loaded in blocks from the editor"""
+        editor = FakeEditor(self.instances)
+        cells = fill_tools.LayerCellInstances(editor, None)
+        self.assertIn((0, 0, 0), cells)
+        self.assertNotIn((5, 2, 0), cells)
+        self.assertEqual(cells.get((1, 1, 0))[0].obj, GRASS)
+        self.assertEqual(editor.requests, [((0, 0), (15, 15))])
+        self.assertIsNone(cells.get((-1, 0, 0)))
+        self.assertEqual(editor.requests[1], ((-16, 0), (-1, 15)))
+        filled = fill_tools.get_flood_fill_cells((6, 4, 0), cells, 100)
+        self.assertEqual(len(filled), 3 * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
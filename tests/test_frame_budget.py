@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Tests of the adaptive frame budget
+
+.. module:: test_frame_budget
+    :synopsis: Tests of the adaptive frame budget
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+import unittest
+
+from builtins import object
+
+from editor import frame_budget
+from editor.frame_budget import FrameBudget
+
+
+class FakeClock(object):
+
+    """Replaces the time module of the frame budget"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def time(self):
+        """Returns the current fake time"""
+        return self.now
+
+
+class FrameBudgetTest(unittest.TestCase):
+
+    """Adapts the budget to the frame time"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.time = frame_budget.time
+        frame_budget.time = self.clock
+        self.budget = FrameBudget(budget=0.004, min_budget=0.001,
+                                  target_fps=50)
+
+    def tearDown(self):
+        frame_budget.time = self.time
+
+    def frame(self, seconds):
+        """Lets the given seconds pass and starts the next frame"""
+        self.clock.now += seconds
+        self.budget.start_frame()
+
+    def test_spent(self):
+        """The budget is spent when its time has passed"""
+        self.budget.start_frame()
+        self.assertFalse(self.budget.is_spent())
+        self.assertAlmostEqual(self.budget.remaining(), 0.004)
+        self.clock.now += 0.003
+        self.assertAlmostEqual(self.budget.remaining(), 0.001)
+        self.clock.now += 0.002
+        self.assertTrue(self.budget.is_spent())
+        self.assertEqual(self.budget.remaining(), 0)
+
+    def test_shrinks_and_grows(self):
+        """Slow frames shrink the budget down to the minimum and fast
+        frames let it grow back to the maximum"""
+        self.budget.start_frame()
+        for _ in range(10):
+            self.frame(0.1)
+        self.assertAlmostEqual(self.budget.budget, 0.001)
+        for _ in range(100):
+            self.frame(0.001)
+        self.assertAlmostEqual(self.budget.budget, 0.004)
+
+    def test_reset(self):
+        """The pause before a reset is not measured"""
+        self.budget.start_frame()
+        self.frame(0.01)
+        self.budget.reset()
+        self.frame(10.0)
+        self.assertAlmostEqual(self.budget.frame_time, 0.01)
+        self.assertAlmostEqual(self.budget.budget, 0.004)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Tests of the counts of the imported object files of the maps
+
+.. module:: test_import_tracker
+    :synopsis: Tests of the counts of the imported object files of the maps
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+import unittest
+
+from builtins import object
+
+from editor.import_tracker import ImportTracker
+
+
+class FakeObject(object):
+
+    """Stands in for a fife.Object"""
+
+    def __init__(self, namespace, identifier, filename):
+        self.namespace = namespace
+        self.identifier = identifier
+        self.filename = filename
+        self.filename_calls = 0
+
+    def getNamespace(self):  # pylint: disable=invalid-name
+        """Returns the namespace of the object"""
+        return self.namespace
+
+    def getId(self):  # pylint: disable=invalid-name
+        """Returns the name of the object"""
+        return self.identifier
+
+    def getFilename(self):  # pylint: disable=invalid-name
+        """Returns the file the object was loaded from"""
+        self.filename_calls += 1
+        return self.filename
+
+
+class FakeInstance(object):
+
+    """Stands in for a fife.Instance"""
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def getObject(self):  # pylint: disable=invalid-name
+        """Returns the object of the instance"""
+        return self.obj
+
+
+class ImportTrackerTest(unittest.TestCase):
+
+    """Counts the instances of the objects of each file"""
+
+    def setUp(self):
+        self.tree = FakeObject("test", "tree", "nature.xml")
+        self.bush = FakeObject("test", "bush", "nature.xml")
+        self.house = FakeObject("test", "house", "buildings.xml")
+        self.tracker = ImportTracker()
+        instances = [FakeInstance(obj) for obj in (self.tree, self.tree,
+                                                   self.tree, self.bush,
+                                                   self.house)]
+        self.tracker.count_instances("map", instances)
+
+    def get_imports(self, map_id="map"):
+        """Returns a sorted list of the imports of a map"""
+        return sorted(self.tracker.get_import_list(map_id))
+
+    def test_count_instances(self):
+        """The files of the instances are imported and only looked up once
+        per object"""
+        self.assertTrue(self.tracker.is_tracked("map"))
+        self.assertEqual(self.get_imports(), ["buildings.xml", "nature.xml"])
+        self.assertEqual(self.tracker.maps["map"]["nature.xml"], 4)
+        self.assertEqual(self.tree.filename_calls, 1)
+        self.assertEqual(self.tracker.get_cached_filename("test", "tree"),
+                         "nature.xml")
+
+    def test_add_and_remove(self):
+        """Files without instances are not imported anymore"""
+        self.tracker.remove("map", "buildings.xml")
+        self.assertEqual(self.get_imports(), ["nature.xml"])
+        self.tracker.remove("map", "buildings.xml")
+        self.tracker.add("map", "town.xml", 2)
+        self.tracker.remove("map", "town.xml")
+        self.assertEqual(self.tracker.maps["map"]["town.xml"], 1)
+        self.tracker.remove("map", "nature.xml", 10)
+        self.assertEqual(self.get_imports(), ["town.xml"])
+
+    def test_update(self):
+        """Several files are changed at once"""
+        self.tracker.update("map", {"nature.xml": -4, "town.xml": 1,
+                                    "buildings.xml": 2, "other.xml": -1})
+        self.assertEqual(self.get_imports(), ["buildings.xml", "town.xml"])
+        self.assertEqual(self.tracker.maps["map"]["buildings.xml"], 3)
+
+    def test_untracked(self):
+        """Changes of maps that are not tracked are ignored"""
+        self.tracker.add("other", "nature.xml")
+        self.tracker.update("other", {"nature.xml": 1})
+        self.tracker.remove("other", "nature.xml")
+        self.assertFalse(self.tracker.is_tracked("other"))
+        self.assertEqual(self.get_imports("other"), [])
+        self.tracker.track("other")
+        self.tracker.add("other", "nature.xml")
+        self.assertEqual(self.get_imports("other"), ["nature.xml"])
+        self.tracker.track("other")
+        self.assertEqual(self.get_imports("other"), ["nature.xml"])
+
+    def test_clear(self):
+        """Maps and cached files are removed"""
+        self.tracker.forget_object("test", "tree")
+        self.assertIsNone(self.tracker.get_cached_filename("test", "tree"))
+        self.tracker.remove_map("map")
+        self.assertFalse(self.tracker.is_tracked("map"))
+        self.tracker.track("map")
+        self.tracker.clear()
+        self.assertEqual(self.tracker.maps, {})
+        self.assertEqual(self.tracker.object_files, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Tests of the index of the instances by their identifiers
+
+.. module:: test_instance_index
+    :synopsis: Tests of the index of the instances by their identifiers
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+import unittest
+
+from builtins import object
+
+try:
+    from editor.instance_index import InstanceIndex
+    from editor.editor import Editor
+except ImportError:  # fife is not available
+    InstanceIndex = None
+
+
+class FakeInstance(object):
+
+    """Stands in for a fife.Instance"""
+
+    def __init__(self, fife_id, identifier):
+        self.fife_id = fife_id
+        self.identifier = identifier
+        self.listeners = []
+
+    def getFifeId(self):  # pylint: disable=invalid-name
+        """Returns the unique number of the instance"""
+        return self.fife_id
+
+    def getId(self):  # pylint: disable=invalid-name
+        """Returns the identifier of the instance"""
+        return self.identifier
+
+    def setId(self, identifier):  # pylint: disable=invalid-name
+        """Changes the identifier of the instance"""
+        self.identifier = identifier
+
+    def addDeleteListener(self, listener):  # pylint: disable=invalid-name
+        """Adds a delete listener"""
+        self.listeners.append(listener)
+
+    def removeDeleteListener(self, listener):  # pylint: disable=invalid-name
+        """Removes a delete listener"""
+        self.listeners.remove(listener)
+
+
+class FakeLayer(object):
+
+    """Stands in for a fife.Layer"""
+
+    def __init__(self, identifier, instances):
+        self.identifier = identifier
+        self.instances = list(instances)
+
+    def getId(self):  # pylint: disable=invalid-name
+        """Returns the identifier of the layer"""
+        return self.identifier
+
+    def getInstances(self):  # pylint: disable=invalid-name
+        """Returns the instances on the layer"""
+        return self.instances
+
+    def getInstance(self, identifier):  # pylint: disable=invalid-name
+        """Returns the first instance with an identifier or None"""
+        for instance in self.instances:
+            if instance.getId() == identifier:
+                return instance
+        return None
+
+
+class FakeMap(object):
+
+    """Stands in for a fife.Map"""
+
+    def __init__(self, identifier, layers):
+        self.identifier = identifier
+        self.layers = layers
+
+    def getId(self):  # pylint: disable=invalid-name
+        """Returns the identifier of the map"""
+        return self.identifier
+
+    def getLayers(self):  # pylint: disable=invalid-name
+        """Returns the layers of the map"""
+        return self.layers
+
+
+def create_map():
+    """Returns a map with two layers and some instances"""
+    ground = FakeLayer("ground", (FakeInstance(1, "grass"),
+                                  FakeInstance(2, ""),
+                                  FakeInstance(3, "tree")))
+    objects = FakeLayer("objects", (FakeInstance(4, "tree"),
+                                    FakeInstance(5, "chest")))
+    return FakeMap("map", [ground, objects])
+
+
+@unittest.skipIf(InstanceIndex is None, "fife is required")
+class InstanceIndexTest(unittest.TestCase):
+
+    """Finds instances by their identifiers and keeps track of changes"""
+
+    def setUp(self):
+        self.map = create_map()
+        self.ground, self.objects = self.map.getLayers()
+        self.index = InstanceIndex()
+        self.index.build("map", self.map.getLayers())
+
+    def verify(self):
+        """Returns the differences of the index and the map"""
+        return self.index.verify("map", self.map.getLayers())
+
+    def test_build(self):
+        """All instances with an identifier are indexed"""
+        self.assertTrue(self.index.is_indexed("map"))
+        self.assertFalse(self.index.is_indexed("other"))
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.index.get("map", "chest").getFifeId(), 5)
+        self.assertIn(self.index.get("map", "tree").getFifeId(), (3, 4))
+        self.assertIsNone(self.index.get("map", "rock"))
+        self.assertEqual(self.verify(), [])
+
+    def test_add_and_remove(self):
+        """Added and removed instances are updated in the index"""
+        rock = FakeInstance(6, "rock")
+        self.index.add(rock, "other")
+        self.assertIsNone(self.index.get("map", "rock"))
+        self.index.add(rock, "map")
+        self.assertIs(self.index.get("map", "rock"), rock)
+        self.assertEqual(len(rock.listeners), 1)
+        self.index.remove(rock)
+        self.assertIsNone(self.index.get("map", "rock"))
+        self.assertEqual(rock.listeners, [])
+
+    def test_deleted(self):
+        """Instances deleted by FIFE are removed from the index"""
+        chest = self.objects.instances.pop()
+        chest.listeners[0].onInstanceDeleted(chest)
+        self.assertIsNone(self.index.get("map", "chest"))
+        self.assertEqual(self.verify(), [])
+
+    def test_renamed(self):
+        """Instances renamed without the index are found by their new
+        identifier after the old one was looked up"""
+        chest = self.index.get("map", "chest")
+        chest.setId("box")
+        self.assertEqual(len(self.verify()), 1)
+        self.assertIsNone(self.index.get("map", "chest"))
+        self.assertIs(self.index.get("map", "box"), chest)
+        self.assertEqual(self.verify(), [])
+
+    def test_verify(self):
+        """Instances that are missing in the index or on the map are
+        reported"""
+        self.ground.instances.append(FakeInstance(6, "rock"))
+        self.objects.instances.pop()
+        errors = self.verify()
+        self.assertEqual(len(errors), 2)
+        self.assertIn("rock", errors[0] + errors[1])
+
+    def test_remove_map(self):
+        """The instances of a removed map are not indexed anymore"""
+        self.index.remove_map("map")
+        self.assertFalse(self.index.is_indexed("map"))
+        self.assertEqual(len(self.index), 0)
+        self.index.clear()
+
+
+@unittest.skipIf(InstanceIndex is None, "fife is required")
+class InstanceLookupTest(unittest.TestCase):
+
+    """Looks up instances of a map with the editor"""
+
+    def setUp(self):
+        self.map = create_map()
+        # The lookup does not need the FIFE engine of the editor
+        self.editor = Editor.__new__(Editor)
+        self.editor.instance_index = InstanceIndex()
+        self.editor.check_instance_index = False
+        self.editor.get_map = lambda identifier: self.map
+
+    def test_get_instance(self):
+        """Instances are found through the index"""
+        self.assertEqual(self.editor.get_instance("chest", None,
+                                                  "map").getFifeId(), 5)
+        self.assertTrue(self.editor.instance_index.is_indexed("map"))
+        self.assertIsNone(self.editor.get_instance("rock", None, "map"))
+
+    def test_fallback(self):
+        """Instances added without the editor are found on the layers and
+        added to the index"""
+        self.editor.get_instance("chest", None, "map")
+        rock = FakeInstance(6, "rock")
+        self.map.getLayers()[0].instances.append(rock)
+        self.assertIs(self.editor.get_instance("rock", None, "map"), rock)
+        self.assertIs(self.editor.instance_index.get("map", "rock"), rock)
+
+    def test_check_instance_lookup(self):
+        """The check raises an error if the index differs from the map"""
+        self.editor.check_instance_index = True
+        self.editor.get_instance("chest", None, "map")
+        self.map.getLayers()[0].instances.append(FakeInstance(6, "rock"))
+        self.assertRaises(AssertionError, self.editor.get_instance, "rock",
+                          None, "map")
+        self.editor.instance_index.build("map", self.map.getLayers())
+        chest = self.editor.get_instance("chest", None, "map")
+        self.editor.check_instance_lookup(self.map, "chest", chest)
+        self.assertRaises(AssertionError, self.editor.check_instance_lookup,
+                          self.map, "chest", None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Tests of the LRU cache
+
+.. module:: test_lru_cache
+    :synopsis: Tests of the LRU cache
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+import unittest
+
+from editor.lru_cache import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    """Adds, looks up and evicts items"""
+
+    def test_evicts_least_recently_used(self):
+        """The item that was not used for the longest time is removed"""
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_stamp(self):
+        """Items with a stamp that is not valid anymore are removed"""
+        cache = LRUCache()
+        cache.set("a", 1, stamp=1)
+        self.assertEqual(cache.get("a", lambda stamp: stamp == 1), 1)
+        self.assertIsNone(cache.get("a", lambda stamp: stamp == 2))
+        self.assertNotIn("a", cache)
+
+    def test_stats(self):
+        """Hits and misses are counted and reset by clear"""
+        cache = LRUCache()
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("b")
+        self.assertEqual(cache.stats["hits"], 1)
+        self.assertEqual(cache.stats["misses"], 1)
+        cache.clear()
+        self.assertEqual(cache.stats["hits"], 0)
+        self.assertEqual(len(cache), 0)
+
+    def test_max_memory(self):
+        """Items are removed while their memory exceeds the limit"""
+        cache = LRUCache(16, max_memory=10, get_memory=len)
+        cache.set("a", "aaaa")
+        cache.set("b", "bbbb")
+        self.assertEqual(cache.memory, 8)
+        cache.set("c", "cccc")
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.memory, 8)
+        cache.set("b", "bb")
+        self.assertEqual(cache.memory, 6)
+        cache.remove("c")
+        self.assertEqual(cache.memory, 2)
+
+    def test_keeps_newest_item(self):
+        """An item that alone exceeds the limit is kept until the next one
+        is added"""
+        cache = LRUCache(16, max_memory=10, get_memory=len)
+        cache.set("a", "a" * 20)
+        self.assertIn("a", cache)
+        cache.set("b", "b")
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.memory, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Tests of the on disk cache of parsed object files
+
+.. module:: test_object_cache
+    :synopsis: Tests of the on disk cache of parsed object files
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from editor.object_cache import ObjectCache
+
+
+class ObjectCacheTest(unittest.TestCase):
+
+    """Stores parsed objects and checks the files they were read from"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ObjectCache(os.path.join(self.directory, "cache"))
+        self.filename = os.path.join(self.directory, "objects.xml")
+        self.animation = os.path.join(self.directory, "animation.xml")
+        self.write(self.filename, "objects")
+        self.write(self.animation, "animation")
+        self.parsed = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def write(path, contents):
+        """Writes a file"""
+        with open(path, "w") as out_file:
+            out_file.write(contents)
+
+    def parse(self, filename, dependencies):
+        """Parse function that reads the animation file"""
+        self.parsed += 1
+        dependencies.add(self.animation)
+        return [{"file": filename, "parsed": self.parsed}]
+
+    def test_hit(self):
+        """Unchanged files are only parsed once"""
+        first = self.cache.get_objects(self.filename, self.parse)
+        dependencies = set()
+        second = self.cache.get_objects(self.filename, self.parse,
+                                        dependencies=dependencies)
+        self.assertEqual(first, second)
+        self.assertEqual(self.parsed, 1)
+        self.assertEqual(dependencies, set((self.animation,)))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_variants(self):
+        """Variants of a file have their own entries"""
+        self.cache.get_objects(self.filename, self.parse)
+        self.cache.get_objects(self.filename, self.parse, "thumbnail")
+        self.assertEqual(self.parsed, 2)
+
+    def test_changed_dependency(self):
+        """A changed dependency makes the file be parsed again"""
+        self.cache.get_objects(self.filename, self.parse)
+        self.write(self.animation, "changed animation")
+        objects = self.cache.get_objects(self.filename, self.parse)
+        self.assertEqual(objects[0]["parsed"], 2)
+
+    def test_touched_file(self):
+        """A file that was only touched does not invalidate the entry"""
+        self.cache.get_objects(self.filename, self.parse)
+        stat = os.stat(self.filename)
+        os.utime(self.filename, (stat.st_atime, stat.st_mtime + 10))
+        self.cache.get_objects(self.filename, self.parse)
+        self.assertEqual(self.parsed, 1)
+
+    def test_broken_entry(self):
+        """An entry that can not be read is parsed again"""
+        self.cache.get_objects(self.filename, self.parse)
+        self.write(self.cache.get_entry_path(self.filename), "broken")
+        objects = self.cache.get_objects(self.filename, self.parse)
+        self.assertEqual(objects[0]["parsed"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Tests of the streaming object file parser
+
+.. module:: test_object_parser
+    :synopsis: Tests of the streaming object file parser
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from lxml import etree
+    from editor import object_parser
+except ImportError:  # lxml is not available
+    object_parser = None
+
+OBJECTS = """<?xml version="1.0" encoding="ascii"?>
+<assets>
+    <object id="before_atlas" namespace="test" static="1">
+        <image source="tree.png" direction="90"/>
+        <image source="tree_west.png" direction="0"/>
+    </object>
+    <atlas source="atlas.png">
+        <subimage id="tree.png" xpos="0" ypos="0" width="32" height="64"/>
+        <subimage id="tree_west.png" xpos="32" ypos="0" width="32"
+            height="64"/>
+        <subimage id="rock.png" xpos="64" ypos="0" width="16" height="16"/>
+    </atlas>
+    <object id="after_atlas" namespace="test" static="1">
+        <image source="rock.png" direction="0"/>
+    </object>
+    <object id="plain" namespace="other" static="1">
+        <image source="images/plain.png" direction="45"/>
+    </object>
+    <object id="walker" namespace="test" static="0">
+        <action id="walk">
+            <animation source="walk_90.xml"/>
+            <animation source="walk_0.xml"/>
+        </action>
+        <action id="stand">
+            <animation id="stand:test:0" x_offset="1" y_offset="2">
+                <frame source="stand_0.png"/>
+                <frame source="stand_1.png"/>
+            </animation>
+        </action>
+    </object>
+</assets>
+"""
+
+ANIMATION = """<?xml version="1.0" encoding="ascii"?>
+<animation delay="100" id="walk:test:%(direction)d" x_offset="0"
+    y_offset="0">
+    <frame source="walk_%(direction)d_0.png"/>
+    <frame source="walk_%(direction)d_1.png"/>
+</animation>
+"""
+
+
+def parse_tree(filename, dependencies=None, thumbnail=False):
+    """Parses an object file the way the tree based parser did, which
+    :func:`.object_parser.iterparse_file` replaced, and returns a list of
+    the objects."""
+    root_path = os.path.dirname(filename)
+    root = etree.parse(filename).getroot()
+    atlas_def = dict()
+    for element in root.findall("atlas"):
+        atlas_def.update(object_parser.load_atlas(element, filename))
+    return [object_parser.parse_object(obj, root_path, atlas_def,
+                                       dependencies, thumbnail)
+            for obj in root.findall("object")]
+
+
+def by_identifier(objects):
+    """Returns a dictionary with the objects by their identifiers"""
+    return dict((obj["object"]["id"], obj) for obj in objects)
+
+
+@unittest.skipIf(object_parser is None, "lxml is required")
+class IterparseFileTest(unittest.TestCase):
+
+    """Compares the streaming parser with the tree based parser"""
+
+    def setUp(self):
+        object_parser.clear_caches()
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "objects.xml")
+        with open(self.filename, "w") as objects_file:
+            objects_file.write(OBJECTS)
+        for direction in (0, 90):
+            path = os.path.join(self.directory, "walk_%d.xml" % direction)
+            with open(path, "w") as animation_file:
+                animation_file.write(ANIMATION % {"direction": direction})
+
+    def tearDown(self):
+        object_parser.clear_caches()
+        shutil.rmtree(self.directory)
+
+    def compare(self, thumbnail):
+        """Checks that both parsers return the same objects"""
+        expected = parse_tree(self.filename, thumbnail=thumbnail)
+        dependencies = set()
+        objects = list(object_parser.iterparse_file(self.filename,
+                                                    dependencies, thumbnail))
+        self.assertEqual(len(objects), len(expected))
+        self.assertEqual(by_identifier(objects), by_identifier(expected))
+        return by_identifier(objects), dependencies
+
+    def test_full(self):
+        """The full definitions match the tree based parser"""
+        objects, dependencies = self.compare(False)
+        atlas = os.path.join(self.directory, "atlas.png")
+        before = objects["before_atlas"]["directions"]
+        self.assertEqual(before[90]["type"], "atlas")
+        self.assertEqual(before[90]["source"], atlas)
+        self.assertEqual(before[0]["xpos"], "32")
+        self.assertEqual(objects["plain"]["directions"][45]["type"], "image")
+        walk = objects["walker"]["actions"]["walk"]["directions"]
+        self.assertEqual(sorted(walk), [0, 90])
+        self.assertIn(os.path.abspath(self.filename), dependencies)
+        self.assertIn(os.path.join(self.directory, "walk_0.xml"),
+                      dependencies)
+
+    def test_thumbnail(self):
+        """The thumbnail definitions match the tree based parser"""
+        objects, _ = self.compare(True)
+        self.assertEqual(list(objects["before_atlas"]["directions"]), [0])
+        self.assertEqual(list(objects["walker"]["actions"]), ["walk"])
+        walk = objects["walker"]["actions"]["walk"]["directions"]
+        self.assertEqual(list(walk), [0])
+        self.assertEqual(len(walk[0]["frames"]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Tests of the index that finds objects by their texts
+
+.. module:: test_search_index
+    :synopsis: Tests of the index that finds objects by their texts
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+import unittest
+
+from editor.search_index import SearchIndex, get_trigrams, get_words
+
+TEXTS = {
+    ("nature", "tree"): ("tree", "nature", "objects/nature/tree.xml"),
+    ("nature", "tree_big"): ("tree_big", "nature",
+                             "objects/nature/tree_big.xml"),
+    ("buildings", "street"): ("street", "buildings",
+                              "objects/buildings/street.xml"),
+    ("buildings", "house"): ("House", "buildings",
+                             "objects/buildings/house.xml"),
+}
+
+
+class SearchIndexTest(unittest.TestCase):
+
+    """Finds entries by substrings and prefixes of their texts"""
+
+    def setUp(self):
+        self.index = SearchIndex()
+        for key, texts in TEXTS.items():
+            self.index.add(key, texts)
+
+    def brute_force(self, query):
+        """Returns the keys the index should find for a query"""
+        query = query.strip().lower()
+        if not query:
+            return set(TEXTS)
+        keys = set()
+        for key, texts in TEXTS.items():
+            for text in texts:
+                text = text.lower()
+                if len(query) < 3:
+                    found = any(word.startswith(query)
+                                for word in get_words(text))
+                else:
+                    found = query in text
+                if found:
+                    keys.add(key)
+        return keys
+
+    def test_helpers(self):
+        """Texts are split into trigrams and words"""
+        self.assertEqual(get_trigrams("tree"), set(["tre", "ree"]))
+        self.assertEqual(get_trigrams("tr"), set())
+        self.assertEqual(get_words("nature/tree_big.xml"),
+                         set(["nature/tree_big.xml", "nature", "tree",
+                              "big", "xml"]))
+
+    def test_search(self):
+        """The index finds the same entries as checking every text"""
+        for query in ("", "t", "tr", "re", "bi", "tre", "ree", "tree",
+                      "TREE", " house ", "ouse", "s/tr", "eet", "xyz",
+                      "tree_big.xml", "nature/tree"):
+            self.assertEqual(self.index.search(query),
+                             self.brute_force(query), query)
+
+    def test_substring(self):
+        """Long queries find texts that contain them"""
+        self.assertEqual(self.index.search("ree"),
+                         set([("nature", "tree"), ("nature", "tree_big"),
+                              ("buildings", "street")]))
+        self.assertEqual(self.index.search("hou"),
+                         set([("buildings", "house")]))
+
+    def test_prefix(self):
+        """Short queries find words that start with them"""
+        self.assertEqual(self.index.search("st"),
+                         set([("buildings", "street")]))
+        self.assertEqual(self.index.search("re"), set())
+
+    def test_replace_and_remove(self):
+        """Replaced and removed texts are not found anymore"""
+        key = ("nature", "tree")
+        self.index.add(key, ("bush",))
+        self.assertNotIn(key, self.index.search("tree"))
+        self.assertEqual(self.index.search("bu"),
+                         set([key, ("buildings", "street"),
+                              ("buildings", "house")]))
+        self.index.remove(key)
+        self.assertNotIn(key, self.index)
+        self.assertEqual(self.index.search("bush"), set())
+        self.assertEqual(len(self.index), len(TEXTS) - 1)
+        self.index.remove(key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Tests of the index of the instances by their cells
+
+.. module:: test_spatial_index
+    :synopsis: Tests of the index of the instances by their cells
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+import random
+import unittest
+
+from builtins import object
+
+try:
+    from editor.spatial_index import LayerGrid, SpatialIndex
+except ImportError:  # fife is not available
+    LayerGrid = None
+
+
+class FakePoint(object):
+
+    """Stands in for a fife.ModelCoordinate"""
+
+    def __init__(self, x_pos, y_pos):
+        self.x = x_pos  # pylint: disable=invalid-name
+        self.y = y_pos  # pylint: disable=invalid-name
+        self.z = 0  # pylint: disable=invalid-name
+
+
+class FakeInstance(object):
+
+    """Stands in for a fife.Instance, which is also its own location"""
+
+    def __init__(self, fife_id, cell, layer=None):
+        self.fife_id = fife_id
+        self.cell = cell
+        self.layer = layer
+        self.listeners = []
+
+    def getFifeId(self):  # pylint: disable=invalid-name
+        """Returns the unique number of the instance"""
+        return self.fife_id
+
+    def getLocation(self):  # pylint: disable=invalid-name
+        """Returns the location of the instance"""
+        return self
+
+    def getLayer(self):  # pylint: disable=invalid-name
+        """Returns the layer of the instance"""
+        return self.layer
+
+    def getLayerCoordinates(self):  # pylint: disable=invalid-name
+        """Returns the cell of the instance"""
+        return FakePoint(*self.cell)
+
+    def addDeleteListener(self, listener):  # pylint: disable=invalid-name
+        """Adds a delete listener"""
+        self.listeners.append(listener)
+
+    def removeDeleteListener(self, listener):  # pylint: disable=invalid-name
+        """Removes a delete listener"""
+        self.listeners.remove(listener)
+
+
+class FakeMap(object):
+
+    """Stands in for a fife.Map"""
+
+    def getId(self):  # pylint: disable=invalid-name
+        """Returns the identifier of the map"""
+        return "map"
+
+
+class FakeLayer(object):
+
+    """Stands in for a fife.Layer"""
+
+    def __init__(self, identifier):
+        self.identifier = identifier
+        self.instances = []
+        self.queried = 0
+
+    def getMap(self):  # pylint: disable=invalid-name
+        """Returns the map of the layer"""
+        return FakeMap()
+
+    def getId(self):  # pylint: disable=invalid-name
+        """Returns the identifier of the layer"""
+        return self.identifier
+
+    def getInstances(self):  # pylint: disable=invalid-name
+        """Returns the instances on the layer"""
+        self.queried += 1
+        return self.instances
+
+    def create_instance(self, fife_id, cell):
+        """Creates an instance on the layer"""
+        instance = FakeInstance(fife_id, cell, self)
+        self.instances.append(instance)
+        return instance
+
+
+def create_instances(count, seed=0):
+    """Returns instances on random cells around the origin, so that they
+    are on several chunks including ones with negative coordinates"""
+    rand = random.Random(seed)
+    return [FakeInstance(fife_id, (rand.randint(-40, 40),
+                                   rand.randint(-40, 40)))
+            for fife_id in range(count)]
+
+
+def get_ids(instances):
+    """Returns a sorted list of the identifiers of instances"""
+    return sorted(instance.getFifeId() for instance in instances)
+
+
+@unittest.skipIf(LayerGrid is None, "fife is required")
+class LayerGridTest(unittest.TestCase):
+
+    """Groups instances in chunks and finds them by their cells"""
+
+    def setUp(self):
+        self.instances = create_instances(400)
+        self.grid = LayerGrid()
+        for instance in self.instances:
+            self.grid.add(instance, instance.cell)
+
+    def find(self, is_inside):
+        """Returns the identifiers of the instances on matching cells"""
+        return get_ids(instance for instance in self.instances
+                       if is_inside(*instance.cell))
+
+    def test_get_point(self):
+        """The instances on a cell are found"""
+        for instance in self.instances[:20]:
+            x_pos, y_pos = instance.cell
+            self.assertEqual(
+                get_ids(self.grid.get_point(x_pos, y_pos)),
+                self.find(lambda x, y: (x, y) == (x_pos, y_pos)))
+        self.assertEqual(self.grid.get_point(1000, 1000), [])
+
+    def test_get_rect(self):
+        """Rectangles that cover whole and partial chunks are searched"""
+        for min_x, min_y, max_x, max_y in ((-40, -40, 40, 40),
+                                           (-16, -16, 15, 15),
+                                           (-17, 3, 17, 4),
+                                           (0, 0, 0, 0),
+                                           (5, -33, 31, -1),
+                                           (100, 100, 120, 120)):
+            expected = self.find(lambda x, y: min_x <= x <= max_x and
+                                 min_y <= y <= max_y)
+            self.assertEqual(get_ids(self.grid.get_rect(min_x, min_y,
+                                                        max_x, max_y)),
+                             expected)
+
+    def test_get_radius(self):
+        """Circles around a cell are searched"""
+        for x_pos, y_pos, radius in ((0, 0, 10), (-20, 15, 5.5),
+                                     (16, -16, 0), (39, 39, 30)):
+            expected = self.find(lambda x, y: (x - x_pos) ** 2 +
+                                 (y - y_pos) ** 2 <= radius * radius)
+            self.assertEqual(get_ids(self.grid.get_radius(x_pos, y_pos,
+                                                          radius)),
+                             expected)
+
+    def test_add_and_remove(self):
+        """Moved and removed instances leave no empty chunks behind"""
+        instance = self.instances[0]
+        self.grid.add(instance, (500, 500))
+        self.assertEqual(self.grid.get_point(500, 500), [instance])
+        self.assertEqual(len(self.grid), len(self.instances))
+        for instance in self.instances:
+            self.assertTrue(self.grid.remove(instance.getFifeId()))
+        self.assertFalse(self.grid.remove(0))
+        self.assertEqual(self.grid.chunks, {})
+        self.assertEqual(len(self.grid), 0)
+
+
+@unittest.skipIf(LayerGrid is None, "fife is required")
+class SpatialIndexTest(unittest.TestCase):
+
+    """Indexes layers when they are queried and keeps track of changes"""
+
+    def setUp(self):
+        self.layer = FakeLayer("ground")
+        self.tree = self.layer.create_instance(1, (2, 3))
+        self.rock = self.layer.create_instance(2, (20, 3))
+        self.index = SpatialIndex()
+
+    def test_lazy(self):
+        """Layers are indexed once, on the first query"""
+        self.assertFalse(self.index.is_indexed(self.layer))
+        self.index.add(self.layer.create_instance(3, (0, 0)), self.layer)
+        self.assertEqual(len(self.index), 0)
+        self.assertEqual(self.index.get_at(self.layer, 2, 3), [self.tree])
+        self.assertEqual(get_ids(self.index.get_in_rect(self.layer, (20, 4),
+                                                        (0, 0))),
+                         [1, 2, 3])
+        self.assertEqual(self.layer.queried, 1)
+        self.assertEqual(len(self.index), 3)
+
+    def test_add_and_remove(self):
+        """Added and removed instances are updated in the index"""
+        self.index.get_grid(self.layer)
+        bush = FakeInstance(3, (3, 3))
+        self.index.add(bush, self.layer)
+        self.assertEqual(get_ids(self.index.get_in_radius(self.layer,
+                                                          (2, 3), 1)),
+                         [1, 3])
+        self.index.remove(bush)
+        self.assertEqual(bush.listeners, [])
+        self.assertEqual(self.index.get_at(self.layer, 3, 3), [])
+
+    def test_moved(self):
+        """Instances are found at their new cells"""
+        self.index.get_grid(self.layer)
+        self.tree.cell = (21, 3)
+        self.index.move(self.tree)
+        self.assertEqual(self.index.get_at(self.layer, 2, 3), [])
+        self.assertEqual(get_ids(self.index.get_at(self.layer, 21, 3)), [1])
+
+    def test_moved_without_index(self):
+        """Instances that were moved without the index are not returned for
+        their old cells"""
+        self.index.get_grid(self.layer)
+        self.tree.cell = (40, 40)
+        self.assertEqual(self.index.get_in_rect(self.layer, (0, 0),
+                                                (5, 5)), [])
+        self.assertEqual(self.index.get_at(self.layer, 40, 40), [self.tree])
+
+    def test_deleted(self):
+        """Instances deleted by FIFE are removed from the index"""
+        self.index.get_grid(self.layer)
+        self.tree.listeners[0].onInstanceDeleted(self.tree)
+        self.layer.instances.remove(self.tree)
+        self.assertEqual(self.index.get_at(self.layer, 2, 3), [])
+        self.assertEqual(len(self.index), 1)
+
+    def test_remove_map(self):
+        """The layers of a removed map are indexed again"""
+        self.index.get_grid(self.layer)
+        self.index.remove_map("map")
+        self.assertFalse(self.index.is_indexed(self.layer))
+        self.assertEqual(len(self.index), 0)
+        self.index.get_grid(self.layer)
+        self.assertEqual(self.layer.queried, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
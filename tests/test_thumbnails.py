@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Tests of the thumbnail decoder
+
+.. module:: test_thumbnails
+    :synopsis: Tests of the thumbnail decoder
+
+.. moduleauthor:: Karsten Bock <KarstenBock@gmx.net>
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+try:
+    from editor import thumbnails
+except ImportError:  # PyCEGUI is not available
+    thumbnails = None
+
+
+@unittest.skipIf(thumbnails is None, "PyCEGUI is required")
+class ShelfPackerTest(unittest.TestCase):
+
+    """Packs rectangles onto shelves"""
+
+    def test_shelves(self):
+        """Rectangles are placed next to each other, then on new shelves"""
+        packer = thumbnails.ShelfPacker(20, 20, padding=0)
+        self.assertEqual(packer.insert(10, 10), (0, 0))
+        self.assertEqual(packer.insert(10, 10), (10, 0))
+        self.assertEqual(packer.insert(10, 5), (0, 10))
+        self.assertEqual(packer.insert(10, 5), (10, 10))
+        self.assertIsNone(packer.insert(10, 10))
+
+    def test_reuse(self):
+        """The places of removed rectangles are used again"""
+        packer = thumbnails.ShelfPacker(20, 10, padding=0)
+        packer.insert(10, 10)
+        second = packer.insert(10, 10)
+        self.assertIsNone(packer.insert(8, 8))
+        packer.remove(second[0], second[1], 10, 10)
+        self.assertEqual(packer.insert(8, 8), second)
+        self.assertIsNone(packer.insert(8, 8))
+
+
+@unittest.skipIf(thumbnails is None or not thumbnails.is_available(),
+                 "PyCEGUI and Pillow are required")
+class ThumbnailDecoderTest(unittest.TestCase):
+
+    """Runs previews through the worker threads of the decoder"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, "image.png")
+        image = thumbnails.Image.new("RGB", (32, 16), (255, 0, 0))
+        image.save(self.source)
+        self.decoder = thumbnails.ThumbnailDecoder(threads=1)
+
+    def tearDown(self):
+        self.decoder.stop()
+        shutil.rmtree(self.directory)
+
+    def wait_for_result(self, timeout=5.0):
+        """Returns the next result of the decoder, or None if no result
+        arrived within the timeout"""
+        end = time.time() + timeout
+        while time.time() < end:
+            result = self.decoder.get_result()
+            if result is not None:
+                return result
+            time.sleep(0.01)
+        return None
+
+    def test_request(self):
+        """A requested area is decoded into an RGBA image"""
+        self.decoder.request(("ns", "obj"), self.source, (4, 2, 8, 6))
+        result = self.wait_for_result()
+        self.assertIsNotNone(result)
+        key, image = result
+        self.assertEqual(key, ("ns", "obj"))
+        self.assertEqual(image.mode, "RGBA")
+        self.assertEqual(image.size, (8, 6))
+
+    def test_missing_file(self):
+        """A file that can not be read results in no image"""
+        self.decoder.request("missing",
+                             os.path.join(self.directory, "missing.png"))
+        self.assertEqual(self.wait_for_result(), ("missing", None))
+
+
+if __name__ == '__main__':
+    unittest.main()